@@ -1,11 +1,12 @@
 """
 RAG API - эндпоинты для работы с RAG системой
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Query
 from fastapi.responses import JSONResponse
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
 import tempfile
+import shutil
 import os
 from pathlib import Path
 
@@ -14,6 +15,7 @@ import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from ml.rag_bot.rag_system import RAGSystem
+from ml.rag_bot.executors import ExecutorBusyError
 
 router = APIRouter(tags=["RAG System"])
 
@@ -24,6 +26,19 @@ rag_system = None
 class SearchRequest(BaseModel):
     query: str
     top_k: int = 5
+    # Фильтр по метаданным чанков: {"filename": "a.pdf"}, {"chunk_index": {"$lt": 3}}, {"$or": [...]}
+    filters: Optional[Dict[str, Any]] = None
+    # Порог similarity (косинус); без него - RAG_MIN_SIMILARITY
+    min_similarity: Optional[float] = None
+    # Арендатор: своя коллекция документов (без него - общая коллекция)
+    tenant: Optional[str] = None
+
+class BatchSearchRequest(BaseModel):
+    queries: List[str]
+    top_k: int = 5
+    filters: Optional[Dict[str, Any]] = None
+    min_similarity: Optional[float] = None
+    tenant: Optional[str] = None
 
 class SearchResult(BaseModel):
     document: str
@@ -34,6 +49,9 @@ class SearchResult(BaseModel):
 class ChatRequest(BaseModel):
     question: str
     top_k: int = 3
+    filters: Optional[Dict[str, Any]] = None
+    min_similarity: Optional[float] = None
+    tenant: Optional[str] = None
 
 class ChatResponse(BaseModel):
     answer: str
@@ -43,6 +61,7 @@ class ChatResponse(BaseModel):
 class SimpleChatRequest(BaseModel):
     message: str
     history: Optional[List[Dict[str, str]]] = []
+    tenant: Optional[str] = None
 
 class SimpleChatResponse(BaseModel):
     response: str
@@ -53,6 +72,22 @@ class LLMConfigRequest(BaseModel):
     model: str
     api_key: Optional[str] = None
 
+class ProjectionFitRequest(BaseModel):
+    method: str = "pca"  # 'pca', 'truncate'
+    dim: Optional[int] = None
+    dims: Optional[List[int]] = None
+    k: int = 10
+    sample_size: int = 5000
+
+class SnapshotExportRequest(BaseModel):
+    name: Optional[str] = None  # без имени - по текущему времени
+    tenant: Optional[str] = None
+
+class SnapshotImportRequest(BaseModel):
+    name: str
+    replace: bool = False  # очистить базу перед загрузкой
+    tenant: Optional[str] = None
+
 class DocumentInfo(BaseModel):
     filename: str
     content_length: int
@@ -72,13 +107,73 @@ def initialize_rag_system():
         llm_model = os.getenv('LLM_MODEL', 'microsoft/DialoGPT-medium')
         chunk_size = int(os.getenv('CHUNK_SIZE', '1000'))
         overlap = int(os.getenv('CHUNK_OVERLAP', '200'))
-        
+        embeddings_cache_dir = os.getenv('EMBEDDINGS_CACHE_DIR', './data/embeddings_cache') or None
+        embeddings_cache_size = int(os.getenv('EMBEDDINGS_CACHE_SIZE', '10000'))
+        embeddings_backend = os.getenv('EMBEDDINGS_BACKEND', 'torch')
+        embeddings_batch_size = int(os.getenv('EMBEDDINGS_BATCH_SIZE', '32'))
+        embeddings_max_batch_tokens = int(os.getenv('EMBEDDINGS_MAX_BATCH_TOKENS', '16384'))
+        embeddings_length_bucketing = os.getenv('EMBEDDINGS_LENGTH_BUCKETING', 'true').lower() in ('1', 'true', 'yes')
+        query_batch_wait_ms = float(os.getenv('QUERY_BATCH_WAIT_MS', '5'))
+        query_batch_max_size = int(os.getenv('QUERY_BATCH_MAX_SIZE', '32'))
+        ingest_workers = int(os.getenv('INGEST_WORKERS', '0'))
+        embeddings_projection = os.getenv('EMBEDDINGS_PROJECTION', 'none')
+        embeddings_projection_dim = int(os.getenv('EMBEDDINGS_PROJECTION_DIM', '0'))
+        embeddings_projection_path = os.getenv('EMBEDDINGS_PROJECTION_PATH', './data/projections/projection.npz')
+        vector_quantization = os.getenv('VECTOR_QUANTIZATION') or None
+        vector_rescore_factor = int(os.getenv('VECTOR_RESCORE_FACTOR', '4'))
+        vector_backend = os.getenv('VECTOR_BACKEND', 'chroma')
+        vector_hnsw_m = int(os.getenv('VECTOR_HNSW_M', '32'))
+        vector_hnsw_ef_construction = int(os.getenv('VECTOR_HNSW_EF_CONSTRUCTION', '200'))
+        vector_hnsw_ef_search = int(os.getenv('VECTOR_HNSW_EF_SEARCH', '64'))
+        vector_chroma_memory_limit_bytes = int(os.getenv('VECTOR_CHROMA_MEMORY_LIMIT_BYTES', '0'))
+        vector_write_batch_size = int(os.getenv('VECTOR_WRITE_BATCH_SIZE', '1000'))
+        vector_write_buffer_size = int(os.getenv('VECTOR_WRITE_BUFFER_SIZE', '0'))
+        vector_shards = int(os.getenv('VECTOR_SHARDS', '1'))
+        vector_space = os.getenv('VECTOR_SPACE') or None
+        max_open_tenants = int(os.getenv('MAX_OPEN_TENANTS', '32'))
+        min_similarity = float(os.getenv('RAG_MIN_SIMILARITY', '0'))
+        snapshots_dir = os.getenv('SNAPSHOTS_DIR', './data/snapshots')
+        embeddings_executor_workers = int(os.getenv('EMBEDDINGS_EXECUTOR_WORKERS', '8'))
+        llm_executor_workers = int(os.getenv('LLM_EXECUTOR_WORKERS', '4'))
+        ingest_executor_workers = int(os.getenv('INGEST_EXECUTOR_WORKERS', '1'))
+        executor_max_pending = int(os.getenv('EXECUTOR_MAX_PENDING', '64'))
+
         rag_system = RAGSystem(
             embeddings_model=embeddings_model,
             llm_provider=llm_provider,
             llm_model=llm_model,
             chunk_size=chunk_size,
-            overlap=overlap
+            overlap=overlap,
+            embeddings_cache_dir=embeddings_cache_dir,
+            embeddings_cache_size=embeddings_cache_size,
+            embeddings_backend=embeddings_backend,
+            embeddings_batch_size=embeddings_batch_size,
+            embeddings_max_batch_tokens=embeddings_max_batch_tokens,
+            embeddings_length_bucketing=embeddings_length_bucketing,
+            query_batch_wait_ms=query_batch_wait_ms,
+            query_batch_max_size=query_batch_max_size,
+            ingest_workers=ingest_workers,
+            embeddings_projection=embeddings_projection,
+            embeddings_projection_dim=embeddings_projection_dim,
+            embeddings_projection_path=embeddings_projection_path,
+            vector_quantization=vector_quantization,
+            vector_rescore_factor=vector_rescore_factor,
+            vector_backend=vector_backend,
+            vector_hnsw_m=vector_hnsw_m,
+            vector_hnsw_ef_construction=vector_hnsw_ef_construction,
+            vector_hnsw_ef_search=vector_hnsw_ef_search,
+            vector_chroma_memory_limit_bytes=vector_chroma_memory_limit_bytes,
+            vector_write_batch_size=vector_write_batch_size,
+            vector_write_buffer_size=vector_write_buffer_size,
+            vector_shards=vector_shards,
+            vector_space=vector_space,
+            max_open_tenants=max_open_tenants,
+            min_similarity=min_similarity,
+            snapshots_dir=snapshots_dir,
+            embeddings_executor_workers=embeddings_executor_workers,
+            llm_executor_workers=llm_executor_workers,
+            ingest_executor_workers=ingest_executor_workers,
+            executor_max_pending=executor_max_pending
         )
         
         print("✅ RAG система готова!")
@@ -86,13 +181,20 @@ def initialize_rag_system():
 # Инициализация сервисов при импорте модуля
 # initialize_rag_services()
 
+@router.on_event("shutdown")
+def shutdown_rag_system():
+    """Корректно остановить фоновые потоки и процессы RAG системы"""
+    if rag_system is not None:
+        rag_system.close()
+
 @router.post("/documents/upload")
-async def upload_documents(files: List[UploadFile] = File(...)):
+async def upload_documents(files: List[UploadFile] = File(...), tenant: Optional[str] = Form(None)):
     """
     Загрузка документов в RAG систему
     
     Args:
         files: Список файлов для загрузки
+        tenant: Арендатор, в коллекцию которого загружаются документы
         
     Returns:
         Информация о загруженных документах
@@ -100,13 +202,16 @@ async def upload_documents(files: List[UploadFile] = File(...)):
     initialize_rag_system()
     
     # Сохраняем файлы во временную директорию
+    temp_dir = tempfile.mkdtemp()
     temp_files = []
     uploaded_docs = []
     
     try:
-        # Сохраняем все файлы
-        for file in files:
-            temp_file_path = tempfile.mktemp(suffix=Path(file.filename).suffix)
+        # Сохраняем все файлы под исходными именами: filename в метаданных чанков
+        # используется в фильтрах поиска
+        for i, file in enumerate(files):
+            temp_file_path = os.path.join(temp_dir, str(i), Path(file.filename).name)
+            os.makedirs(os.path.dirname(temp_file_path))
             content = await file.read()
             
             with open(temp_file_path, 'wb') as tmp_file:
@@ -115,7 +220,7 @@ async def upload_documents(files: List[UploadFile] = File(...)):
             temp_files.append(temp_file_path)
         
         # Загружаем документы через RAG систему
-        load_result = rag_system.load_documents(temp_files)
+        load_result = await rag_system.aload_documents(temp_files, tenant=tenant)
         
         # Формируем ответ
         for i, file in enumerate(files):
@@ -136,9 +241,17 @@ async def upload_documents(files: List[UploadFile] = File(...)):
             "message": f"Обработано {len(files)} файлов",
             "results": uploaded_docs,
             "total_documents": load_result["total_documents"],
-            "total_chunks": load_result["total_chunks"]
+            "total_chunks": load_result["total_chunks"],
+            "new_chunks": load_result.get("new_chunks", 0),
+            "skipped_chunks": load_result.get("skipped_chunks", 0),
+            "upload_batch": load_result.get("upload_batch"),
+            "embedding": load_result.get("embedding")
         }
         
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         return {
             "message": f"Ошибка обработки файлов: {str(e)}",
@@ -147,11 +260,7 @@ async def upload_documents(files: List[UploadFile] = File(...)):
         
     finally:
         # Удаляем временные файлы
-        for temp_file in temp_files:
-            try:
-                os.unlink(temp_file)
-            except:
-                pass
+        shutil.rmtree(temp_dir, ignore_errors=True)
 
 @router.post("/search", response_model=List[SearchResult])
 async def search_documents(request: SearchRequest):
@@ -168,7 +277,10 @@ async def search_documents(request: SearchRequest):
     
     try:
         # Ищем документы через RAG систему
-        results = rag_system.search(request.query, top_k=request.top_k)
+        results = await rag_system.asearch(
+            request.query, top_k=request.top_k, where=request.filters, min_similarity=request.min_similarity,
+            tenant=request.tenant
+        )
         
         # Форматируем результаты
         search_results = []
@@ -182,9 +294,52 @@ async def search_documents(request: SearchRequest):
         
         return search_results
         
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Некорректный запрос: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка поиска: {str(e)}")
 
+@router.post("/search/batch", response_model=List[List[SearchResult]])
+async def search_documents_batch(request: BatchSearchRequest):
+    """
+    Поиск по нескольким запросам за один вызов
+
+    Args:
+        request: Список запросов и количество результатов на запрос
+
+    Returns:
+        Список найденных документов для каждого запроса (в порядке запросов)
+    """
+    initialize_rag_system()
+
+    try:
+        batch_results = await rag_system.asearch_many(
+            request.queries, top_k=request.top_k, where=request.filters, min_similarity=request.min_similarity,
+            tenant=request.tenant
+        )
+
+        return [
+            [
+                SearchResult(
+                    document=result['document'],
+                    similarity=result['similarity'],
+                    metadata=result['metadata'],
+                    id=result['id']
+                )
+                for result in results
+            ]
+            for results in batch_results
+        ]
+
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Некорректный запрос: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка пакетного поиска: {str(e)}")
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat_with_documents(request: ChatRequest):
     """
@@ -200,7 +355,10 @@ async def chat_with_documents(request: ChatRequest):
     
     try:
         # Используем RAG систему для генерации ответа
-        response = rag_system.ask(request.question, top_k=request.top_k)
+        response = await rag_system.aask(
+            request.question, top_k=request.top_k, where=request.filters, min_similarity=request.min_similarity,
+            tenant=request.tenant
+        )
         
         # Форматируем источники
         sources = []
@@ -218,56 +376,145 @@ async def chat_with_documents(request: ChatRequest):
             question=request.question
         )
         
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Некорректный запрос: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка чата: {str(e)}")
 
 @router.get("/documents/list")
-async def list_documents():
+async def list_documents(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    filename: Optional[str] = None,
+    upload_batch: Optional[str] = None,
+    tenant: Optional[str] = None
+):
     """
-    Получить список всех документов в системе
+    Получить страницу списка документов (чанков) в системе
+    
+    Args:
+        limit: Размер страницы
+        cursor: next_cursor из предыдущего ответа (без него - первая страница)
+        filename: Только чанки этого файла
+        upload_batch: Только чанки этой загрузки
+        tenant: Арендатор
     
     Returns:
-        Список документов с метаданными
+        Страница документов с метаданными и курсор следующей страницы
     """
     initialize_rag_system()
     
+    where = {}
+    if filename:
+        where["filename"] = filename
+    if upload_batch:
+        where["upload_batch"] = upload_batch
+    
     try:
-        # Получаем статус системы
-        status = rag_system.get_status()
-        
-        # Получаем документы из векторной БД
-        all_data = rag_system.vector_store.collection.get()
-        
-        documents = []
-        if all_data['ids']:
-            for i, doc_id in enumerate(all_data['ids']):
-                metadata = all_data['metadatas'][i] if all_data['metadatas'] else {}
-                documents.append({
-                    "id": doc_id,
-                    "filename": metadata.get('filename', 'Unknown'),
-                    "content_length": metadata.get('content_length', 0),
-                    "file_extension": metadata.get('file_extension', ''),
-                    "chunk_index": metadata.get('chunk_index', 0),
-                    "total_chunks": metadata.get('total_chunks', 1),
-                    "content_preview": all_data['documents'][i][:100] + "..." if len(all_data['documents'][i]) > 100 else all_data['documents'][i]
-                })
+        # Только метаданные и превью одной страницы, без текстов и эмбеддингов
+        # (пул поиска, а не загрузки: список не ждет окончания долгой загрузки)
+        page = await rag_system.embeddings_executor.run(
+            rag_system.list_documents, limit, cursor, where or None, tenant
+        )
         
         return {
-            "total_documents": status["vector_store"]["documents_count"],
-            "documents": documents,
-            "system_status": status
+            "total_documents": page["total_documents"],
+            "documents": page["documents"],
+            "next_cursor": page["next_cursor"],
+            # Счетчики, которые поддерживаются при записи: без обращения к индексу и файлам
+            "system_status": rag_system.get_health()
         }
         
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Некорректный запрос: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка получения списка: {str(e)}")
 
+@router.get("/documents/sources")
+async def list_sources(tenant: Optional[str] = None):
+    """
+    Загруженные файлы: количество чанков и байт по каждому источнику
+    
+    Returns:
+        Список источников и общие счетчики
+    """
+    initialize_rag_system()
+    
+    try:
+        # Коллекция арендатора может быть закрыта: открытие - в пуле, не в event loop
+        summary = await rag_system.embeddings_executor.run(rag_system.get_sources, tenant)
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "total_chunks": summary["chunks"],
+        "text_bytes": summary["text_bytes"],
+        "vector_bytes": summary["vector_bytes"],
+        "sources": summary["sources"]
+    }
+
+@router.post("/documents/flush")
+async def flush_documents(tenant: Optional[str] = None):
+    """
+    Записать буфер загрузки в векторную БД (при VECTOR_WRITE_BUFFER_SIZE > 0)
+    
+    Returns:
+        Количество записанных чанков
+    """
+    initialize_rag_system()
+    
+    try:
+        written = await rag_system.ingest_executor.run(rag_system.flush_documents, tenant)
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка записи: {str(e)}")
+    
+    return {"message": "Буфер записан", "written_chunks": written}
+
+@router.delete("/documents/source/{source}")
+async def delete_source(source: str, tenant: Optional[str] = None):
+    """
+    Удалить все чанки загруженного файла
+    
+    Args:
+        source: Имя файла или source_id
+        tenant: Арендатор
+        
+    Returns:
+        Количество удаленных чанков
+    """
+    initialize_rag_system()
+    
+    try:
+        removed = await rag_system.ingest_executor.run(rag_system.delete_source, source, tenant)
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка удаления: {str(e)}")
+    
+    if not removed:
+        raise HTTPException(status_code=404, detail="Источник не найден")
+    return {"message": f"Источник {source} удален", "removed_chunks": removed}
+
 @router.delete("/documents/{doc_id}")
-async def delete_document(doc_id: str):
+async def delete_document(doc_id: str, tenant: Optional[str] = None):
     """
     Удалить документ из системы
     
     Args:
         doc_id: ID документа для удаления
+        tenant: Арендатор
         
     Returns:
         Статус удаления
@@ -275,13 +522,19 @@ async def delete_document(doc_id: str):
     initialize_rag_system()
     
     try:
-        success = rag_system.vector_store.delete_document(doc_id)
+        success = await rag_system.ingest_executor.run(rag_system.delete_document, doc_id, tenant)
         
         if success:
             return {"message": f"Документ {doc_id} успешно удален"}
         else:
             raise HTTPException(status_code=404, detail="Документ не найден")
             
+    except HTTPException:
+        raise
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка удаления: {str(e)}")
 
@@ -291,15 +544,10 @@ async def health_check():
     initialize_rag_system()
     
     try:
-        status = rag_system.get_status()
-        
+        # Счетчики поддерживаются при записи: проверка не обращается к индексу
         return {
             "status": "healthy",
-            "system_status": status["system_status"],
-            "documents_count": status["vector_store"]["documents_count"],
-            "embeddings_model": status["embeddings_service"]["model"],
-            "llm_status": status["llm_service"]["status"],
-            "llm_provider": status["llm_service"]["provider"]
+            **rag_system.get_health()
         }
         
     except Exception as e:
@@ -308,6 +556,31 @@ async def health_check():
             "error": str(e)
         }
 
+@router.get("/status")
+async def get_system_status(include_recall: bool = False):
+    """
+    Полный статус системы: модели, пулы, коллекция и арендаторы
+    
+    Args:
+        include_recall: Измерить recall квантованного поиска (после изменения индекса - проход по всем векторам)
+    """
+    initialize_rag_system()
+    
+    try:
+        # get_status опрашивает модель, коллекции и пулы под их блокировками - в пуле, а не в event loop
+        return await rag_system.embeddings_executor.run(rag_system.get_status, include_recall)
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка получения статуса: {str(e)}")
+
+@router.get("/tenants")
+async def get_tenants():
+    """Открытые коллекции арендаторов и статистика LRU (попадания, открытия, вытеснения)"""
+    initialize_rag_system()
+
+    return rag_system.tenants.get_stats()
+
 @router.post("/simple-chat", response_model=SimpleChatResponse)
 async def simple_chat(request: SimpleChatRequest):
     """
@@ -323,25 +596,98 @@ async def simple_chat(request: SimpleChatRequest):
     
     try:
         # Используем RAG систему для чата
-        response = rag_system.chat(request.message, request.history)
+        response = await rag_system.achat(request.message, request.history, tenant=request.tenant)
         
         return SimpleChatResponse(
             response=response["answer"],
             message=request.message
         )
         
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"❌ Ошибка в чате: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Ошибка чата: {str(e)}")
 
+@router.get("/embeddings/parity")
+async def get_embeddings_parity():
+    """Сравнить эмбеддинги текущего бэкенда (onnx/onnx-int8) с torch"""
+    initialize_rag_system()
+
+    try:
+        # Кодирует тексты двумя моделями - в пуле эмбеддингов, а не в event loop
+        return await rag_system.embeddings_executor.run(rag_system.embeddings_service.check_backend_parity)
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка проверки бэкенда: {str(e)}")
+
+@router.post("/embeddings/projection/fit")
+async def fit_embeddings_projection(request: ProjectionFitRequest):
+    """Отчет recall@k для уменьшенной размерности и обучение проекции"""
+    initialize_rag_system()
+
+    try:
+        # Кодирование выборки корпуса и PCA - долгая задача, в пуле загрузки
+        return await rag_system.ingest_executor.run(
+            rag_system.fit_projection,
+            method=request.method,
+            dim=request.dim,
+            dims=request.dims,
+            k=request.k,
+            sample_size=request.sample_size
+        )
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка обучения проекции: {str(e)}")
+
+@router.post("/snapshots/export")
+async def export_snapshot(request: SnapshotExportRequest):
+    """Выгрузить векторную БД в снимок (эмбеддинги, тексты и метаданные чанков)"""
+    initialize_rag_system()
+
+    try:
+        return await rag_system.ingest_executor.run(rag_system.export_snapshot, request.name, request.tenant)
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка экспорта: {str(e)}")
+
+@router.post("/snapshots/import")
+async def import_snapshot(request: SnapshotImportRequest):
+    """Загрузить снимок без повторного расчета эмбеддингов"""
+    initialize_rag_system()
+
+    try:
+        return await rag_system.ingest_executor.run(
+            rag_system.import_snapshot, request.name, request.replace, request.tenant
+        )
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка импорта: {str(e)}")
+
 @router.get("/llm-status")
 async def get_llm_status():
     """Получить статус LLM сервиса"""
     initialize_rag_system()
     
     try:
-        status = rag_system.get_status()
+        status = await rag_system.llm_executor.run(rag_system.get_status)
         return status["llm_service"]
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         return {
             "error": str(e),
@@ -350,8 +696,8 @@ async def get_llm_status():
 
 @router.post("/configure-llm")
 async def configure_llm(config: LLMConfigRequest):
-    """Настроить LLM провайдер"""
-    global rag_system
+    """Настроить LLM провайдер (без перезагрузки эмбеддингов и векторной БД)"""
+    initialize_rag_system()
     
     try:
         # Устанавливаем API ключ если предоставлен
@@ -361,17 +707,24 @@ async def configure_llm(config: LLMConfigRequest):
             elif config.provider == "anthropic":
                 os.environ['ANTHROPIC_API_KEY'] = config.api_key
         
-        # Пересоздаем RAG систему с новыми настройками
-        rag_system = None  # Сбрасываем текущую систему
-        initialize_rag_system()
+        # Подменяем только LLM сервис, текущие запросы дорабатывают на старом;
+        # создание сервиса (загрузка локальной модели) - в пуле LLM
+        llm_status = await rag_system.areconfigure_llm(config.provider, config.model)
+        if not llm_status["applied"]:
+            raise HTTPException(status_code=409, detail="Пока LLM создавался, применена более новая настройка")
         
         return {
             "status": "success",
             "message": f"LLM настроен: {config.provider} - {config.model}",
             "provider": config.provider,
-            "model": config.model
+            "model": config.model,
+            "llm_status": llm_status["current"]
         }
         
+    except HTTPException:
+        raise
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка настройки LLM: {str(e)}")
 
@@ -414,17 +767,23 @@ async def get_llm_providers():
     }
 
 @router.delete("/clear-database")
-async def clear_database():
-    """Очистить всю базу данных документов"""
+async def clear_database(tenant: Optional[str] = None):
+    """Очистить всю базу данных документов (или коллекцию арендатора)"""
     initialize_rag_system()
     
     try:
-        success = rag_system.clear_database()
+        removed = await rag_system.ingest_executor.run(rag_system.clear_database, tenant)
         
-        if success:
-            return {"message": "База данных успешно очищена"}
+        if removed is not None:
+            return {"message": "База данных успешно очищена", "removed_chunks": removed}
         else:
             raise HTTPException(status_code=500, detail="Ошибка очистки базы данных")
             
+    except HTTPException:
+        raise
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка очистки: {str(e)}")
\ No newline at end of file
@@ -19,7 +19,37 @@ class Settings(BaseSettings):
     LLM_PROVIDER: str = "openai"  # or "ollama"
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
-    
+    EMBEDDINGS_CACHE_DIR: str = "./data/embeddings_cache"  # "" - только кэш в памяти
+    EMBEDDINGS_CACHE_SIZE: int = 10000  # векторов в LRU, 0 - выключен
+    EMBEDDINGS_BACKEND: str = "torch"  # torch, onnx, onnx-int8
+    EMBEDDINGS_BATCH_SIZE: int = 32
+    EMBEDDINGS_MAX_BATCH_TOKENS: int = 16384  # токенов с паддингом на forward pass
+    EMBEDDINGS_LENGTH_BUCKETING: bool = True  # группировать тексты по длине перед forward pass
+    QUERY_BATCH_WAIT_MS: float = 5.0  # окно микробатчинга запросов
+    QUERY_BATCH_MAX_SIZE: int = 32  # 1 - микробатчинг выключен
+    INGEST_WORKERS: int = 0  # процессов эмбеддингов для массовой загрузки, 0 - выключено
+    EMBEDDINGS_PROJECTION: str = "none"  # none, pca, truncate (после смены - перезагрузить документы)
+    EMBEDDINGS_PROJECTION_DIM: int = 0  # размерность для truncate
+    EMBEDDINGS_PROJECTION_PATH: str = "./data/projections/projection.npz"  # обученная PCA
+    VECTOR_QUANTIZATION: str = ""  # none, int8, binary для новой коллекции (пусто - как сохранено)
+    VECTOR_RESCORE_FACTOR: int = 4  # запас кандидатов для точного пересчета
+    VECTOR_BACKEND: str = "chroma"  # chroma, flat (точный FAISS/NumPy), hnsw (FAISS)
+    VECTOR_HNSW_M: int = 32
+    VECTOR_HNSW_EF_CONSTRUCTION: int = 200
+    VECTOR_HNSW_EF_SEARCH: int = 64
+    VECTOR_CHROMA_MEMORY_LIMIT_BYTES: int = 0  # LRU сегментов ChromaDB на все коллекции, 0 - без лимита
+    VECTOR_WRITE_BATCH_SIZE: int = 1000  # чанков в одной записи в векторную БД
+    VECTOR_WRITE_BUFFER_SIZE: int = 0  # буфер записи между документами, 0 - выключен
+    VECTOR_SHARDS: int = 1  # шардов векторной БД; смена - офлайн: python -m ml.rag_bot.backends.sharded
+    VECTOR_SPACE: str = ""  # cosine, l2 для новой коллекции (пусто - как сохранено, новая - cosine)
+    MAX_OPEN_TENANTS: int = 32  # коллекций арендаторов, открытых одновременно (LRU)
+    RAG_MIN_SIMILARITY: float = 0.0  # порог косинусной близости чанков для search/ask, 0 - выключен
+    SNAPSHOTS_DIR: str = "./data/snapshots"  # снимки векторной БД для переноса между узлами
+    EMBEDDINGS_EXECUTOR_WORKERS: int = 8  # потоков для эмбеддингов и поиска в API
+    LLM_EXECUTOR_WORKERS: int = 4  # потоков для генерации LLM в API
+    INGEST_EXECUTOR_WORKERS: int = 1  # потоков для загрузки документов в API
+    EXECUTOR_MAX_PENDING: int = 64  # очередь каждого пула, сверх - 503
+
     # Environment
     ENVIRONMENT: str = "development"
     DEBUG: bool = True
@@ -1,12 +1,25 @@
 # RAG Bot package
 from .embeddings_service import EmbeddingsService
+from .embedding_cache import EmbeddingCache
+from .micro_batcher import EmbeddingMicroBatcher
+from .embedding_pool import EmbeddingWorkerPool
+from .executors import BoundedExecutor, ExecutorBusyError
+from .projection import EmbeddingProjection
 from .vector_store import VectorStore
+from .tenants import TenantStores
 from .document_loader import DocumentLoader, Document
 from .llm_service import LLMService, ChatMessage
 
 __all__ = [
     'EmbeddingsService',
+    'EmbeddingCache',
+    'EmbeddingMicroBatcher',
+    'EmbeddingWorkerPool',
+    'BoundedExecutor',
+    'ExecutorBusyError',
+    'EmbeddingProjection',
     'VectorStore', 
+    'TenantStores',
     'DocumentLoader',
     'Document',
     'LLMService',
@@ -0,0 +1,50 @@
+"""
+Backends - реализации коллекций для VectorStore (ChromaDB, Flat, HNSW)
+"""
+from typing import Dict, Any, Optional
+
+from .base import VectorCollection
+from .local_backend import LocalCollection
+from .sharded import ShardedCollection, reshard_collection, shard_name
+
+VECTOR_BACKENDS = ("chroma", "flat", "hnsw")
+
+
+def create_collection(backend: str, db_path: str, collection_name: str,
+                      metadata: Optional[Dict[str, Any]] = None, shards: int = 1, **options) -> VectorCollection:
+    """
+    Открыть или создать коллекцию выбранного бэкенда
+
+    Args:
+        backend: 'chroma', 'flat' (точный поиск FAISS/NumPy) или 'hnsw' (FAISS HNSW)
+        db_path: Базовая директория векторной БД
+        collection_name: Название коллекции
+        metadata: Метаданные для новой коллекции
+        shards: Количество шардов (больше 1 - ShardedCollection с параллельным поиском)
+        options: Параметры HNSW (hnsw_m, hnsw_ef_construction, hnsw_ef_search)
+            или ChromaDB (memory_limit_bytes)
+    """
+    if shards > 1:
+        return ShardedCollection([
+            create_collection(backend, db_path, shard_name(collection_name, shard, shards), metadata=metadata, **options)
+            for shard in range(shards)
+        ])
+    if shards < 1:
+        raise ValueError(f"Shard count must be positive: {shards}")
+    if backend == "chroma":
+        # chromadb импортируется только при использовании этого бэкенда
+        from .chroma_backend import ChromaCollection
+        return ChromaCollection(db_path, collection_name, metadata=metadata, **options)
+    if backend in ("flat", "hnsw"):
+        return LocalCollection(db_path, collection_name, index_type=backend, metadata=metadata, **options)
+    raise ValueError(f"Unknown vector backend: {backend}")
+
+
+__all__ = [
+    'VectorCollection',
+    'LocalCollection',
+    'ShardedCollection',
+    'reshard_collection',
+    'VECTOR_BACKENDS',
+    'create_collection',
+]
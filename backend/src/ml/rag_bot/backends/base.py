@@ -0,0 +1,171 @@
+"""
+Base - общий интерфейс коллекции векторной БД
+"""
+from typing import List, Dict, Any, Optional, Iterator
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+# Поля, которые можно запросить в get/query (как в ChromaDB)
+INCLUDE_FIELDS = ("documents", "metadatas", "embeddings")
+
+# Длина превью текста чанка в списке документов
+PREVIEW_CHARS = 100
+
+
+def make_preview(text: str) -> str:
+    """Превью текста чанка (первые PREVIEW_CHARS символов)"""
+    return text[:PREVIEW_CHARS] + "..." if len(text) > PREVIEW_CHARS else text
+
+
+def parse_cursor(cursor: Optional[str]) -> int:
+    """Курсор страницы - неотрицательное целое в виде строки (None - первая страница)"""
+    if cursor is None or cursor == "":
+        return 0
+    try:
+        value = int(cursor)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    if value < 0:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return value
+
+
+class VectorCollection(ABC):
+    """
+    Коллекция чанков с эмбеддингами
+
+    Интерфейс повторяет используемую часть chromadb.Collection, поэтому
+    VectorStore одинаково работает с ChromaDB и с локальными индексами.
+    Расстояние - квадрат L2 (как в ChromaDB по умолчанию).
+    """
+
+    backend_name = "base"
+
+    @property
+    @abstractmethod
+    def metadata(self) -> Dict[str, Any]:
+        """Метаданные коллекции"""
+
+    @abstractmethod
+    def modify(self, metadata: Dict[str, Any]):
+        """Заменить метаданные коллекции"""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Количество чанков"""
+
+    @abstractmethod
+    def add(self, ids: List[str], embeddings: np.ndarray, documents: List[str], metadatas: List[Dict]):
+        """Добавить чанки"""
+
+    @abstractmethod
+    def query(self, query_embeddings: np.ndarray, n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None) -> Dict[str, List[List[Any]]]:
+        """
+        Ближайшие чанки для каждого запроса
+
+        Args:
+            where: Фильтр по метаданным (см. backends.filters), применяется во время поиска
+
+        Returns:
+            {'ids', 'documents', 'metadatas', 'distances'} - списки по запросам
+        """
+
+    @abstractmethod
+    def get(self, ids: Optional[List[str]] = None, limit: Optional[int] = None, offset: Optional[int] = None,
+            include: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Получить чанки по ID или страницу чанков (с фильтром where)
+
+        Returns:
+            {'ids', 'documents', 'metadatas', 'embeddings'} (невключенные поля - None)
+        """
+
+    def list_page(self, limit: int, cursor: Optional[str] = None,
+                  where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Страница чанков для списка документов: метаданные и превью, без текстов и эмбеддингов
+
+        По умолчанию курсор - смещение. Бэкенды с монотонным ключом строки
+        переопределяют метод, чтобы страница не зависела от номера.
+
+        Args:
+            limit: Размер страницы
+            cursor: next_cursor предыдущей страницы (None - первая страница)
+            where: Фильтр по метаданным
+
+        Returns:
+            {'ids', 'metadatas', 'previews', 'next_cursor'} (next_cursor None - последняя страница)
+        """
+        offset = parse_cursor(cursor)
+        # Лишняя запись показывает, есть ли следующая страница, без count()
+        data = self.get(limit=limit + 1, offset=offset, include=["metadatas"], where=where)
+        ids = data["ids"][:limit]
+        metadatas = [metadata or {} for metadata in (data["metadatas"] or [])[:limit]]
+
+        # Превью сохраняется в метаданных при записи; тексты читаются только для старых чанков
+        missing = [doc_id for doc_id, metadata in zip(ids, metadatas) if "content_preview" not in metadata]
+        texts = {}
+        if missing:
+            missing_data = self.get(ids=missing, include=["documents"])
+            texts = dict(zip(missing_data["ids"], missing_data["documents"] or []))
+
+        return {
+            "ids": ids,
+            "metadatas": metadatas,
+            "previews": [
+                metadata["content_preview"] if "content_preview" in metadata else make_preview(texts.get(doc_id) or "")
+                for doc_id, metadata in zip(ids, metadatas)
+            ],
+            "next_cursor": str(offset + len(ids)) if len(data["ids"]) > limit else None,
+        }
+
+    @abstractmethod
+    def delete(self, ids: List[str]):
+        """Удалить чанки по ID"""
+
+    def iter_pages(self, page_size: int = 5000, include: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Все чанки коллекции страницами (для экспорта и пересчета статистики)
+
+        По умолчанию страницы читаются через offset; бэкенды с ключом строки
+        переопределяют метод, чтобы чтение всей коллекции было линейным.
+        """
+        offset = 0
+        while True:
+            page = self.get(limit=page_size, offset=offset, include=include)
+            if not page["ids"]:
+                return
+            yield page
+            offset += len(page["ids"])
+
+    def delete_where(self, where: Dict[str, Any]) -> List[str]:
+        """
+        Удалить чанки, подходящие под фильтр
+
+        Returns:
+            ID удаленных чанков
+        """
+        ids = self.get(where=where, include=[])["ids"]
+        if ids:
+            self.delete(ids)
+        return ids
+
+    @abstractmethod
+    def drop(self):
+        """Удалить все чанки целиком (пересоздать хранилище с теми же метаданными коллекции)"""
+
+    @property
+    def max_batch_size(self) -> Optional[int]:
+        """Максимум чанков в одном add (None - без ограничения бэкенда)"""
+        return None
+
+    def load_index(self):
+        """Загрузить индекс поиска в память заранее, а не при первом query (если бэкенд грузит его лениво)"""
+
+    def close(self):
+        """Сохранить состояние и освободить ресурсы"""
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"backend": self.backend_name}
@@ -0,0 +1,121 @@
+"""
+Chroma Backend - коллекция в ChromaDB (PersistentClient)
+"""
+from typing import List, Dict, Any, Optional
+from pathlib import Path
+
+import chromadb
+from chromadb.config import Settings
+from chromadb.errors import ChromaError
+import numpy as np
+
+try:
+    from .base import VectorCollection
+    from .filters import to_chroma_where
+except ImportError:
+    from ml.rag_bot.backends.base import VectorCollection
+    from ml.rag_bot.backends.filters import to_chroma_where
+
+# Большие списки ID удаляются частями (лимит размера запроса SQLite внутри ChromaDB)
+_DELETE_BATCH = 5000
+
+
+class ChromaCollection(VectorCollection):
+    backend_name = "chroma"
+
+    def __init__(self, db_path: str, collection_name: str, metadata: Optional[Dict[str, Any]] = None,
+                 memory_limit_bytes: int = 0):
+        """
+        Открыть или создать коллекцию ChromaDB
+
+        Args:
+            db_path: Директория ChromaDB
+            collection_name: Название коллекции
+            metadata: Метаданные для новой коллекции
+            memory_limit_bytes: Лимит памяти векторных сегментов всех коллекций в db_path
+                (LRU кэш сегментов ChromaDB; 0 - без лимита). У всех коллекций одной
+                директории должен быть одинаковым: ChromaDB держит на нее одну систему
+        """
+        self.collection_name = collection_name
+        Path(db_path).mkdir(parents=True, exist_ok=True)
+        self.client = chromadb.PersistentClient(path=db_path, settings=self._client_settings(memory_limit_bytes))
+        try:
+            self.collection = self.client.get_collection(collection_name)
+        except (ValueError, ChromaError):
+            # Метаданные - только при создании: get_or_create в части версий ChromaDB
+            # перезаписывает ими метаданные существующей коллекции
+            self.collection = self.client.get_or_create_collection(collection_name, metadata=metadata)
+
+    @staticmethod
+    def _client_settings(memory_limit_bytes: int) -> Settings:
+        """
+        Настройки клиента: коллекции арендаторов делят одну систему ChromaDB и ее кэш сегментов
+
+        С лимитом давно не использованные векторные сегменты вытесняются из памяти. В ChromaDB 1.x
+        сегменты держит Rust слой без этой настройки - там память освобождается, когда закрыта
+        последняя коллекция директории (см. close).
+        """
+        if memory_limit_bytes > 0:
+            return Settings(chroma_segment_cache_policy="LRU", chroma_memory_limit_bytes=memory_limit_bytes)
+        return Settings()
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self.collection.metadata or {}
+
+    def modify(self, metadata: Dict[str, Any]):
+        self.collection.modify(metadata=metadata)
+
+    @property
+    def max_batch_size(self) -> Optional[int]:
+        return self.client.get_max_batch_size()
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def add(self, ids: List[str], embeddings: np.ndarray, documents: List[str], metadatas: List[Dict]):
+        self.collection.add(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def query(self, query_embeddings: np.ndarray, n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None) -> Dict[str, List[List[Any]]]:
+        # ChromaDB сам применяет фильтр по сегменту метаданных до поиска по векторам
+        return self.collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where=to_chroma_where(where) if where else None
+        )
+
+    def get(self, ids: Optional[List[str]] = None, limit: Optional[int] = None, offset: Optional[int] = None,
+            include: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self.collection.get(
+            ids=ids,
+            limit=limit,
+            offset=offset,
+            include=include if include is not None else ["documents", "metadatas"],
+            where=to_chroma_where(where) if where else None
+        )
+
+    def delete(self, ids: List[str]):
+        for start in range(0, len(ids), _DELETE_BATCH):
+            self.collection.delete(ids=ids[start:start + _DELETE_BATCH])
+
+    def drop(self):
+        # Удаление коллекции не зависит от числа чанков, в отличие от delete по всем ID
+        metadata = self.collection.metadata
+        self.client.delete_collection(self.collection_name)
+        self.collection = self.client.get_or_create_collection(self.collection_name, metadata=metadata)
+
+    def close(self):
+        """
+        Отпустить коллекцию и ссылку на общий клиент ChromaDB
+
+        Система ChromaDB (с индексами в памяти) останавливается, когда закрыта последняя
+        коллекция директории; вытесненный арендатор не держит ни объект коллекции, ни клиент.
+        """
+        if self.client is None:
+            return
+        self.collection = None
+        client, self.client = self.client, None
+        # close() с подсчетом ссылок на общую систему есть в chromadb 1.x
+        if hasattr(client, "close"):
+            client.close()
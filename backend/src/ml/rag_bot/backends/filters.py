@@ -0,0 +1,112 @@
+"""
+Filters - фильтры по метаданным в синтаксисе ChromaDB `where`
+
+Примеры:
+    {"filename": "report.pdf"}
+    {"file_extension": {"$in": [".pdf", ".docx"]}}
+    {"$and": [{"filename": "report.pdf"}, {"chunk_index": {"$lt": 3}}]}
+"""
+from typing import List, Dict, Any, Tuple
+import re
+
+COMPARISON_OPERATORS = {
+    "$eq": "=",
+    "$ne": "!=",
+    "$gt": ">",
+    "$gte": ">=",
+    "$lt": "<",
+    "$lte": "<=",
+}
+LIST_OPERATORS = {"$in": "IN", "$nin": "NOT IN"}
+LOGICAL_OPERATORS = {"$and": "AND", "$or": "OR"}
+
+Scalar = (str, int, float, bool)
+
+# Имена полей подставляются в JSON путь SQL (нужно для индексов по выражению)
+FIELD_NAME = re.compile(r"^[A-Za-z0-9_\-]+$")
+
+
+def validate_where(where: Dict[str, Any]):
+    """
+    Проверить фильтр (ошибки в фильтре - ValueError, а не ошибка бэкенда)
+    """
+    if not isinstance(where, dict) or not where:
+        raise ValueError("Filter must be a non-empty dict")
+
+    for key, value in where.items():
+        if key in LOGICAL_OPERATORS:
+            if not isinstance(value, list) or len(value) < 2:
+                raise ValueError(f"{key} expects a list of at least two filters")
+            for condition in value:
+                validate_where(condition)
+            continue
+
+        if not FIELD_NAME.match(key):
+            raise ValueError(f"Invalid metadata field: {key}")
+
+        if isinstance(value, dict):
+            if len(value) != 1:
+                raise ValueError(f"Field '{key}' expects exactly one operator")
+            operator, operand = next(iter(value.items()))
+            if operator in COMPARISON_OPERATORS:
+                if not isinstance(operand, Scalar):
+                    raise ValueError(f"{operator} expects a scalar value")
+            elif operator in LIST_OPERATORS:
+                if not isinstance(operand, list) or not operand or not all(isinstance(v, Scalar) for v in operand):
+                    raise ValueError(f"{operator} expects a non-empty list of scalars")
+            else:
+                raise ValueError(f"Unknown filter operator: {operator}")
+        elif not isinstance(value, Scalar):
+            raise ValueError(f"Field '{key}' expects a scalar value or an operator")
+
+
+def field_expression(field: str, column: str = "metadata") -> str:
+    """SQL выражение значения поля метаданных (совпадает с выражением индекса)"""
+    if not FIELD_NAME.match(field):
+        raise ValueError(f"Invalid metadata field: {field}")
+    return f"json_extract({column}, '$.\"{field}\"')"
+
+
+def where_to_sql(where: Dict[str, Any], column: str = "metadata") -> Tuple[str, List[Any]]:
+    """
+    Перевести фильтр в условие SQLite по JSON колонке метаданных
+
+    Returns:
+        SQL условие и параметры
+    """
+    validate_where(where)
+    clauses, params = [], []
+
+    for key, value in where.items():
+        if key in LOGICAL_OPERATORS:
+            parts = [where_to_sql(condition, column) for condition in value]
+            clauses.append("(" + f" {LOGICAL_OPERATORS[key]} ".join(sql for sql, _ in parts) + ")")
+            for _, part_params in parts:
+                params.extend(part_params)
+            continue
+
+        field = field_expression(key, column)
+        operator, operand = next(iter(value.items())) if isinstance(value, dict) else ("$eq", value)
+
+        if operator in LIST_OPERATORS:
+            placeholders = ",".join("?" * len(operand))
+            clauses.append(f"{field} {LIST_OPERATORS[operator]} ({placeholders})")
+            params.extend(operand)
+        else:
+            clauses.append(f"{field} {COMPARISON_OPERATORS[operator]} ?")
+            params.append(operand)
+
+    # Несколько полей на верхнем уровне - неявное AND (как в MongoDB)
+    return "(" + " AND ".join(clauses) + ")", params
+
+
+def to_chroma_where(where: Dict[str, Any]) -> Dict[str, Any]:
+    """ChromaDB требует ровно одно поле или оператор на каждом уровне - оборачиваем в $and"""
+    validate_where(where)
+    conditions = []
+    for key, value in where.items():
+        if key in LOGICAL_OPERATORS:
+            conditions.append({key: [to_chroma_where(condition) for condition in value]})
+        else:
+            conditions.append({key: value})
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
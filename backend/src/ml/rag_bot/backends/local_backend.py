@@ -0,0 +1,605 @@
+"""
+Local Backend - коллекции в памяти процесса (точный Flat и HNSW индексы FAISS/NumPy)
+
+Тексты, метаданные и float32 векторы хранятся в SQLite рядом с индексом;
+индекс загружается с диска (HNSW) или строится из SQLite (Flat) при load_index()
+или первом поиске. Коллекция, по которой не ищут напрямую (квантованный режим
+VectorStore), не держит float32 векторы в памяти.
+"""
+from typing import List, Dict, Any, Optional, Tuple, Iterator
+from pathlib import Path
+import json
+import sqlite3
+import threading
+
+import numpy as np
+
+try:
+    from .base import VectorCollection, INCLUDE_FIELDS, PREVIEW_CHARS, parse_cursor
+    from .filters import where_to_sql, field_expression
+    from ..vector_utils import as_float32_matrix
+except ImportError:
+    from ml.rag_bot.backends.base import VectorCollection, INCLUDE_FIELDS, PREVIEW_CHARS, parse_cursor
+    from ml.rag_bot.backends.filters import where_to_sql, field_expression
+    from ml.rag_bot.vector_utils import as_float32_matrix
+
+# Ограничение SQLite на число параметров в одном запросе
+_SQLITE_BATCH = 900
+
+# Поля метаданных с индексом в SQLite: фильтр по ним не сканирует всю коллекцию
+INDEXED_FIELDS = ("filename", "file_extension", "upload_batch", "source_id")
+
+
+def _import_faiss():
+    try:
+        import faiss
+        return faiss
+    except ImportError:
+        return None
+
+
+def _exact_search(queries: np.ndarray, vectors: np.ndarray, labels: np.ndarray, k: int,
+                  norms: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Точный поиск по матрице векторов: квадраты L2 и метки (n_queries, k); -1 - пустая позиция"""
+    k_found = min(k, len(labels))
+    distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+    result_labels = np.full((len(queries), k), -1, dtype=np.int64)
+    if k_found == 0:
+        return distances, result_labels
+
+    if norms is None:
+        norms = np.einsum("ij,ij->i", vectors, vectors)
+    # ||q - x||^2 = ||q||^2 - 2 q.x + ||x||^2
+    scores = np.einsum("ij,ij->i", queries, queries)[:, None] - 2.0 * (queries @ vectors.T) + norms
+    top = np.argpartition(scores, k_found - 1, axis=1)[:, :k_found]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(top_scores, axis=1)
+    distances[:, :k_found] = np.take_along_axis(top_scores, order, axis=1)
+    result_labels[:, :k_found] = labels[np.take_along_axis(top, order, axis=1)]
+    return distances, result_labels
+
+
+class _FlatIndex:
+    """Точный поиск: faiss.IndexFlatL2, без faiss - NumPy"""
+
+    persistent = False
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+        self._faiss = _import_faiss()
+        if self._faiss is not None:
+            self.index = self._faiss.IndexIDMap2(self._faiss.IndexFlatL2(dimension))
+        else:
+            self.vectors = np.empty((0, dimension), dtype=np.float32)
+            self.norms = np.empty(0, dtype=np.float32)
+            # Метки идут по возрастанию: строки загружаются ORDER BY row, новые номера
+            # (AUTOINCREMENT) больше старых, удаление порядок не меняет
+            self.labels = np.empty(0, dtype=np.int64)
+
+    @property
+    def engine(self) -> str:
+        return "faiss" if self._faiss is not None else "numpy"
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal if self._faiss is not None else len(self.labels)
+
+    def add(self, labels: np.ndarray, vectors: np.ndarray):
+        if self._faiss is not None:
+            self.index.add_with_ids(vectors, labels)
+            return
+        self.vectors = np.concatenate([self.vectors, vectors])
+        self.norms = np.concatenate([self.norms, np.einsum("ij,ij->i", vectors, vectors)])
+        self.labels = np.concatenate([self.labels, labels])
+
+    def remove(self, labels: np.ndarray):
+        if self._faiss is not None:
+            self.index.remove_ids(labels)
+            return
+        keep = ~np.isin(self.labels, labels)
+        self.vectors, self.norms, self.labels = self.vectors[keep], self.norms[keep], self.labels[keep]
+
+    def _rows(self, labels: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Строки NumPy индекса по меткам (двоичный поиск по возрастающим меткам)
+
+        Returns:
+            (номера строк, маска меток, которые есть в индексе)
+        """
+        if not len(self.labels):
+            return np.empty(0, dtype=np.int64), np.zeros(len(labels), dtype=bool)
+        positions = np.minimum(np.searchsorted(self.labels, labels), len(self.labels) - 1)
+        found = self.labels[positions] == labels
+        return positions[found], found
+
+    def search(self, queries: np.ndarray, k: int,
+               allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Квадраты L2 расстояний и метки (n_queries, k); -1 - пустая позиция
+
+        Args:
+            allowed: Метки, среди которых искать (фильтр по метаданным)
+        """
+        if self._faiss is not None:
+            params = None
+            if allowed is not None:
+                params = self._faiss.SearchParameters(sel=self._faiss.IDSelectorBatch(allowed))
+            return self.index.search(queries, k, params=params)
+
+        if allowed is None:
+            return _exact_search(queries, self.vectors, self.labels, k, self.norms)
+        rows, _ = self._rows(np.asarray(allowed, dtype=np.int64))
+        return _exact_search(queries, self.vectors[rows], self.labels[rows], k, self.norms[rows])
+
+    def vectors_for(self, labels: np.ndarray) -> np.ndarray:
+        """Векторы по меткам (для точного поиска по отфильтрованным строкам)"""
+        if self._faiss is not None:
+            return self.index.reconstruct_batch(labels)
+        rows, found = self._rows(labels)
+        if not found.all():
+            raise KeyError(f"Labels not in index: {labels[~found][:5].tolist()}")
+        return self.vectors[rows]
+
+    def needs_rebuild(self) -> bool:
+        return False
+
+    def memory_bytes(self) -> int:
+        if self._faiss is not None:
+            # Векторы IndexFlatL2 и метки IndexIDMap2
+            return self.ntotal * (self.dimension * 4 + 8)
+        return self.vectors.nbytes + self.norms.nbytes + self.labels.nbytes
+
+
+class _HNSWIndex:
+    """Приближенный поиск: faiss.IndexHNSWFlat (удаление - через пометки и перестройку)"""
+
+    persistent = True
+    engine = "faiss"
+
+    def __init__(self, dimension: int, m: int = 32, ef_construction: int = 200, ef_search: int = 64,
+                 index=None):
+        self._faiss = _import_faiss()
+        if self._faiss is None:
+            raise ImportError("HNSW backend requires faiss-cpu: pip install faiss-cpu")
+
+        self.dimension = dimension
+        self.ef_search = ef_search
+        if index is None:
+            hnsw = self._faiss.IndexHNSWFlat(dimension, m)
+            hnsw.hnsw.efConstruction = ef_construction
+            index = self._faiss.IndexIDMap2(hnsw)
+        self.index = index
+        self._faiss.downcast_index(self.index.index).hnsw.efSearch = ef_search
+        # HNSW в FAISS не поддерживает remove_ids: удаленные метки отфильтровываются при поиске
+        self.deleted = set()
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal - len(self.deleted)
+
+    def labels(self) -> np.ndarray:
+        return self._faiss.vector_to_array(self.index.id_map)
+
+    def add(self, labels: np.ndarray, vectors: np.ndarray):
+        self.index.add_with_ids(vectors, labels)
+
+    def remove(self, labels: np.ndarray):
+        self.deleted.update(int(label) for label in labels)
+
+    def search(self, queries: np.ndarray, k: int,
+               allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        fetch = min(self.index.ntotal, k + len(self.deleted))
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        labels = np.full((len(queries), k), -1, dtype=np.int64)
+        if fetch == 0:
+            return distances, labels
+
+        params = None
+        if allowed is not None:
+            # Фильтр применяется во время обхода графа, а не после него
+            params = self._faiss.SearchParametersHNSW(
+                sel=self._faiss.IDSelectorBatch(allowed),
+                efSearch=max(self.ef_search, fetch)
+            )
+        found_distances, found_labels = self.index.search(queries, fetch, params=params)
+        for row in range(len(queries)):
+            alive = [(d, l) for d, l in zip(found_distances[row], found_labels[row])
+                     if l != -1 and int(l) not in self.deleted][:k]
+            for column, (distance, label) in enumerate(alive):
+                distances[row, column] = distance
+                labels[row, column] = label
+        return distances, labels
+
+    def vectors_for(self, labels: np.ndarray) -> np.ndarray:
+        return self.index.reconstruct_batch(labels)
+
+    def needs_rebuild(self) -> bool:
+        # Пометки замедляют поиск и занимают память - перестраиваем, когда их много
+        return len(self.deleted) > max(1000, self.index.ntotal // 4)
+
+    def memory_bytes(self) -> int:
+        # Векторы, списки соседей графа и метки IndexIDMap2
+        hnsw = self._faiss.downcast_index(self.index.index).hnsw
+        return self.index.ntotal * (self.dimension * 4 + 8) + hnsw.neighbors.size() * 4
+
+    def save(self, path: Path):
+        self._faiss.write_index(self.index, str(path))
+
+    @classmethod
+    def load(cls, path: Path, dimension: int, ef_search: int = 64) -> "_HNSWIndex":
+        faiss = _import_faiss()
+        if faiss is None:
+            raise ImportError("HNSW backend requires faiss-cpu: pip install faiss-cpu")
+        return cls(dimension, ef_search=ef_search, index=faiss.read_index(str(path)))
+
+
+class LocalCollection(VectorCollection):
+    def __init__(self, db_path: str, collection_name: str, index_type: str = "flat",
+                 metadata: Optional[Dict[str, Any]] = None, hnsw_m: int = 32,
+                 hnsw_ef_construction: int = 200, hnsw_ef_search: int = 64,
+                 exact_filter_limit: int = 20000, indexed_fields: Tuple[str, ...] = INDEXED_FIELDS):
+        """
+        Открыть или создать локальную коллекцию
+
+        Args:
+            db_path: Базовая директория векторной БД
+            collection_name: Название коллекции
+            index_type: 'flat' (точный поиск) или 'hnsw' (приближенный, faiss)
+            metadata: Метаданные для новой коллекции
+            hnsw_m: Количество связей узла HNSW
+            hnsw_ef_construction: Ширина поиска при построении HNSW
+            hnsw_ef_search: Ширина поиска при запросе HNSW
+            exact_filter_limit: Если фильтру соответствует не больше строк - точный поиск только по ним
+            indexed_fields: Поля метаданных, по которым строится индекс SQLite
+        """
+        if index_type not in ("flat", "hnsw"):
+            raise ValueError(f"Unknown local index type: {index_type}")
+
+        self.backend_name = index_type
+        self.index_type = index_type
+        self.hnsw_params = {"m": hnsw_m, "ef_construction": hnsw_ef_construction, "ef_search": hnsw_ef_search}
+        self.exact_filter_limit = exact_filter_limit
+
+        self.path = Path(db_path) / index_type / collection_name
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._index_path = self.path / "index.faiss"
+
+        self._lock = threading.RLock()
+        self._connection: Optional[sqlite3.Connection] = sqlite3.connect(
+            str(self.path / "chunks.sqlite3"), check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "row INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT UNIQUE NOT NULL, "
+            "document TEXT, metadata TEXT, embedding BLOB NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS collection_meta (key TEXT PRIMARY KEY, value TEXT)")
+        for field in indexed_fields:
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_meta_{field.replace('-', '_')} ON chunks({field_expression(field)})"
+            )
+        self._conn.commit()
+
+        if self._get_meta("metadata") is None:
+            self._set_meta("metadata", metadata or {})
+
+        self.index = None
+        self._dirty = False
+        # Индекс в памяти нужен только для поиска по коллекции: строится при load_index() или первом query
+        self._index_wanted = False
+        dimension = self._get_meta("dimension")
+        self.dimension: Optional[int] = int(dimension) if dimension is not None else None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        if self._connection is None:
+            raise RuntimeError(f"Collection {self.path} is closed")
+        return self._connection
+
+    # --- метаданные коллекции ---
+
+    def _get_meta(self, key: str) -> Any:
+        row = self._conn.execute("SELECT value FROM collection_meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _set_meta(self, key: str, value: Any):
+        self._conn.execute("INSERT OR REPLACE INTO collection_meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+        self._conn.commit()
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        with self._lock:
+            return self._get_meta("metadata") or {}
+
+    def modify(self, metadata: Dict[str, Any]):
+        with self._lock:
+            self._set_meta("metadata", metadata)
+
+    # --- индекс ---
+
+    def _new_index(self, dimension: int):
+        if self.index_type == "hnsw":
+            return _HNSWIndex(dimension, **self.hnsw_params)
+        return _FlatIndex(dimension)
+
+    def _open_index(self, dimension: int):
+        """Загрузить индекс с диска и досинхронизировать его с SQLite"""
+        if self.index_type == "hnsw" and self._index_path.exists():
+            self.index = _HNSWIndex.load(self._index_path, dimension, ef_search=self.hnsw_params["ef_search"])
+            indexed = set(self.index.labels().tolist())
+            stored = {row for (row,) in self._conn.execute("SELECT row FROM chunks")}
+            # Индекс мог не сохраниться после последних изменений (например, при аварийной остановке)
+            self.index.deleted = indexed - stored
+            missing = sorted(stored - indexed)
+            if missing:
+                self._add_rows_to_index(missing)
+                self._dirty = True
+            return
+
+        self.index = self._new_index(dimension)
+        self._add_rows_to_index(None)
+        self._dirty = self.index.persistent
+
+    def _add_rows_to_index(self, rows: Optional[List[int]]):
+        """Добавить в индекс векторы из SQLite (rows=None - все)"""
+        if rows is None:
+            cursor = self._conn.execute("SELECT row, embedding FROM chunks ORDER BY row")
+            self._add_cursor_to_index(cursor)
+            return
+        for start in range(0, len(rows), _SQLITE_BATCH):
+            batch = rows[start:start + _SQLITE_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            cursor = self._conn.execute(f"SELECT row, embedding FROM chunks WHERE row IN ({placeholders})", batch)
+            self._add_cursor_to_index(cursor)
+
+    def _add_cursor_to_index(self, cursor, page_size: int = 10000):
+        while True:
+            page = cursor.fetchmany(page_size)
+            if not page:
+                break
+            labels = np.array([row for row, _ in page], dtype=np.int64)
+            vectors = np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob in page])
+            self.index.add(labels, vectors)
+
+    def _rebuild_index(self):
+        self.index = self._new_index(self.index.dimension)
+        self._add_rows_to_index(None)
+        self._dirty = self.index.persistent
+
+    def load_index(self):
+        with self._lock:
+            self._index_wanted = True
+            if self.index is None and self.dimension is not None:
+                self._open_index(self.dimension)
+
+    # --- операции коллекции ---
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def add(self, ids: List[str], embeddings: np.ndarray, documents: List[str], metadatas: List[Dict]):
+        vectors = as_float32_matrix(embeddings)
+        with self._lock:
+            if self.dimension is None:
+                self._set_meta("dimension", vectors.shape[1])
+                self.dimension = vectors.shape[1]
+            elif vectors.shape[1] != self.dimension:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match collection dimension {self.dimension}")
+            if self._index_wanted and self.index is None:
+                # До вставки: иначе новые строки попали бы в индекс дважды
+                self._open_index(self.dimension)
+
+            with self._conn:
+                cursor = self._conn.executemany(
+                    "INSERT INTO chunks (id, document, metadata, embedding) VALUES (?, ?, ?, ?)",
+                    [
+                        (doc_id, document, json.dumps(meta or {}, ensure_ascii=False), vector.tobytes())
+                        for doc_id, document, meta, vector in zip(ids, documents, metadatas, vectors)
+                    ]
+                )
+            # AUTOINCREMENT выдает подряд идущие номера строк внутри одной транзакции
+            last_row = self._conn.execute("SELECT MAX(row) FROM chunks").fetchone()[0]
+            if self.index is not None:
+                labels = np.arange(last_row - len(ids) + 1, last_row + 1, dtype=np.int64)
+                self.index.add(labels, vectors)
+                self._dirty = self.index.persistent
+
+    def _fetch_rows(self, rows: List[int]) -> Dict[int, Tuple[str, str, Dict]]:
+        result = {}
+        for start in range(0, len(rows), _SQLITE_BATCH):
+            batch = rows[start:start + _SQLITE_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            for row, doc_id, document, meta in self._conn.execute(
+                f"SELECT row, id, document, metadata FROM chunks WHERE row IN ({placeholders})", batch
+            ):
+                result[row] = (doc_id, document, json.loads(meta) if meta else {})
+        return result
+
+    def _filter_rows(self, where: Dict[str, Any]) -> np.ndarray:
+        """Номера строк, подходящих под фильтр (вычисляется в SQLite)"""
+        sql, params = where_to_sql(where)
+        rows = self._conn.execute(f"SELECT row FROM chunks WHERE {sql}", params).fetchall()
+        return np.array([row for (row,) in rows], dtype=np.int64)
+
+    def _search_index(self, queries: np.ndarray, n_results: int,
+                      where: Optional[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+        if where is None:
+            return self.index.search(queries, n_results)
+
+        allowed = self._filter_rows(where)
+        if len(allowed) <= self.exact_filter_limit:
+            # Селективный фильтр: время зависит от числа подходящих строк, а не от размера коллекции
+            return _exact_search(queries, self.index.vectors_for(allowed), allowed, n_results)
+        return self.index.search(queries, n_results, allowed=allowed)
+
+    def query(self, query_embeddings: np.ndarray, n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None) -> Dict[str, List[List[Any]]]:
+        queries = as_float32_matrix(query_embeddings)
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        with self._lock:
+            self.load_index()
+            if self.index is None:
+                for _ in queries:
+                    for field in results:
+                        results[field].append([])
+                return results
+
+            distances, labels = self._search_index(queries, n_results, where)
+            rows = self._fetch_rows(sorted({int(l) for l in labels.ravel() if l != -1}))
+
+        for query_distances, query_labels in zip(distances, labels):
+            found = [(int(l), float(d)) for d, l in zip(query_distances, query_labels) if int(l) in rows]
+            results["ids"].append([rows[l][0] for l, _ in found])
+            results["documents"].append([rows[l][1] for l, _ in found])
+            results["metadatas"].append([rows[l][2] for l, _ in found])
+            results["distances"].append([d for _, d in found])
+        return results
+
+    def get(self, ids: Optional[List[str]] = None, limit: Optional[int] = None, offset: Optional[int] = None,
+            include: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        include = include if include is not None else ["documents", "metadatas"]
+        unknown = set(include) - set(INCLUDE_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown include fields: {sorted(unknown)}")
+
+        with self._lock:
+            if ids is not None:
+                records = []
+                for start in range(0, len(ids), _SQLITE_BATCH):
+                    batch = ids[start:start + _SQLITE_BATCH]
+                    placeholders = ",".join("?" * len(batch))
+                    records.extend(self._conn.execute(
+                        f"SELECT id, document, metadata, embedding FROM chunks WHERE id IN ({placeholders}) ORDER BY row",
+                        batch
+                    ).fetchall())
+            else:
+                condition, params = where_to_sql(where) if where else ("1", [])
+                records = self._conn.execute(
+                    f"SELECT id, document, metadata, embedding FROM chunks WHERE {condition} "
+                    f"ORDER BY row LIMIT ? OFFSET ?",
+                    params + [limit if limit is not None else -1, offset or 0]
+                ).fetchall()
+
+        return self._records_to_result(records, include)
+
+    @staticmethod
+    def _records_to_result(records: List[Tuple], include: List[str]) -> Dict[str, Any]:
+        """Строки (id, document, metadata, embedding) в формат результата get"""
+        return {
+            "ids": [record[0] for record in records],
+            "documents": [record[1] for record in records] if "documents" in include else None,
+            "metadatas": [json.loads(record[2]) if record[2] else {} for record in records] if "metadatas" in include else None,
+            "embeddings": (
+                np.stack([np.frombuffer(record[3], dtype=np.float32) for record in records])
+                if records else np.empty((0, 0), dtype=np.float32)
+            ) if "embeddings" in include else None,
+        }
+
+    def iter_pages(self, page_size: int = 5000, include: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        include = include if include is not None else ["documents", "metadatas"]
+        after_row = 0
+        while True:
+            # Страница по первичному ключу: без OFFSET чтение всей коллекции линейное
+            with self._lock:
+                records = self._conn.execute(
+                    "SELECT row, id, document, metadata, embedding FROM chunks WHERE row > ? ORDER BY row LIMIT ?",
+                    (after_row, page_size)
+                ).fetchall()
+            if not records:
+                return
+            after_row = records[-1][0]
+            yield self._records_to_result([record[1:] for record in records], include)
+
+    def list_page(self, limit: int, cursor: Optional[str] = None,
+                  where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        # Курсор - номер последней строки: страница по первичному ключу, без OFFSET,
+        # а превью обрезается в SQLite и полный текст чанка не читается
+        after_row = parse_cursor(cursor)
+        condition, params = where_to_sql(where) if where else ("1", [])
+        with self._lock:
+            records = self._conn.execute(
+                f"SELECT row, id, metadata, substr(document, 1, ?), length(document) > ? FROM chunks "
+                f"WHERE row > ? AND {condition} ORDER BY row LIMIT ?",
+                [PREVIEW_CHARS, PREVIEW_CHARS, after_row] + params + [limit + 1]
+            ).fetchall()
+
+        page = records[:limit]
+        return {
+            "ids": [record[1] for record in page],
+            "metadatas": [json.loads(record[2]) if record[2] else {} for record in page],
+            "previews": [(record[3] or "") + ("..." if record[4] else "") for record in page],
+            "next_cursor": str(page[-1][0]) if len(records) > limit else None,
+        }
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            rows = []
+            for start in range(0, len(ids), _SQLITE_BATCH):
+                batch = ids[start:start + _SQLITE_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows.extend(row for (row,) in self._conn.execute(
+                    f"SELECT row FROM chunks WHERE id IN ({placeholders})", batch
+                ))
+            self._delete_rows(rows)
+
+    def delete_where(self, where: Dict[str, Any]) -> List[str]:
+        sql, params = where_to_sql(where)
+        with self._lock:
+            records = self._conn.execute(f"SELECT row, id FROM chunks WHERE {sql}", params).fetchall()
+            self._delete_rows([row for row, _ in records])
+        return [doc_id for _, doc_id in records]
+
+    def _delete_rows(self, rows: List[int]):
+        if not rows:
+            return
+
+        with self._conn:
+            self._conn.executemany("DELETE FROM chunks WHERE row = ?", [(row,) for row in rows])
+        if self.index is None:
+            # Незагруженный индекс досинхронизируется с SQLite при загрузке
+            return
+        self.index.remove(np.array(rows, dtype=np.int64))
+        if self.index.needs_rebuild():
+            self._rebuild_index()
+        self._dirty = self.index.persistent
+
+    def drop(self):
+        with self._lock:
+            # DELETE без WHERE SQLite выполняет очисткой таблицы, без удаления строк по одной
+            with self._conn:
+                self._conn.execute("DELETE FROM chunks")
+                self._conn.execute("DELETE FROM collection_meta WHERE key = 'dimension'")
+            self._index_path.unlink(missing_ok=True)
+            self.index = None
+            self.dimension = None
+            self._dirty = False
+
+    def close(self):
+        """Сохранить HNSW индекс на диск и закрыть SQLite (дальнейшие операции - RuntimeError)"""
+        with self._lock:
+            if self._connection is None:
+                return
+            if self._dirty and self.index is not None:
+                self.index.save(self._index_path)
+                self._dirty = False
+            self.index = None
+            self._connection.close()
+            self._connection = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {
+                "backend": self.backend_name,
+                "engine": self.index.engine if self.index is not None else None,
+                "path": str(self.path),
+                "index_loaded": self.index is not None,
+                "indexed_vectors": self.index.ntotal if self.index is not None else 0,
+                "memory_bytes": self.index.memory_bytes() if self.index is not None else 0,
+                "disk_bytes": sum(path.stat().st_size for path in self.path.iterdir() if path.is_file()),
+            }
+            if self.index_type == "hnsw":
+                stats["hnsw"] = self.hnsw_params
+                stats["deleted_marks"] = len(self.index.deleted) if self.index is not None else 0
+            return stats
@@ -0,0 +1,261 @@
+"""
+Sharded - коллекция из N шардов одного бэкенда с параллельным поиском (scatter-gather)
+
+Чанки распределяются по хешу источника (source_id, у старых чанков - имя файла),
+поэтому все чанки одного файла лежат в одном шарде. Поиск выполняется во всех
+шардах параллельно, точные top-k шардов сливаются в общий top-k - результат тот
+же, что у одной коллекции.
+
+Перешардирование (смена количества шардов) - офлайн, при остановленном сервере:
+    python -m ml.rag_bot.backends.sharded --backend flat --from-shards 1 --to-shards 4
+"""
+from typing import List, Dict, Any, Optional, Iterator, Callable
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import hashlib
+import heapq
+
+import numpy as np
+
+try:
+    from .base import VectorCollection, parse_cursor
+except ImportError:
+    from ml.rag_bot.backends.base import VectorCollection, parse_cursor
+
+
+def shard_name(collection_name: str, shard: int, shards: int) -> str:
+    """Имя коллекции шарда (один шард - исходное имя, совместимо с несегментированной БД)"""
+    if shards == 1:
+        return collection_name
+    return f"{collection_name}_{shard}of{shards}"
+
+
+def shard_for(doc_id: str, metadata: Optional[Dict[str, Any]], shards: int) -> int:
+    """Номер шарда чанка по ключу источника"""
+    metadata = metadata or {}
+    key = metadata.get("source_id") or metadata.get("filename") or doc_id
+    return int(hashlib.sha256(key.encode("utf-8")).hexdigest()[:8], 16) % shards
+
+
+class ShardedCollection(VectorCollection):
+    def __init__(self, shards: List[VectorCollection]):
+        """
+        Args:
+            shards: Открытые коллекции шардов (порядок определяет маршрутизацию)
+        """
+        if len(shards) < 2:
+            raise ValueError("ShardedCollection needs at least two shards")
+        self.shards = shards
+        self.backend_name = f"{shards[0].backend_name}x{len(shards)}"
+        # Поиск в шардах - в потоках: FAISS, SQLite и ChromaDB отпускают GIL на тяжелых операциях
+        self._executor = ThreadPoolExecutor(max_workers=len(shards), thread_name_prefix="rag-shard")
+
+    def _map(self, func: Callable[[VectorCollection], Any]) -> List[Any]:
+        """Выполнить операцию во всех шардах параллельно"""
+        return list(self._executor.map(func, self.shards))
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self.shards[0].metadata
+
+    def modify(self, metadata: Dict[str, Any]):
+        for shard in self.shards:
+            shard.modify(metadata)
+
+    @property
+    def max_batch_size(self) -> Optional[int]:
+        limits = [shard.max_batch_size for shard in self.shards if shard.max_batch_size]
+        return min(limits) if limits else None
+
+    def count(self) -> int:
+        return sum(self._map(lambda shard: shard.count()))
+
+    def add(self, ids: List[str], embeddings: np.ndarray, documents: List[str], metadatas: List[Dict]):
+        rows_by_shard: Dict[int, List[int]] = {}
+        for row, (doc_id, metadata) in enumerate(zip(ids, metadatas)):
+            rows_by_shard.setdefault(shard_for(doc_id, metadata, len(self.shards)), []).append(row)
+
+        for shard, rows in rows_by_shard.items():
+            self.shards[shard].add(
+                ids=[ids[row] for row in rows],
+                embeddings=embeddings[rows],
+                documents=[documents[row] for row in rows],
+                metadatas=[metadatas[row] for row in rows]
+            )
+
+    def query(self, query_embeddings: np.ndarray, n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None) -> Dict[str, List[List[Any]]]:
+        partial = self._map(lambda shard: shard.query(query_embeddings, n_results=n_results, where=where))
+
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for query_index in range(len(query_embeddings)):
+            candidates = []
+            for shard_result in partial:
+                if not shard_result["ids"]:
+                    continue
+                for position, distance in enumerate(shard_result["distances"][query_index]):
+                    candidates.append((distance, shard_result, position))
+            # Каждый шард вернул точный top-k по своим чанкам: общий top-k среди них
+            best = heapq.nsmallest(n_results, candidates, key=lambda candidate: candidate[0])
+            for field in results:
+                results[field].append([shard_result[field][query_index][position] for _, shard_result, position in best])
+        return results
+
+    def get(self, ids: Optional[List[str]] = None, limit: Optional[int] = None, offset: Optional[int] = None,
+            include: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        if ids is not None:
+            return self._concat(self._map(lambda shard: shard.get(ids=ids, include=include)), include)
+
+        # Страница поверх шардов подряд: смещение вычитается из размеров пропущенных шардов.
+        # Размер считается только у шарда, который смещение пропускает целиком; полный обход
+        # коллекции - через iter_pages и list_page (курсор по шардам, без смещений)
+        pages = []
+        offset = offset or 0
+        remaining = limit
+        for shard in self.shards:
+            if remaining is not None and remaining <= 0:
+                break
+            page = shard.get(limit=remaining, offset=offset, include=include, where=where)
+            if offset and not page["ids"]:
+                offset -= shard.count() if where is None else len(shard.get(where=where, include=[])["ids"])
+                continue
+            pages.append(page)
+            offset = 0
+            if remaining is not None:
+                remaining -= len(page["ids"])
+        return self._concat(pages, include)
+
+    @staticmethod
+    def _concat(pages: List[Dict[str, Any]], include: Optional[List[str]]) -> Dict[str, Any]:
+        include = include if include is not None else ["documents", "metadatas"]
+        result = {"ids": [doc_id for page in pages for doc_id in page["ids"]]}
+        for field in ("documents", "metadatas"):
+            result[field] = [value for page in pages for value in (page[field] or [])] if field in include else None
+        if "embeddings" in include:
+            matrices = [np.asarray(page["embeddings"], dtype=np.float32) for page in pages if len(page["ids"])]
+            result["embeddings"] = np.concatenate(matrices) if matrices else np.empty((0, 0), dtype=np.float32)
+        else:
+            result["embeddings"] = None
+        return result
+
+    def iter_pages(self, page_size: int = 5000, include: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        for shard in self.shards:
+            yield from shard.iter_pages(page_size, include=include)
+
+    def list_page(self, limit: int, cursor: Optional[str] = None,
+                  where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        # Курсор: "<шард>:<курсор внутри шарда>"
+        shard_index, inner = 0, None
+        if cursor:
+            head, _, inner = cursor.partition(":")
+            shard_index = parse_cursor(head)
+            inner = inner or None
+
+        result = {"ids": [], "metadatas": [], "previews": [], "next_cursor": None}
+        while shard_index < len(self.shards) and len(result["ids"]) < limit:
+            page = self.shards[shard_index].list_page(limit - len(result["ids"]), cursor=inner, where=where)
+            for field in ("ids", "metadatas", "previews"):
+                result[field].extend(page[field])
+            if page["next_cursor"] is not None:
+                inner = page["next_cursor"]
+            else:
+                shard_index, inner = shard_index + 1, None
+
+        if shard_index < len(self.shards):
+            result["next_cursor"] = f"{shard_index}:{inner or ''}"
+        return result
+
+    def delete(self, ids: List[str]):
+        self._map(lambda shard: shard.delete(ids))
+
+    def delete_where(self, where: Dict[str, Any]) -> List[str]:
+        return [doc_id for removed in self._map(lambda shard: shard.delete_where(where)) for doc_id in removed]
+
+    def drop(self):
+        self._map(lambda shard: shard.drop())
+
+    def load_index(self):
+        self._map(lambda shard: shard.load_index())
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
+        self._executor.shutdown(wait=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        # Количество чанков - в статистике VectorStore, шарды не пересчитываются
+        shards = [shard.get_stats() for shard in self.shards]
+        stats = {"backend": self.backend_name, "shards": shards}
+        for field in ("memory_bytes", "disk_bytes"):
+            if all(field in shard for shard in shards):
+                stats[field] = sum(shard[field] for shard in shards)
+        return stats
+
+
+def reshard_collection(backend: str, db_path: str, collection_name: str, from_shards: int, to_shards: int,
+                       page_size: int = 5000, **options) -> int:
+    """
+    Перераспределить чанки коллекции на другое количество шардов (офлайн, сервер остановлен)
+
+    Чанки копируются вместе с эмбеддингами, затем старые шарды удаляются.
+
+    Args:
+        backend: Бэкенд шардов ('chroma', 'flat', 'hnsw')
+        db_path: Директория векторной БД
+        collection_name: Название коллекции
+        from_shards: Текущее количество шардов
+        to_shards: Новое количество шардов
+        page_size: Чанков за одно чтение
+        options: Параметры бэкенда (см. create_collection)
+
+    Returns:
+        Количество перенесенных чанков
+    """
+    try:
+        from . import create_collection
+    except ImportError:
+        from ml.rag_bot.backends import create_collection
+
+    if from_shards == to_shards:
+        return 0
+    if from_shards < 1 or to_shards < 1:
+        raise ValueError("Shard count must be positive")
+
+    source = create_collection(backend, db_path, collection_name, shards=from_shards, **options)
+    target = create_collection(backend, db_path, collection_name, metadata=source.metadata,
+                               shards=to_shards, **options)
+    if target.count():
+        raise RuntimeError(f"Target layout with {to_shards} shards is not empty")
+
+    moved = 0
+    for page in source.iter_pages(page_size, include=["documents", "metadatas", "embeddings"]):
+        target.add(
+            ids=page["ids"],
+            embeddings=np.asarray(page["embeddings"], dtype=np.float32),
+            documents=page["documents"],
+            metadatas=page["metadatas"]
+        )
+        moved += len(page["ids"])
+        print(f"🔀 Перенесено {moved} чанков")
+
+    source.drop()
+    source.close()
+    target.close()
+    print(f"✅ Коллекция '{collection_name}': {from_shards} -> {to_shards} шардов, {moved} чанков")
+    return moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Офлайн перешардирование векторной БД")
+    parser.add_argument("--backend", default="chroma", choices=["chroma", "flat", "hnsw"])
+    parser.add_argument("--db-path", default="./data/vector_db")
+    parser.add_argument("--collection", default="documents")
+    parser.add_argument("--from-shards", type=int, required=True)
+    parser.add_argument("--to-shards", type=int, required=True)
+    args = parser.parse_args()
+
+    reshard_collection(args.backend, args.db_path, args.collection, args.from_shards, args.to_shards)
+
+
+if __name__ == "__main__":
+    main()
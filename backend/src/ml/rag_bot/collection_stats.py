@@ -0,0 +1,157 @@
+"""
+Collection Stats - счетчики коллекции, обновляемые при записи и удалении
+
+Количество чанков, байты и разбивка по источникам читаются без обращения
+к индексу, поэтому health check и статус стоят O(1).
+"""
+from typing import List, Dict, Any, Optional
+from pathlib import Path
+import json
+import threading
+
+
+class CollectionStats:
+    def __init__(self, path: str):
+        """
+        Args:
+            path: JSON файл, в котором счетчики сохраняются между запусками
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._set_empty()
+
+    def _set_empty(self):
+        self.chunks = 0
+        self.text_bytes = 0
+        self.vector_bytes = 0
+        self.sources: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def source_key(metadata: Optional[Dict[str, Any]]) -> str:
+        """Источник чанка: source_id, у старых чанков - имя файла"""
+        metadata = metadata or {}
+        return metadata.get("source_id") or metadata.get("filename") or "unknown"
+
+    def _apply(self, documents: List[str], metadatas: List[Dict], dimension: int, sign: int):
+        for document, metadata in zip(documents, metadatas):
+            text_bytes = len((document or "").encode("utf-8"))
+            key = self.source_key(metadata)
+            source = self.sources.setdefault(key, {
+                "source_id": key,
+                "filename": (metadata or {}).get("filename", "Unknown"),
+                "chunks": 0,
+                "text_bytes": 0,
+            })
+            source["chunks"] += sign
+            source["text_bytes"] += sign * text_bytes
+            if source["chunks"] <= 0:
+                del self.sources[key]
+
+            self.chunks += sign
+            self.text_bytes += sign * text_bytes
+            self.vector_bytes += sign * dimension * 4
+        self._dirty = True
+
+    def add(self, documents: List[str], metadatas: List[Dict], dimension: int):
+        """Учесть записанные чанки"""
+        with self._lock:
+            self._apply(documents, metadatas, dimension, 1)
+
+    def remove(self, documents: List[str], metadatas: List[Dict], dimension: int):
+        """Учесть удаленные чанки"""
+        with self._lock:
+            self._apply(documents, metadatas, dimension, -1)
+
+    def remove_source(self, source: str, removed_chunks: int):
+        """
+        Учесть удаление всех чанков источника (по source_id или имени файла)
+
+        Args:
+            source: source_id или имя файла
+            removed_chunks: Сколько чанков удалено на самом деле
+        """
+        with self._lock:
+            keys = [key for key, entry in self.sources.items() if key == source or entry["filename"] == source]
+            removed_text = sum(self.sources[key]["text_bytes"] for key in keys)
+            per_vector = self.vector_bytes // self.chunks if self.chunks else 0
+            for key in keys:
+                del self.sources[key]
+            self.chunks = max(0, self.chunks - removed_chunks)
+            self.text_bytes = max(0, self.text_bytes - removed_text)
+            self.vector_bytes = max(0, self.vector_bytes - removed_chunks * per_vector)
+            self._dirty = True
+
+    def reset(self):
+        """Коллекция очищена"""
+        with self._lock:
+            self._set_empty()
+            self._dirty = True
+
+    def rebuild(self, collection, page_size: int = 1000):
+        """Пересчитать счетчики проходом по коллекции (если сохраненные не совпали с ней)"""
+        sample = collection.get(limit=1, include=["embeddings"])
+        dimension = len(sample["embeddings"][0]) if sample["ids"] else 0
+
+        with self._lock:
+            self._set_empty()
+            for page in collection.iter_pages(page_size, include=["documents", "metadatas"]):
+                self._apply(page["documents"] or [], page["metadatas"] or [], dimension, 1)
+        self.save()
+
+    def load(self, expected_chunks: int) -> bool:
+        """
+        Загрузить сохраненные счетчики
+
+        Returns:
+            False, если файла нет или он не совпадает с коллекцией (нужен rebuild)
+        """
+        if not self.path.exists():
+            return False
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return False
+        if data.get("chunks") != expected_chunks:
+            return False
+
+        with self._lock:
+            self.chunks = data["chunks"]
+            self.text_bytes = data.get("text_bytes", 0)
+            self.vector_bytes = data.get("vector_bytes", 0)
+            self.sources = data.get("sources", {})
+            self._dirty = False
+        return True
+
+    def save(self):
+        """Сохранить счетчики на диск (если менялись)"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {
+                "chunks": self.chunks,
+                "text_bytes": self.text_bytes,
+                "vector_bytes": self.vector_bytes,
+                "sources": self.sources,
+            }
+            self._dirty = False
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        tmp_path.replace(self.path)
+
+    def get_summary(self) -> Dict[str, Any]:
+        """Счетчики коллекции без разбивки по источникам"""
+        with self._lock:
+            return {
+                "chunks": self.chunks,
+                "sources": len(self.sources),
+                "text_bytes": self.text_bytes,
+                "vector_bytes": self.vector_bytes,
+            }
+
+    def get_sources(self) -> List[Dict[str, Any]]:
+        """Чанки и байты по каждому источнику"""
+        with self._lock:
+            return sorted((dict(entry) for entry in self.sources.values()), key=lambda entry: entry["filename"])
@@ -67,16 +67,16 @@ class DocumentLoader:
             source=str(path.absolute())
         )
     
-    def load_directory(self, directory_path: str, extensions: Optional[List[str]] = None) -> List[Document]:
+    def list_files(self, directory_path: str, extensions: Optional[List[str]] = None) -> List[str]:
         """
-        Загрузить все файлы из директории
+        Найти все поддерживаемые файлы в директории (без чтения содержимого)
         
         Args:
             directory_path: Путь к директории
             extensions: Список расширений для фильтрации (например, ['.txt', '.pdf'])
             
         Returns:
-            Список Document объектов
+            Список путей к файлам
         """
         path = Path(directory_path)
 
@@ -86,15 +86,30 @@ class DocumentLoader:
         if extensions is None:
             extensions = ['.txt', '.md', '.pdf', '.docx', '.doc', '.py', '.js', '.html']
         
+        return [
+            str(file_path) for file_path in sorted(path.rglob("*"))
+            if file_path.is_file() and file_path.suffix.lower() in extensions
+        ]
+
+    def load_directory(self, directory_path: str, extensions: Optional[List[str]] = None) -> List[Document]:
+        """
+        Загрузить все файлы из директории
+        
+        Args:
+            directory_path: Путь к директории
+            extensions: Список расширений для фильтрации (например, ['.txt', '.pdf'])
+            
+        Returns:
+            Список Document объектов
+        """
         documents = []
-        for file_path in path.rglob("*"):
-            if file_path.is_file() and file_path.suffix.lower() in extensions:
-                try:
-                    document = self.load_file(str(file_path))
-                    documents.append(document)
-                except Exception as e:
-                    print(f"Ошибка при загрузке файла {file_path}: {e}")
-                    continue
+        for file_path in self.list_files(directory_path, extensions):
+            try:
+                document = self.load_file(file_path)
+                documents.append(document)
+            except Exception as e:
+                print(f"Ошибка при загрузке файла {file_path}: {e}")
+                continue
 
         print(f"Загружено {len(documents)} документов из {directory_path}")
         return documents
@@ -0,0 +1,190 @@
+"""
+Embedding Cache - двухуровневый кэш эмбеддингов (LRU в памяти + SQLite на диске)
+"""
+from typing import List, Dict, Any, Optional
+from collections import OrderedDict
+from pathlib import Path
+import hashlib
+import re
+import sqlite3
+import threading
+import unicodedata
+
+import numpy as np
+
+
+class EmbeddingCache:
+    def __init__(self, cache_dir: Optional[str] = "./data/embeddings_cache", max_entries: int = 10000):
+        """
+        Инициализация кэша эмбеддингов
+
+        Args:
+            cache_dir: Директория для дискового кэша (None - только память)
+            max_entries: Максимальное количество векторов в памяти (LRU)
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+        }
+
+        self._db = None
+        self._disk_entries = 0
+        self._disk_bytes = 0
+
+        if cache_dir:
+            Path(cache_dir).mkdir(parents=True, exist_ok=True)
+            db_file = Path(cache_dir) / "embeddings.sqlite3"
+            self._db = sqlite3.connect(str(db_file), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+            count, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+            ).fetchone()
+            self._disk_entries = count
+            self._disk_bytes = size
+            print(f"Кэш эмбеддингов на диске: {db_file} ({count} векторов)")
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """Нормализация текста перед хэшированием (Unicode NFC + пробелы)"""
+        text = unicodedata.normalize("NFC", text)
+        return re.sub(r'\s+', ' ', text).strip()
+
+    def make_key(self, namespace: str, text: str) -> str:
+        """
+        Ключ кэша: хэш от (имя модели, нормализованный текст)
+
+        Args:
+            namespace: Имя модели (и бэкенда), для которой посчитан вектор
+            text: Исходный текст
+        """
+        payload = f"{namespace}\x00{self.normalize_text(text)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Получить векторы по ключам
+
+        Args:
+            keys: Список ключей
+
+        Returns:
+            Список векторов (None для промахов)
+        """
+        results: List[Optional[np.ndarray]] = [None] * len(keys)
+        disk_lookup: Dict[str, List[int]] = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    results[i] = vector
+                else:
+                    disk_lookup.setdefault(key, []).append(i)
+
+            if disk_lookup and self._db is not None:
+                lookup_keys = list(disk_lookup.keys())
+                # SQLite ограничивает число параметров в запросе
+                for start in range(0, len(lookup_keys), 500):
+                    batch = lookup_keys[start:start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self._db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32)
+                        self._remember(key, vector)
+                        for i in disk_lookup.pop(key):
+                            results[i] = vector
+                            self._stats["disk_hits"] += 1
+
+            self._stats["misses"] += sum(len(indices) for indices in disk_lookup.values())
+
+        return results
+
+    def put_many(self, keys: List[str], vectors: np.ndarray) -> None:
+        """
+        Сохранить векторы в кэш (память + диск)
+
+        Args:
+            keys: Список ключей
+            vectors: Матрица векторов (по строке на ключ)
+        """
+        if len(keys) != len(vectors):
+            raise ValueError("Lengths of keys and vectors must match")
+
+        rows = []
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                vector = np.array(vector, dtype=np.float32)
+                vector.setflags(write=False)
+                self._remember(key, vector)
+                rows.append((key, vector.tobytes()))
+
+            if self._db is not None and rows:
+                before = self._db.total_changes
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO embeddings (key, vector) VALUES (?, ?)", rows
+                )
+                self._db.commit()
+                inserted = self._db.total_changes - before
+                if inserted:
+                    self._disk_entries += inserted
+                    self._disk_bytes += inserted * len(rows[0][1])
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        """Положить вектор в LRU (вызывается под блокировкой)"""
+        if self.max_entries <= 0:
+            return
+
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= previous.nbytes
+
+        self._memory[key] = vector
+        self._memory_bytes += vector.nbytes
+
+        while len(self._memory) > self.max_entries:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+            self._stats["evictions"] += 1
+
+    def clear(self) -> None:
+        """Очистить кэш (память и диск)"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM embeddings")
+                self._db.commit()
+                self._disk_entries = 0
+                self._disk_bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика кэша"""
+        with self._lock:
+            hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+            lookups = hits + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "max_entries": self.max_entries,
+                "disk_enabled": self._db is not None,
+                "disk_entries": self._disk_entries,
+                "disk_bytes": self._disk_bytes,
+            }
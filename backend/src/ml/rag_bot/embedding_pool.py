@@ -0,0 +1,166 @@
+"""
+Embedding Pool - пул процессов для кодирования чанков при массовой загрузке
+"""
+from typing import List, Dict, Any, Optional
+from concurrent.futures import Future, ProcessPoolExecutor
+import multiprocessing
+import os
+import threading
+
+import numpy as np
+
+# Сервис эмбеддингов внутри процесса-воркера (создается в initializer)
+_worker_service = None
+
+
+def _init_worker(model_name: str, backend: str, onnx_dir: str, batch_size: int,
+                 max_batch_tokens: int, length_bucketing: bool, threads_per_worker: int, niceness: int):
+    """Инициализация процесса-воркера: приоритет, потоки, загрузка модели"""
+    global _worker_service
+
+    # Воркеры не должны отнимать CPU у интерактивных запросов API
+    if niceness and hasattr(os, "nice"):
+        os.nice(niceness)
+
+    try:
+        import torch
+        torch.set_num_threads(threads_per_worker)
+    except ImportError:
+        pass
+
+    try:
+        from .embeddings_service import EmbeddingsService
+    except ImportError:
+        from ml.rag_bot.embeddings_service import EmbeddingsService
+
+    _worker_service = EmbeddingsService(
+        model_name,
+        cache=None,
+        backend=backend,
+        onnx_dir=onnx_dir,
+        batch_size=batch_size,
+        max_batch_tokens=max_batch_tokens,
+        length_bucketing=length_bucketing
+    )
+
+
+def _encode_in_worker(texts: List[str]) -> np.ndarray:
+    return _worker_service.encode_batch_array(texts)
+
+
+class EmbeddingWorkerPool:
+    def __init__(self, model_name: str, backend: str = "torch", onnx_dir: str = "./data/models/onnx",
+                 num_workers: Optional[int] = None, max_pending: int = 16, chunk_size: int = 64,
+                 threads_per_worker: int = 1, niceness: int = 10,
+                 batch_size: int = 32, max_batch_tokens: int = 16384, length_bucketing: bool = True):
+        """
+        Инициализация пула процессов эмбеддингов
+
+        Args:
+            model_name: Название модели (каждый воркер загружает свою копию)
+            backend: Бэкенд эмбеддингов ('torch', 'onnx', 'onnx-int8')
+            onnx_dir: Директория для экспортированных ONNX моделей
+            num_workers: Количество процессов (по умолчанию все ядра, кроме одного)
+            max_pending: Максимум заданий в очереди (submit блокируется при переполнении)
+            chunk_size: Сколько текстов отправлять воркеру в одном задании
+            threads_per_worker: Потоков torch на процесс
+            niceness: Понижение приоритета воркеров (0 - не менять)
+            batch_size: Размер батча модели внутри воркера
+            max_batch_tokens: Максимум токенов в батче модели внутри воркера
+            length_bucketing: Группировать тексты по длине внутри воркера
+        """
+        self.num_workers = num_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.max_pending = max_pending
+        self.chunk_size = chunk_size
+
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "texts": 0,
+        }
+        self._closed = False
+
+        # spawn: воркеры не наследуют потоки и состояние torch родительского процесса
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, backend, onnx_dir, batch_size, max_batch_tokens, length_bucketing,
+                      threads_per_worker, niceness)
+        )
+        print(f"Пул эмбеддингов запущен: {self.num_workers} процессов, очередь до {max_pending} заданий")
+
+    def submit(self, texts: List[str]) -> Future:
+        """
+        Отправить тексты на кодирование (блокируется, если очередь заполнена)
+
+        Returns:
+            Future с матрицей float32
+        """
+        if self._closed:
+            raise RuntimeError("Embedding pool is shut down")
+
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(_encode_in_worker, texts)
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._stats_lock:
+            self._stats["submitted"] += 1
+            self._stats["texts"] += len(texts)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future: Future):
+        self._slots.release()
+        with self._stats_lock:
+            if future.cancelled() or future.exception() is not None:
+                self._stats["failed"] += 1
+            else:
+                self._stats["completed"] += 1
+
+    def encode_batch_array(self, texts: List[str]) -> np.ndarray:
+        """
+        Закодировать тексты, распределив их по процессам
+
+        Returns:
+            Матрица float32 в порядке входных текстов
+        """
+        futures = [
+            self.submit(texts[start:start + self.chunk_size])
+            for start in range(0, len(texts), self.chunk_size)
+        ]
+        if not futures:
+            raise ValueError("No texts to encode")
+        return np.concatenate([future.result() for future in futures])
+
+    def shutdown(self, wait: bool = True):
+        """Остановить воркеры (wait=False отменяет задания, которые еще не начались)"""
+        if self._closed:
+            return
+        self._closed = True
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+        print("Пул эмбеддингов остановлен")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика пула"""
+        with self._stats_lock:
+            finished = self._stats["completed"] + self._stats["failed"]
+            return {
+                **self._stats,
+                "workers": self.num_workers,
+                "max_pending": self.max_pending,
+                "pending": self._stats["submitted"] - finished,
+                "closed": self._closed,
+            }
@@ -1,32 +1,422 @@
 """
 Embeddings Service - создание векторных представлений
 """
-from typing import List
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+from contextlib import contextmanager
 # sentence-transformers — это популярная библиотека для создания эмбеддингов (векторных представлений) текстов с помощью предобученных моделей на базе BERT, RoBERTa и других трансформеров.
 from sentence_transformers import SentenceTransformer
 import numpy as np
+import threading
+import time
+
+try:
+    from .embedding_cache import EmbeddingCache
+    from .vector_utils import normalize_rows
+    from .projection import EmbeddingProjection
+    from .onnx_backend import ONNX_BACKENDS, OnnxEmbeddingModel, check_parity
+except ImportError:
+    from ml.rag_bot.embedding_cache import EmbeddingCache
+    from ml.rag_bot.vector_utils import normalize_rows
+    from ml.rag_bot.projection import EmbeddingProjection
+    from ml.rag_bot.onnx_backend import ONNX_BACKENDS, OnnxEmbeddingModel, check_parity
+
+# Сколько текстов каждого батча токенизировать для калибровки символов на токен
+TOKEN_CALIBRATION_SAMPLE = 64
+
+
+def plan_length_buckets(lengths: np.ndarray, batch_size: int, max_batch_tokens: int) -> List[np.ndarray]:
+    """
+    Разбить тексты на батчи близкой длины, чтобы минимизировать паддинг
+
+    Args:
+        lengths: Длина каждого текста в токенах
+        batch_size: Максимальное количество текстов в батче
+        max_batch_tokens: Максимум токенов в батче с учетом паддинга (batch * max_len)
+
+    Returns:
+        Список массивов индексов (позиции во входном списке)
+    """
+    order = np.argsort(-lengths, kind="stable")
+    batches = []
+    current: List[int] = []
+    current_max = 0
+
+    for index in order:
+        length = int(lengths[index])
+        # Сортировка по убыванию: первый элемент батча задает его ширину
+        width = current_max if current else length
+        if current and (len(current) >= batch_size or (len(current) + 1) * width > max_batch_tokens):
+            batches.append(np.array(current))
+            current = []
+        if not current:
+            current_max = length
+        current.append(int(index))
+
+    if current:
+        batches.append(np.array(current))
+    return batches
+
+
+def padded_tokens(lengths: np.ndarray, batches: List[np.ndarray]) -> int:
+    """Сколько токенов (с паддингом) обработает модель для данного разбиения"""
+    return int(sum(len(batch) * lengths[batch].max() for batch in batches if len(batch)))
 
 
 class EmbeddingsService:
-    def __init__(self, model_name: str = "cointegrated/rubert-tiny2"):
+    def __init__(self, model_name: str = "cointegrated/rubert-tiny2", cache: Optional[EmbeddingCache] = None,
+                 backend: str = "torch", onnx_dir: str = "./data/models/onnx",
+                 batch_size: int = 32, max_batch_tokens: int = 16384, length_bucketing: bool = True,
+                 projection: Optional[EmbeddingProjection] = None):
+        """
+        Инициализация сервиса эмбеддингов
+
+        Args:
+            model_name: Название модели sentence-transformers
+            cache: Кэш эмбеддингов (None - без кэширования)
+            backend: Бэкенд инференса ('torch', 'onnx', 'onnx-int8')
+            onnx_dir: Директория для экспортированных ONNX моделей
+            batch_size: Максимальное количество текстов в одном forward pass
+            max_batch_tokens: Максимум токенов (с паддингом) в одном forward pass
+            length_bucketing: Группировать тексты по длине в токенах перед кодированием
+            projection: Проекция в меньшую размерность (None - полноразмерные векторы)
+        """
+        if backend != "torch" and backend not in ONNX_BACKENDS:
+            raise ValueError(f"Unknown embeddings backend: {backend}")
+
         self.model_name = model_name
-        print(f"Загружаем модель: {model_name}")
-        self.model = SentenceTransformer(model_name)
+        self.backend = backend
+        self.onnx_dir = onnx_dir
+        self.cache = cache
+        # Векторы разных бэкендов немного отличаются - не смешиваем их в кэше
+        self.cache_namespace = model_name if backend == "torch" else f"{model_name}@{backend}"
+
+        print(f"Загружаем модель: {model_name} ({backend})")
+        if backend == "torch":
+            self.model = SentenceTransformer(model_name)
+        else:
+            self.model = OnnxEmbeddingModel(model_name, export_dir=onnx_dir, quantize=backend == "onnx-int8")
+        self.dimension = self.model.get_sentence_embedding_dimension()
         print("Модель embeddings загружена")
-    
+
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.length_bucketing = length_bucketing
+        if projection is not None:
+            projection.check_dimension(self.dimension)
+        self.projection = projection
+
+        # Эталонная torch модель для check_backend_parity (загружается при первой проверке)
+        self._parity_reference = None
+        self._parity_lock = threading.Lock()
+
+        # Символов на токен: накопленное среднее по образцам каждого батча (см. _calibrate_token_lengths)
+        self._calibration_chars = 0
+        self._calibration_tokens = 0
+        self._special_tokens: Optional[int] = None
+
+        self._stats_lock = threading.Lock()
+        self._encode_stats = self._empty_encode_stats()
+        # Статистика, которую собирает текущий поток (см. track_encode_stats)
+        self._thread_stats = threading.local()
+
+    @staticmethod
+    def _empty_encode_stats() -> Dict[str, Any]:
+        return {
+            "texts": 0,
+            "tokens": 0,
+            "measured_texts": 0,
+            "measured_tokens": 0,
+            "padded_tokens": 0,
+            "unbucketed_padded_tokens": 0,
+            "forward_passes": 0,
+            "seconds": 0.0,
+        }
+
+    @contextmanager
+    def track_encode_stats(self) -> Iterator[Dict[str, Any]]:
+        """
+        Статистика forward pass только текущего потока (например, одной загрузки документов)
+
+        Общие счетчики get_encode_stats включают все потоки, в том числе запросы поиска.
+        Кодирование в пуле процессов сюда не попадает.
+        """
+        stats = self._empty_encode_stats()
+        previous = getattr(self._thread_stats, "stats", None)
+        self._thread_stats.stats = stats
+        try:
+            yield stats
+        finally:
+            self._thread_stats.stats = previous
+
     def encode(self, text: str) -> List[float]:
-       embeddings = self.model.encode(text)
-       return embeddings.tolist()
-    
+        """Совместимая обертка над encode_array (возвращает список float)"""
+        return self.encode_array(text).tolist()
+
     def encode_batch(self, texts: List[str]) -> List[List[float]]:
-        embeddings = self.model.encode(texts)
-        return embeddings.tolist()
+        """Совместимая обертка над encode_batch_array (возвращает списки float)"""
+        return self.encode_batch_array(texts).tolist()
+
+    def encode_array(self, text: str) -> np.ndarray:
+        """
+        Эмбеддинг одного текста
+
+        Returns:
+            Вектор float32 формы (output_dimension,)
+        """
+        return self.encode_batch_array([text])[0]
+
+    def encode_batch_array(self, texts: List[str], pool=None, project: bool = True) -> np.ndarray:
+        """
+        Эмбеддинги для списка текстов
+
+        Args:
+            texts: Список текстов
+            pool: EmbeddingWorkerPool для кодирования промахов кэша в других процессах
+            project: Применить проекцию (False - полноразмерные векторы модели)
+
+        Returns:
+            C-непрерывная матрица float32 формы (len(texts), output_dimension)
+        """
+        embeddings = self._encode_cached(texts, pool)
+        if project and self.projection is not None:
+            embeddings = self.projection.transform(embeddings)
+        return embeddings
+
+    @property
+    def output_dimension(self) -> int:
+        """Размерность векторов, которые попадают в векторную БД"""
+        return self.projection.dim if self.projection is not None else self.dimension
+
     def similarity(self, text1: str, text2: str) -> float:
-      emb1 = self.encode(text1)
-      emb2 = self.encode(text2)
-      
-      dot_product = np.dot(emb1, emb2)
-      norm1 = np.linalg.norm(emb1)
-      norm2 = np.linalg.norm(emb2)
-
-      return dot_product / (norm1 * norm2)
+        """Косинусное сходство двух текстов"""
+        return float(self.similarity_matrix([text1], [text2])[0, 0])
+
+    def similarity_matrix(self, texts_a: List[str], texts_b: List[str]) -> np.ndarray:
+        """
+        Косинусное сходство каждого текста из texts_a с каждым из texts_b
+
+        Все уникальные тексты кодируются одним батчем (через кэш),
+        нормализуются один раз, а скоры считаются одним матричным умножением.
+
+        Returns:
+            Матрица float32 формы (len(texts_a), len(texts_b))
+        """
+        unique_texts = list(dict.fromkeys(texts_a + texts_b))
+        position = {text: i for i, text in enumerate(unique_texts)}
+
+        embeddings = normalize_rows(self.encode_batch_array(unique_texts))
+        a = embeddings[[position[text] for text in texts_a]]
+        b = embeddings[[position[text] for text in texts_b]]
+
+        return a @ b.T
+
+    def rank(self, query: str, candidates: List[str], top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Отсортировать кандидатов по сходству с запросом
+
+        Args:
+            query: Текст запроса
+            candidates: Список текстов-кандидатов
+            top_k: Сколько лучших вернуть (None - всех)
+
+        Returns:
+            Список {"index", "text", "similarity"} по убыванию сходства
+        """
+        if not candidates:
+            return []
+
+        scores = self.similarity_matrix([query], candidates)[0]
+        order = np.argsort(-scores, kind="stable")
+        if top_k is not None:
+            order = order[:top_k]
+
+        return [
+            {"index": int(i), "text": candidates[i], "similarity": float(scores[i])}
+            for i in order
+        ]
+
+    def _encode_cached(self, texts: List[str], pool=None) -> np.ndarray:
+        """
+        Кодирование с кэшем: в модель уходят только промахи
+
+        Args:
+            texts: Список текстов
+            pool: Пул процессов для промахов (None - кодировать в текущем процессе)
+
+        Returns:
+            Матрица эмбеддингов float32 в порядке входных текстов
+        """
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        encode_misses = pool.encode_batch_array if pool is not None else self._encode_model
+
+        if self.cache is None:
+            return encode_misses(texts)
+
+        keys = [self.cache.make_key(self.cache_namespace, text) for text in texts]
+        vectors = self.cache.get_many(keys)
+
+        # Одинаковые тексты внутри батча кодируем один раз
+        pending: Dict[str, int] = {}
+        for i, (key, vector) in enumerate(zip(keys, vectors)):
+            if vector is None and key not in pending:
+                pending[key] = i
+
+        if pending:
+            fresh = encode_misses([texts[i] for i in pending.values()])
+            self.cache.put_many(list(pending.keys()), fresh)
+            computed = dict(zip(pending.keys(), fresh))
+            vectors = [computed[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+
+        return np.stack(vectors)
+
+    def _encode_model(self, texts: List[str]) -> np.ndarray:
+        """
+        Forward pass модели с группировкой текстов по длине
+
+        Короткие тексты не дополняются паддингом до длины самых длинных:
+        каждый батч собирается из текстов близкой длины, а результат
+        возвращается в исходном порядке.
+        """
+        lengths, measured = self._token_lengths(texts)
+        if self.length_bucketing:
+            batches = plan_length_buckets(lengths, self.batch_size, self.max_batch_tokens)
+        else:
+            batches = [np.arange(start, min(start + self.batch_size, len(texts)))
+                       for start in range(0, len(texts), self.batch_size)]
+
+        start_time = time.perf_counter()
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for batch in batches:
+            embeddings[batch] = self.model.encode([texts[i] for i in batch], batch_size=len(batch))
+        elapsed = time.perf_counter() - start_time
+
+        # Для сравнения: паддинг при кодировании в исходном порядке
+        unbucketed = [np.arange(start, min(start + self.batch_size, len(texts)))
+                      for start in range(0, len(texts), self.batch_size)]
+
+        update = {
+            "texts": len(texts),
+            "tokens": int(lengths.sum()),
+            "measured_texts": len(measured),
+            "measured_tokens": int(lengths[measured].sum()),
+            "padded_tokens": padded_tokens(lengths, batches),
+            "unbucketed_padded_tokens": padded_tokens(lengths, unbucketed),
+            "forward_passes": len(batches),
+            "seconds": elapsed,
+        }
+        thread_stats = getattr(self._thread_stats, "stats", None)
+        with self._stats_lock:
+            for key, value in update.items():
+                self._encode_stats[key] += value
+                if thread_stats is not None:
+                    thread_stats[key] += value
+
+        return embeddings
+
+    def _token_lengths(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Длина каждого текста в токенах (с учетом обрезки до max_seq_length)
+
+        Тексты токенизирует model.encode, поэтому для группировки по длине весь батч
+        второй раз не токенизируется: токенайзер считает реальные длины только образца
+        батча, а длина остальных текстов оценивается по числу символов на токен,
+        усредненному по образцам всех батчей.
+
+        Returns:
+            (длины, номера текстов с реальной длиной из токенайзера)
+        """
+        chars = np.array([len(text) for text in texts], dtype=np.int64)
+        tokenizer = getattr(self.model, "tokenizer", None)
+        if tokenizer is None:
+            # Без токенайзера используем длину в символах как приближение
+            return chars, np.empty(0, dtype=np.int64)
+
+        sample, content_tokens = self._calibrate_token_lengths(tokenizer, texts)
+        with self._stats_lock:
+            chars_per_token = (max(1.0, self._calibration_chars / self._calibration_tokens)
+                               if self._calibration_tokens else 4.0)
+        lengths = np.ceil(chars / chars_per_token).astype(np.int64)
+        lengths[sample] = content_tokens
+        lengths += self._special_tokens
+        max_length = getattr(self.model, "max_seq_length", None)
+        return (np.minimum(lengths, max_length) if max_length else lengths), sample
+
+    def _calibrate_token_lengths(self, tokenizer, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Токенизировать равномерный образец батча и добавить его в среднее символов на токен
+
+        Returns:
+            (номера текстов образца, число токенов каждого без служебных)
+        """
+        sample = np.unique(np.linspace(0, len(texts) - 1, min(len(texts), TOKEN_CALIBRATION_SAMPLE)).astype(np.int64))
+        input_ids = tokenizer([texts[i] for i in sample], add_special_tokens=False)["input_ids"]
+        content_tokens = np.array([len(ids) for ids in input_ids], dtype=np.int64)
+        if self._special_tokens is None:
+            self._special_tokens = len(tokenizer([""], add_special_tokens=True)["input_ids"][0])
+        with self._stats_lock:
+            self._calibration_chars += sum(len(texts[i]) for i in sample)
+            self._calibration_tokens += int(content_tokens.sum())
+        return sample, content_tokens
+
+    def get_encode_stats(self) -> Dict[str, Any]:
+        """
+        Накопленная статистика forward pass (все потоки процесса)
+
+        Токены - реальные длины образца каждого батча и оценка по длине для остальных
+        текстов (см. _token_lengths), measured_* - только реальные. Паддинг без группировки
+        по длине не измеряется, а рассчитывается для тех же текстов в исходном порядке.
+
+        Returns:
+            Токены, паддинг (с группировкой и оценка без нее) и пропускная способность в токенах/сек
+        """
+        with self._stats_lock:
+            stats = dict(self._encode_stats)
+
+        seconds = stats["seconds"]
+        stats["tokens_per_sec"] = round(stats["tokens"] / seconds, 1) if seconds else 0.0
+        stats["padding_ratio"] = round(1 - stats["tokens"] / stats["padded_tokens"], 4) if stats["padded_tokens"] else 0.0
+        stats["estimated_unbucketed_padding_ratio"] = (
+            round(1 - stats["tokens"] / stats["unbucketed_padded_tokens"], 4)
+            if stats["unbucketed_padded_tokens"] else 0.0
+        )
+        stats["seconds"] = round(seconds, 4)
+        with self._stats_lock:
+            stats["chars_per_token"] = (round(self._calibration_chars / self._calibration_tokens, 3)
+                                        if self._calibration_tokens else None)
+        return stats
+
+    def check_backend_parity(self, texts: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Сравнить текущий бэкенд с эталонной torch моделью
+
+        Args:
+            texts: Тексты для сравнения (по умолчанию встроенный набор)
+
+        Returns:
+            Косинусное сходство и отклонение от torch
+        """
+        if self.backend == "torch":
+            return {"backend": "torch", "mean_cosine": 1.0, "min_cosine": 1.0, "max_deviation": 0.0}
+
+        with self._parity_lock:
+            if self._parity_reference is None:
+                self._parity_reference = SentenceTransformer(self.model_name, device="cpu")
+            reference = self._parity_reference
+        return {"backend": self.backend, **check_parity(reference, self.model, texts)}
+
+    def get_status(self) -> Dict[str, Any]:
+        """Получить статус сервиса эмбеддингов"""
+        return {
+            "model": self.model_name,
+            "backend": self.backend,
+            "dimension": self.dimension,
+            "output_dimension": self.output_dimension,
+            "projection": self.projection.describe() if self.projection is not None else None,
+            "status": "ready",
+            "parity": self.model.get_parity() if self.backend != "torch" else None,
+            "length_bucketing": self.length_bucketing,
+            "encode_stats": self.get_encode_stats(),
+            "cache": self.cache.get_stats() if self.cache is not None else None
+        }
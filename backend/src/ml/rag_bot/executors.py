@@ -0,0 +1,80 @@
+"""
+Executors - ограниченные пулы потоков для блокирующей работы RAG из async кода
+"""
+from typing import Any, Callable, Dict
+from concurrent.futures import Future, ThreadPoolExecutor
+import asyncio
+import functools
+import threading
+
+
+class ExecutorBusyError(RuntimeError):
+    """Очередь пула заполнена - запрос нужно отклонить или повторить позже"""
+
+
+class BoundedExecutor:
+    def __init__(self, name: str, max_workers: int, max_pending: int):
+        """
+        Пул потоков с ограничением очереди
+
+        Args:
+            name: Название пула (для имен потоков и статистики)
+            max_workers: Количество потоков
+            max_pending: Максимум заданий (выполняемых и ожидающих); сверх - ExecutorBusyError
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max(max_pending, max_workers)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"rag-{name}")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._stats = {
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+        }
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Выполнить блокирующую функцию в пуле, не блокируя event loop
+
+        Raises:
+            ExecutorBusyError: Если в пуле уже max_pending заданий
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._stats["rejected"] += 1
+                raise ExecutorBusyError(f"Executor '{self.name}' is busy ({self._pending} pending tasks)")
+            self._pending += 1
+
+        try:
+            future = self._executor.submit(functools.partial(func, *args, **kwargs))
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+
+        # Слот освобождается по завершении потока, даже если вызывающий отменил ожидание
+        future.add_done_callback(self._on_done)
+        return await asyncio.wrap_future(future)
+
+    def _on_done(self, future: Future):
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled() or future.exception() is not None:
+                self._stats["failed"] += 1
+            else:
+                self._stats["completed"] += 1
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+            }
@@ -0,0 +1,184 @@
+"""
+Micro Batcher - объединение параллельных запросов эмбеддингов в один батч
+"""
+from typing import List, Dict, Any, Optional, Tuple
+from concurrent.futures import Future
+import asyncio
+import queue
+import threading
+import time
+
+import numpy as np
+
+# Границы гистограммы размеров батчей
+_BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, float("inf"))
+
+
+class EmbeddingMicroBatcher:
+    def __init__(self, embeddings_service, max_wait_ms: float = 5.0, max_batch_size: int = 32):
+        """
+        Инициализация микробатчера
+
+        Args:
+            embeddings_service: EmbeddingsService, который выполняет forward pass
+            max_wait_ms: Сколько ждать остальные запросы после первого в батче (мс)
+            max_batch_size: Максимальный размер батча
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+
+        self.embeddings_service = embeddings_service
+        self.max_wait_ms = max_wait_ms
+        self.max_batch_size = max_batch_size
+
+        self._queue: "queue.Queue[Optional[Tuple[str, Future]]]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "batches": 0,
+            "errors": 0,
+            "last_batch_size": 0,
+            "max_batch_size_seen": 0,
+        }
+        self._histogram = {bucket: 0 for bucket in _BATCH_SIZE_BUCKETS}
+        # submit и shutdown под одной блокировкой: после метки остановки в очередь ничего не попадает
+        self._lifecycle_lock = threading.Lock()
+        self._closed = False
+
+        self._worker = threading.Thread(target=self._run, name="embedding-micro-batcher", daemon=True)
+        self._worker.start()
+        print(f"Микробатчер эмбеддингов запущен (окно {max_wait_ms} мс, батч до {max_batch_size})")
+
+    def submit(self, text: str) -> Future:
+        """
+        Поставить текст в очередь на кодирование
+
+        Returns:
+            Future с вектором float32
+
+        Raises:
+            RuntimeError: Микробатчер остановлен
+        """
+        future: Future = Future()
+        with self._lifecycle_lock:
+            if self._closed:
+                raise RuntimeError("Micro batcher is shut down")
+            self._queue.put((text, future))
+        return future
+
+    def encode_array(self, text: str) -> np.ndarray:
+        """Закодировать текст (блокирует до готовности батча)"""
+        return self.submit(text).result()
+
+    def encode(self, text: str) -> List[float]:
+        """Совместимая обертка над encode_array"""
+        return self.encode_array(text).tolist()
+
+    async def encode_array_async(self, text: str) -> np.ndarray:
+        """Закодировать текст, не блокируя event loop"""
+        return await asyncio.wrap_future(self.submit(text))
+
+    def _run(self):
+        """Цикл фонового потока: собрать батч, выполнить forward pass, раздать результаты"""
+        try:
+            self._loop()
+        finally:
+            self._fail_pending()
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + self.max_wait_ms / 1000.0
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._process(batch)
+
+            if stop:
+                break
+
+    def _fail_pending(self):
+        """После выхода фонового потока: новые запросы отклоняются, оставшиеся в очереди завершаются ошибкой"""
+        with self._lifecycle_lock:
+            self._closed = True
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None and item[1].set_running_or_notify_cancel():
+                item[1].set_exception(RuntimeError("Micro batcher is shut down"))
+
+    def _process(self, batch: List[Tuple[str, Future]]):
+        """Один forward pass на весь батч"""
+        # Отмененные запросы не кодируем
+        batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        self._record_batch(len(batch))
+
+        try:
+            vectors = self.embeddings_service.encode_batch_array([text for text, _ in batch])
+        except BaseException as e:
+            with self._stats_lock:
+                self._stats["errors"] += 1
+            for _, future in batch:
+                future.set_exception(e)
+            # SystemExit и подобные останавливают поток (очередь завершит _fail_pending)
+            if not isinstance(e, Exception):
+                raise
+            return
+
+        for (_, future), vector in zip(batch, vectors):
+            future.set_result(vector)
+
+    def _record_batch(self, size: int):
+        with self._stats_lock:
+            self._stats["requests"] += size
+            self._stats["batches"] += 1
+            self._stats["last_batch_size"] = size
+            self._stats["max_batch_size_seen"] = max(self._stats["max_batch_size_seen"], size)
+            for bucket in _BATCH_SIZE_BUCKETS:
+                if size <= bucket:
+                    self._histogram[bucket] += 1
+                    break
+
+    def shutdown(self, wait: bool = True):
+        """Остановить фоновый поток (запросы, уже стоящие в очереди, будут выполнены)"""
+        with self._lifecycle_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        if wait:
+            self._worker.join()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Метрики микробатчера: глубина очереди и размеры батчей"""
+        with self._stats_lock:
+            batches = self._stats["batches"]
+            return {
+                **self._stats,
+                "queue_depth": self._queue.qsize(),
+                "avg_batch_size": round(self._stats["requests"] / batches, 2) if batches else 0.0,
+                "batch_size_histogram": {f"<={bucket}": count for bucket, count in self._histogram.items()},
+                "max_wait_ms": self.max_wait_ms,
+                "max_batch_size": self.max_batch_size,
+            }
@@ -0,0 +1,262 @@
+"""
+ONNX Backend - CPU-инференс модели эмбеддингов через onnxruntime (опционально int8)
+"""
+from typing import List, Dict, Any, Optional, Union
+from pathlib import Path
+import inspect
+import json
+
+import numpy as np
+
+ONNX_BACKENDS = ("onnx", "onnx-int8")
+
+# Небольшой русско-английский набор для проверки совпадения с torch
+PARITY_TEXTS = [
+    "Собака лает на улице",
+    "Машинное обучение - это область искусственного интеллекта",
+    "Векторный поиск находит похожие документы по смыслу",
+    "The quick brown fox jumps over the lazy dog",
+    "Retrieval-augmented generation combines search with a language model",
+    "Кот спит на диване, а за окном идет дождь",
+]
+
+
+def check_parity(reference, candidate, texts: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Сравнить эмбеддинги двух моделей (например, torch и onnx)
+
+    Args:
+        reference: Эталонная модель с методом encode
+        candidate: Проверяемая модель с методом encode
+        texts: Тексты для сравнения (по умолчанию PARITY_TEXTS)
+
+    Returns:
+        Косинусное сходство и отклонение (1 - cos) по выборке
+    """
+    texts = texts or PARITY_TEXTS
+    expected = np.asarray(reference.encode(texts), dtype=np.float32)
+    actual = np.asarray(candidate.encode(texts), dtype=np.float32)
+
+    expected /= np.linalg.norm(expected, axis=1, keepdims=True)
+    actual /= np.linalg.norm(actual, axis=1, keepdims=True)
+    cosine = np.sum(expected * actual, axis=1)
+
+    return {
+        "texts": len(texts),
+        "mean_cosine": round(float(cosine.mean()), 6),
+        "min_cosine": round(float(cosine.min()), 6),
+        "max_deviation": round(float(1.0 - cosine.min()), 6),
+    }
+
+
+def _pooling_mode(pooling) -> str:
+    """Режим пулинга sentence-transformers ('cls', 'mean', 'max')"""
+    # В sentence-transformers < 6 режим доступен только через get_pooling_mode_str()
+    if hasattr(pooling, "get_pooling_mode_str"):
+        return pooling.get_pooling_mode_str()
+    return str(pooling.pooling_mode)
+
+
+class OnnxEmbeddingModel:
+    """Совместимая с SentenceTransformer.encode обертка над onnxruntime"""
+
+    def __init__(self, model_name: str, export_dir: str = "./data/models/onnx",
+                 quantize: bool = False, num_threads: Optional[int] = None):
+        """
+        Инициализация ONNX модели (экспорт выполняется один раз и кэшируется на диске)
+
+        Args:
+            model_name: Название модели sentence-transformers
+            export_dir: Директория для экспортированных моделей
+            quantize: Использовать динамическое int8 квантование весов
+            num_threads: Число потоков onnxruntime (None - по умолчанию)
+        """
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.quantize = quantize
+        self.backend = "onnx-int8" if quantize else "onnx"
+        self.model_dir = Path(export_dir) / model_name.replace("/", "__")
+
+        fp32_path = self.model_dir / "model.onnx"
+        int8_path = self.model_dir / "model.int8.onnx"
+        model_path = int8_path if quantize else fp32_path
+
+        reference = None
+        if not model_path.exists():
+            reference = self._export(fp32_path, int8_path)
+
+        self.config = json.loads((self.model_dir / "onnx_config.json").read_text(encoding="utf-8"))
+        self.pooling = self.config["pooling"]
+        self.normalize = self.config["normalize"]
+        self.max_seq_length = self.config["max_seq_length"]
+
+        self.tokenizer = AutoTokenizer.from_pretrained(str(self.model_dir))
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        self._input_names = [model_input.name for model_input in self.session.get_inputs()]
+
+        print(f"ONNX модель загружена: {model_path}")
+
+        # model.onnx мог быть экспортирован для другого бэкенда (int8 квантуется из него)
+        if self.get_parity() is None:
+            self._record_parity(reference)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config["dimension"]
+
+    def get_parity(self) -> Optional[Dict[str, Any]]:
+        """Результат проверки совпадения с torch, посчитанный при экспорте"""
+        return self.config.get("parity", {}).get(self.backend)
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        """
+        Создать эмбеддинги (интерфейс как у SentenceTransformer.encode)
+
+        Args:
+            sentences: Текст или список текстов
+            batch_size: Размер батча для forward pass
+
+        Returns:
+            Вектор (для строки) или матрица float32
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        outputs = []
+        for start in range(0, len(texts), batch_size):
+            outputs.append(self._encode_batch(texts[start:start + batch_size]))
+
+        if outputs:
+            embeddings = np.concatenate(outputs)
+        else:
+            embeddings = np.empty((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        return embeddings[0] if single else embeddings
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Forward pass + пулинг для одного батча"""
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np"
+        )
+        feeds = {name: encoded[name].astype(np.int64) for name in self._input_names}
+        hidden = self.session.run(None, feeds)[0]
+
+        mask = encoded["attention_mask"].astype(np.float32)[:, :, None]
+        if self.pooling == "cls":
+            embeddings = hidden[:, 0]
+        elif self.pooling == "mean":
+            embeddings = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        elif self.pooling == "max":
+            embeddings = np.where(mask > 0, hidden, -1e9).max(axis=1)
+        else:
+            raise ValueError(f"Unsupported pooling mode: {self.pooling}")
+
+        embeddings = embeddings.astype(np.float32)
+        if self.normalize:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings
+
+    def _record_parity(self, reference=None):
+        """
+        Сравнить модель с torch и сохранить результат в onnx_config.json
+
+        Args:
+            reference: Загруженная эталонная SentenceTransformer (None - загрузить)
+        """
+        if reference is None:
+            from sentence_transformers import SentenceTransformer
+            reference = SentenceTransformer(self.model_name, device="cpu")
+
+        parity = check_parity(reference, self)
+        config_path = self.model_dir / "onnx_config.json"
+        config = json.loads(config_path.read_text(encoding="utf-8"))
+        config.setdefault("parity", {})[self.backend] = parity
+        config_path.write_text(json.dumps(config, ensure_ascii=False, indent=2), encoding="utf-8")
+        self.config = config
+        print(f"✅ Отклонение {self.backend} от torch: {parity}")
+
+    def _export(self, fp32_path: Path, int8_path: Path):
+        """
+        Экспорт torch модели в ONNX (+ int8 квантование)
+
+        Returns:
+            Эталонная SentenceTransformer (для проверки совпадения без повторной загрузки)
+        """
+        import torch
+        from sentence_transformers import SentenceTransformer
+        from sentence_transformers.models import Transformer, Pooling, Normalize
+
+        print(f"🔄 Экспортируем {self.model_name} в ONNX...")
+        self.model_dir.mkdir(parents=True, exist_ok=True)
+
+        reference = SentenceTransformer(self.model_name, device="cpu")
+        modules = list(reference)
+        unsupported = [type(m).__name__ for m in modules if not isinstance(m, (Transformer, Pooling, Normalize))]
+        if unsupported:
+            raise ValueError(f"ONNX backend does not support modules: {unsupported}")
+
+        transformer = modules[0]
+        pooling = next(m for m in modules if isinstance(m, Pooling))
+        tokenizer = reference.tokenizer
+
+        if not fp32_path.exists():
+            sample = tokenizer(["Пример текста для экспорта"], return_tensors="pt")
+            input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+
+            class _HiddenStates(torch.nn.Module):
+                def __init__(self, model):
+                    super().__init__()
+                    self.model = model
+
+                def forward(self, *inputs):
+                    return self.model(**dict(zip(input_names, inputs))).last_hidden_state
+
+            dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+            dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+            export_kwargs = {}
+            # В новых версиях torch по умолчанию dynamo-экспортер, он не понимает dynamic_axes
+            if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+                export_kwargs["dynamo"] = False
+
+            with torch.no_grad():
+                torch.onnx.export(
+                    _HiddenStates(transformer.auto_model.eval()),
+                    tuple(sample[name] for name in input_names),
+                    str(fp32_path),
+                    input_names=input_names,
+                    output_names=["last_hidden_state"],
+                    dynamic_axes=dynamic_axes,
+                    opset_version=14,
+                    **export_kwargs
+                )
+            tokenizer.save_pretrained(str(self.model_dir))
+
+        if self.quantize and not int8_path.exists():
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+
+            print("🔄 Квантуем ONNX модель в int8...")
+            quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+
+        config_path = self.model_dir / "onnx_config.json"
+        config = json.loads(config_path.read_text(encoding="utf-8")) if config_path.exists() else {}
+        config.update({
+            "model_name": self.model_name,
+            "pooling": _pooling_mode(pooling),
+            "normalize": any(isinstance(m, Normalize) for m in modules),
+            "max_seq_length": reference.max_seq_length,
+            "dimension": reference.get_sentence_embedding_dimension(),
+        })
+        config_path.write_text(json.dumps(config, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"✅ Экспорт {self.backend} завершен")
+        return reference
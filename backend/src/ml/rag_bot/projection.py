@@ -0,0 +1,189 @@
+"""
+Projection - уменьшение размерности эмбеддингов (PCA или Matryoshka-усечение)
+"""
+from typing import List, Dict, Any, Optional
+from pathlib import Path
+
+import numpy as np
+
+try:
+    from .vector_utils import as_float32_matrix, normalize_rows
+except ImportError:
+    from ml.rag_bot.vector_utils import as_float32_matrix, normalize_rows
+
+PROJECTION_METHODS = ("pca", "truncate")
+
+
+class EmbeddingProjection:
+    def __init__(self, method: str, dim: int, mean: Optional[np.ndarray] = None,
+                 components: Optional[np.ndarray] = None, normalize: bool = True):
+        """
+        Проекция эмбеддингов в пространство меньшей размерности
+
+        Args:
+            method: 'pca' (обучается на корпусе) или 'truncate' (первые dim координат)
+            dim: Размерность после проекции
+            mean: Среднее корпуса (для PCA)
+            components: Главные компоненты формы (dim, full_dim) (для PCA)
+            normalize: L2-нормализовать векторы после проекции
+        """
+        if method not in PROJECTION_METHODS:
+            raise ValueError(f"Unknown projection method: {method}")
+        if method == "pca" and (mean is None or components is None):
+            raise ValueError("PCA projection requires mean and components, use EmbeddingProjection.fit_pca")
+        if dim < 1:
+            raise ValueError(f"Projection dim must be positive, got {dim}")
+
+        self.method = method
+        self.dim = dim
+        self.mean = mean
+        self.components = components
+        self.normalize = normalize
+
+    @classmethod
+    def fit_pca(cls, embeddings: np.ndarray, dim: int) -> "EmbeddingProjection":
+        """
+        Обучить PCA на эмбеддингах корпуса
+
+        Args:
+            embeddings: Матрица полноразмерных эмбеддингов (n, full_dim)
+            dim: Целевая размерность
+        """
+        matrix = as_float32_matrix(embeddings)
+        if dim > min(matrix.shape):
+            raise ValueError(f"PCA dim {dim} exceeds min(n_samples, n_features) = {min(matrix.shape)}")
+
+        mean = matrix.mean(axis=0)
+        # Правые сингулярные векторы центрированной матрицы - главные компоненты
+        _, _, vt = np.linalg.svd(matrix - mean, full_matrices=False)
+        return cls("pca", dim, mean=mean.astype(np.float32), components=np.ascontiguousarray(vt[:dim], dtype=np.float32))
+
+    @classmethod
+    def truncate(cls, dim: int) -> "EmbeddingProjection":
+        """Matryoshka-усечение: оставить первые dim координат"""
+        return cls("truncate", dim)
+
+    def check_dimension(self, full_dim: int):
+        """
+        Проверить, что проекция подходит к модели с размерностью full_dim
+
+        Raises:
+            ValueError: dim не меньше full_dim или PCA обучена на другой размерности
+        """
+        if not 0 < self.dim < full_dim:
+            raise ValueError(f"Projection dim must be in (0, {full_dim}) for this model, got {self.dim}")
+        if self.method == "pca" and self.components.shape[1] != full_dim:
+            raise ValueError(f"PCA projection was fitted on {self.components.shape[1]}-dim vectors, model has {full_dim}")
+
+    def transform(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Применить проекцию (одинаково при загрузке и при поиске)
+
+        Returns:
+            C-непрерывная матрица float32 (n, dim)
+        """
+        matrix = as_float32_matrix(embeddings)
+        if self.method == "pca":
+            projected = (matrix - self.mean) @ self.components.T
+        else:
+            projected = matrix[:, :self.dim]
+
+        if self.normalize:
+            projected = normalize_rows(projected)
+        return np.ascontiguousarray(projected, dtype=np.float32)
+
+    def save(self, path: str):
+        """Сохранить проекцию в .npz"""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        arrays = {
+            "method": np.array(self.method),
+            "dim": np.array(self.dim),
+            "normalize": np.array(self.normalize),
+        }
+        if self.method == "pca":
+            arrays["mean"] = self.mean
+            arrays["components"] = self.components
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "EmbeddingProjection":
+        """Загрузить проекцию из .npz"""
+        with np.load(path) as data:
+            method = str(data["method"])
+            return cls(
+                method,
+                int(data["dim"]),
+                mean=data["mean"] if method == "pca" else None,
+                components=data["components"] if method == "pca" else None,
+                normalize=bool(data["normalize"])
+            )
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "method": self.method,
+            "dim": self.dim,
+            "normalize": self.normalize,
+        }
+
+
+def _top_k(queries: np.ndarray, corpus: np.ndarray, query_rows: np.ndarray, k: int) -> np.ndarray:
+    """Индексы top-k соседей по косинусу (сам запрос исключается)"""
+    scores = normalize_rows(queries) @ normalize_rows(corpus).T
+    scores[np.arange(len(query_rows)), query_rows] = -np.inf
+    top = np.argpartition(-scores, k, axis=1)[:, :k]
+    return top
+
+
+def recall_report(embeddings: np.ndarray, dims: List[int], method: str = "pca", k: int = 10,
+                  num_queries: int = 200, seed: int = 42) -> List[Dict[str, Any]]:
+    """
+    Recall@k проекций разной размерности относительно полноразмерных векторов
+
+    Запросами служат случайные векторы корпуса; эталон - точный top-k
+    по косинусу в полной размерности.
+
+    Args:
+        embeddings: Полноразмерные эмбеддинги корпуса (n, full_dim)
+        dims: Кандидаты на размерность
+        method: 'pca' или 'truncate'
+        k: Глубина recall@k
+        num_queries: Сколько векторов корпуса использовать как запросы
+
+    Returns:
+        Строка отчета на каждую размерность: recall@k, байты на вектор, сжатие
+    """
+    matrix = as_float32_matrix(embeddings)
+    n, full_dim = matrix.shape
+    if n <= k:
+        raise ValueError(f"Need more than k={k} vectors to measure recall, got {n}")
+
+    rng = np.random.default_rng(seed)
+    query_rows = rng.choice(n, size=min(num_queries, n), replace=False)
+    expected = _top_k(matrix[query_rows], matrix, query_rows, k)
+
+    # PCA дает не больше min(n, full_dim) компонент
+    max_dim = min(n, full_dim) if method == "pca" else full_dim
+    dims = sorted(dim for dim in set(dims) if 0 < dim < full_dim and dim <= max_dim)
+    # Для PCA одно разложение на максимальную размерность, меньшие - срезы компонент
+    pca = EmbeddingProjection.fit_pca(matrix, dims[-1]) if method == "pca" and dims else None
+
+    report = []
+    for dim in dims:
+        if pca is not None:
+            projection = EmbeddingProjection("pca", dim, mean=pca.mean, components=pca.components[:dim])
+        else:
+            projection = EmbeddingProjection.truncate(dim)
+        reduced = projection.transform(matrix)
+        actual = _top_k(reduced[query_rows], reduced, query_rows, k)
+
+        hits = [len(np.intersect1d(e, a, assume_unique=True)) for e, a in zip(expected, actual)]
+        report.append({
+            "method": method,
+            "dim": dim,
+            "k": k,
+            "recall": round(float(np.mean(hits)) / k, 4),
+            "bytes_per_vector": dim * 4,
+            "compression": round(full_dim / dim, 2),
+        })
+
+    return report
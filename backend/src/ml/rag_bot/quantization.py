@@ -0,0 +1,391 @@
+"""
+Quantization - квантованные копии эмбеддингов (int8 / 1 бит) с точным пересчетом кандидатов
+"""
+from typing import List, Dict, Any, Optional, Tuple
+from pathlib import Path
+import threading
+
+import numpy as np
+
+try:
+    from .vector_utils import as_float32_matrix, as_float32_vector
+except ImportError:
+    from ml.rag_bot.vector_utils import as_float32_matrix, as_float32_vector
+
+QUANTIZATION_MODES = ("none", "int8", "binary")
+
+# Количество единичных битов для каждого байта (popcount для расстояния Хэмминга)
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+# Запас кандидатов для точного пересчета по режиму: 1 бит на координату дает грубый порядок
+# (много равных расстояний Хэмминга), и top_k * 4 кандидатов теряет ближайших соседей при малом top_k
+MIN_RESCORE_FACTOR = {"int8": 1, "binary": 16}
+MIN_CANDIDATES = {"int8": 0, "binary": 100}
+
+
+class QuantizedIndex:
+    """
+    Первый проход поиска по квантованным кодам в памяти, затем точный
+    пересчет top-кандидатов по полноразмерным float32 векторам на диске (memmap).
+
+    Все файлы дописываются в конец, поэтому добавление не переписывает индекс.
+    Удаление помечает строки (deleted.txt), файлы сжимаются, когда пометок много.
+    """
+
+    def __init__(self, index_dir: str, mode: str, rescore_factor: int = 4):
+        """
+        Инициализация индекса
+
+        Args:
+            index_dir: Директория файлов индекса
+            mode: 'int8' (скаляр на вектор) или 'binary' (знак каждой координаты)
+            rescore_factor: Во сколько раз больше кандидатов пересчитывать точно, чем top_k
+                (для binary - не меньше MIN_RESCORE_FACTOR и MIN_CANDIDATES, см. candidate_count)
+        """
+        if mode not in QUANTIZATION_MODES or mode == "none":
+            raise ValueError(f"Unknown quantization mode: {mode}")
+
+        self.index_dir = Path(index_dir)
+        self.mode = mode
+        self.rescore_factor = max(1, rescore_factor)
+        self.dimension: Optional[int] = None
+
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self._ids_path = self.index_dir / "ids.txt"
+        self._codes_path = self.index_dir / "codes.bin"
+        self._scales_path = self.index_dir / "scales.bin"
+        self._norms_path = self.index_dir / "norms.bin"
+        self._vectors_path = self.index_dir / "vectors.f32"
+        self._dim_path = self.index_dir / "dimension.txt"
+        self._deleted_path = self.index_dir / "deleted.txt"
+
+        self._lock = threading.RLock()
+        # Номер изменения индекса: по нему сбрасывается кэш recall
+        self._version = 0
+        self._recall_cache: Optional[Tuple[int, Dict[str, Any]]] = None
+        self._load()
+
+    @property
+    def count(self) -> int:
+        """Количество живых (не удаленных) векторов"""
+        return len(self._id_positions)
+
+    @property
+    def deleted_count(self) -> int:
+        return len(self.ids) - self.count
+
+    def candidate_count(self, top_k: int) -> int:
+        """Сколько кандидатов первого прохода пересчитывать по полноразмерным векторам"""
+        factor = max(self.rescore_factor, MIN_RESCORE_FACTOR[self.mode])
+        return max(top_k * factor, MIN_CANDIDATES[self.mode])
+
+    def _code_width(self) -> int:
+        return self.dimension if self.mode == "int8" else (self.dimension + 7) // 8
+
+    def _load(self):
+        """Загрузить коды в память; полноразмерные векторы остаются на диске"""
+        with self._lock:
+            self.ids: List[str] = []
+            if self._dim_path.exists():
+                self.dimension = int(self._dim_path.read_text())
+            if self.dimension is None or not self._ids_path.exists():
+                self._set_empty()
+                return
+
+            self.ids = self._ids_path.read_text(encoding="utf-8").split()
+            code_dtype = np.int8 if self.mode == "int8" else np.uint8
+            self.codes = np.fromfile(self._codes_path, dtype=code_dtype).reshape(-1, self._code_width())
+            self.scales = np.fromfile(self._scales_path, dtype=np.float32)
+            self.norms = np.fromfile(self._norms_path, dtype=np.float32)
+
+            if not (len(self.ids) == len(self.codes) == len(self.scales) == len(self.norms)):
+                raise ValueError(f"Quantized index in {self.index_dir} is corrupted, rebuild it")
+
+            self._alive = np.ones(len(self.ids), dtype=bool)
+            if self._deleted_path.exists():
+                deleted = [int(row) for row in self._deleted_path.read_text().split()]
+                self._alive[[row for row in deleted if row < len(self.ids)]] = False
+            # ID, удаленный и добавленный снова, указывает на последнюю живую строку
+            self._id_positions = {doc_id: row for row, doc_id in enumerate(self.ids) if self._alive[row]}
+
+    def _set_empty(self):
+        width = self._code_width() if self.dimension else 0
+        self.codes = np.empty((0, width), dtype=np.int8 if self.mode == "int8" else np.uint8)
+        self.scales = np.empty(0, dtype=np.float32)
+        self.norms = np.empty(0, dtype=np.float32)
+        self._alive = np.empty(0, dtype=bool)
+        self._id_positions: Dict[str, int] = {}
+
+    def _vectors(self) -> np.ndarray:
+        """Полноразмерные векторы (memmap, в память не загружаются)"""
+        return np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(len(self.ids), self.dimension))
+
+    def _quantize(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Коды и масштабы для матрицы float32"""
+        if self.mode == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales = np.maximum(scales, 1e-12).astype(np.float32)
+            codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+            return codes, scales
+        # 1 бит на координату: знак; масштаб не нужен
+        return np.packbits(vectors > 0, axis=1), np.ones(len(vectors), dtype=np.float32)
+
+    def add(self, ids: List[str], embeddings: np.ndarray):
+        """
+        Добавить векторы в индекс
+
+        Args:
+            ids: ID документов (совпадают с ID в коллекции)
+            embeddings: Матрица float32 (n, dim)
+        """
+        vectors = as_float32_matrix(embeddings)
+        if len(ids) != len(vectors):
+            raise ValueError("Lengths of ids and embeddings must match")
+        if not ids:
+            return
+
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+                self._dim_path.write_text(str(self.dimension))
+                self._set_empty()
+            elif vectors.shape[1] != self.dimension:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {self.dimension}")
+
+            codes, scales = self._quantize(vectors)
+            norms = np.einsum("ij,ij->i", vectors, vectors).astype(np.float32)
+
+            with open(self._vectors_path, "ab") as f:
+                vectors.tofile(f)
+            with open(self._codes_path, "ab") as f:
+                codes.tofile(f)
+            with open(self._scales_path, "ab") as f:
+                scales.tofile(f)
+            with open(self._norms_path, "ab") as f:
+                norms.tofile(f)
+            # ids пишем последними: по ним определяется число записей при загрузке
+            with open(self._ids_path, "a", encoding="utf-8") as f:
+                f.write("".join(f"{doc_id}\n" for doc_id in ids))
+
+            start = len(self.ids)
+            self.ids.extend(ids)
+            self._id_positions.update({doc_id: start + i for i, doc_id in enumerate(ids)})
+            self.codes = np.concatenate([self.codes, codes])
+            self.scales = np.concatenate([self.scales, scales])
+            self.norms = np.concatenate([self.norms, norms])
+            self._alive = np.concatenate([self._alive, np.ones(len(ids), dtype=bool)])
+            self._version += 1
+
+    def remove(self, ids: List[str]):
+        """
+        Удалить векторы: строки помечаются удаленными, файлы не переписываются
+
+        Когда пометок больше четверти строк, индекс сжимается (compact).
+        """
+        with self._lock:
+            rows = [self._id_positions.pop(doc_id) for doc_id in ids if doc_id in self._id_positions]
+            if not rows:
+                return
+
+            self._alive[rows] = False
+            with open(self._deleted_path, "a", encoding="utf-8") as f:
+                f.write("".join(f"{row}\n" for row in rows))
+            self._version += 1
+
+            if self.deleted_count > max(1000, len(self.ids) // 4):
+                self.compact()
+
+    def compact(self, block_rows: int = 65536):
+        """Переписать файлы индекса без удаленных строк (векторы копируются блоками)"""
+        with self._lock:
+            if self.deleted_count == 0:
+                return
+
+            keep = np.flatnonzero(self._alive)
+            vectors = self._vectors()
+            tmp_vectors = self._vectors_path.with_suffix(".tmp")
+            with open(tmp_vectors, "wb") as f:
+                for start in range(0, len(keep), block_rows):
+                    np.asarray(vectors[keep[start:start + block_rows]]).tofile(f)
+            del vectors
+
+            kept_ids = [self.ids[row] for row in keep]
+            self.codes, self.scales, self.norms = self.codes[keep], self.scales[keep], self.norms[keep]
+            tmp_paths = []
+            for path, data in ((self._codes_path, self.codes), (self._scales_path, self.scales),
+                               (self._norms_path, self.norms)):
+                tmp_path = path.with_suffix(".tmp")
+                data.tofile(tmp_path)
+                tmp_paths.append((tmp_path, path))
+            tmp_ids = self._ids_path.with_suffix(".tmp")
+            tmp_ids.write_text("".join(f"{doc_id}\n" for doc_id in kept_ids), encoding="utf-8")
+
+            tmp_vectors.replace(self._vectors_path)
+            for tmp_path, path in tmp_paths:
+                tmp_path.replace(path)
+            # ids и пометки - последними: по ним определяется число записей при загрузке
+            tmp_ids.replace(self._ids_path)
+            self._deleted_path.unlink(missing_ok=True)
+
+            self.ids = kept_ids
+            self._alive = np.ones(len(kept_ids), dtype=bool)
+            self._id_positions = {doc_id: row for row, doc_id in enumerate(kept_ids)}
+            self._version += 1
+
+    def clear(self):
+        """Удалить все векторы и файлы индекса"""
+        with self._lock:
+            for path in (self._ids_path, self._codes_path, self._scales_path,
+                         self._norms_path, self._vectors_path, self._dim_path, self._deleted_path):
+                path.unlink(missing_ok=True)
+            self.ids = []
+            self.dimension = None
+            self._version += 1
+            self._recall_cache = None
+            self._set_empty()
+
+    def _approximate_distances(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Приближенные расстояния первого прохода по кодам (rows - только по этим строкам)"""
+        total = len(self.ids) if rows is None else len(rows)
+        distances = np.empty(total, dtype=np.float32)
+        query_bits = np.packbits(query > 0)
+
+        # Блоками, чтобы временные float32 копии кодов не съедали выигрыш в памяти
+        for start in range(0, total, 65536):
+            block = slice(start, start + 65536) if rows is None else rows[start:start + 65536]
+            codes = self.codes[block]
+            end = start + len(codes)
+            if self.mode == "int8":
+                # ||q - x||^2 = ||q||^2 - 2 q.x + ||x||^2, где x ~ codes * scale
+                dots = (codes @ query) * self.scales[block]
+                distances[start:end] = float(query @ query) - 2.0 * dots + self.norms[block]
+            else:
+                distances[start:end] = _POPCOUNT[np.bitwise_xor(codes, query_bits)].sum(axis=1)
+        return distances
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 5,
+               rescore: bool = True, allowed_ids: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Поиск ближайших векторов
+
+        Args:
+            query_embedding: Вектор запроса
+            top_k: Количество результатов
+            rescore: Пересчитать кандидатов по полноразмерным векторам
+            allowed_ids: Искать только среди этих ID (результат фильтра по метаданным)
+
+        Returns:
+            Пары (id, квадрат L2 расстояния) по возрастанию расстояния
+        """
+        query = as_float32_vector(query_embedding)
+        with self._lock:
+            if self.count == 0 or top_k <= 0:
+                return []
+
+            if allowed_ids is not None:
+                allowed_rows = np.array(
+                    [self._id_positions[doc_id] for doc_id in allowed_ids if doc_id in self._id_positions],
+                    dtype=np.int64
+                )
+                if len(allowed_rows) == 0:
+                    return []
+                approximate = np.full(len(self.ids), np.inf, dtype=np.float32)
+                approximate[allowed_rows] = self._approximate_distances(query, allowed_rows)
+                num_candidates = min(len(allowed_rows), self.candidate_count(top_k) if rescore else top_k)
+            else:
+                approximate = self._approximate_distances(query)
+                approximate[~self._alive] = np.inf
+                num_candidates = min(self.count, self.candidate_count(top_k) if rescore else top_k)
+            candidates = np.argpartition(approximate, num_candidates - 1)[:num_candidates]
+
+            if rescore:
+                # memmap читает только строки кандидатов
+                rows = np.sort(candidates)
+                diff = np.asarray(self._vectors()[rows]) - query
+                distances = np.einsum("ij,ij->i", diff, diff)
+                candidates = rows
+            else:
+                distances = approximate[candidates]
+
+            order = np.argsort(distances, kind="stable")[:top_k]
+            return [(self.ids[candidates[i]], float(distances[i])) for i in order]
+
+    def _exact_top_k(self, queries: np.ndarray, k: int, block_rows: int = 65536) -> np.ndarray:
+        """Точный top-k по float32 векторам с диска, блоками (без загрузки всего файла)"""
+        vectors = self._vectors()
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_distances = np.empty((len(queries), 0), dtype=np.float32)
+
+        for start in range(0, len(self.ids), block_rows):
+            block = np.asarray(vectors[start:start + block_rows])
+            # ||q||^2 одинаков для строки запроса и на порядок не влияет
+            distances = self.norms[start:start + len(block)] - 2.0 * (queries @ block.T)
+            distances[:, ~self._alive[start:start + len(block)]] = np.inf
+            rows = np.broadcast_to(np.arange(start, start + len(block)), distances.shape)
+
+            merged_distances = np.concatenate([best_distances, distances], axis=1)
+            merged_rows = np.concatenate([best_rows, rows], axis=1)
+            keep = np.argpartition(merged_distances, min(k, merged_distances.shape[1]) - 1, axis=1)[:, :k]
+            best_distances = np.take_along_axis(merged_distances, keep, axis=1)
+            best_rows = np.take_along_axis(merged_rows, keep, axis=1)
+
+        return best_rows
+
+    def measure_recall(self, k: int = 10, num_queries: int = 50, seed: int = 42) -> Dict[str, Any]:
+        """
+        Recall@k квантованного поиска против точного поиска по float32
+
+        Запросами служат векторы индекса; результат кэшируется до изменения индекса.
+        """
+        with self._lock:
+            if self._recall_cache is not None and self._recall_cache[0] == self._version:
+                return self._recall_cache[1]
+            if self.count <= k:
+                return {"k": k, "queries": 0, "first_pass": None, "rescored": None}
+
+            rng = np.random.default_rng(seed)
+            rows = rng.choice(np.flatnonzero(self._alive), size=min(num_queries, self.count), replace=False)
+            queries = np.array(self._vectors()[np.sort(rows)])
+            exact = self._exact_top_k(queries, k)
+
+            first_pass_hits, rescored_hits = 0, 0
+            for query, exact_rows in zip(queries, exact):
+                expected = {self.ids[row] for row in exact_rows}
+                first_pass_hits += len(expected & {doc_id for doc_id, _ in self.search(query, k, rescore=False)})
+                rescored_hits += len(expected & {doc_id for doc_id, _ in self.search(query, k)})
+
+            total = len(queries) * k
+            result = {
+                "k": k,
+                "queries": len(queries),
+                "first_pass": round(first_pass_hits / total, 4),
+                "rescored": round(rescored_hits / total, 4),
+            }
+            self._recall_cache = (self._version, result)
+            return result
+
+    def cached_recall(self) -> Optional[Dict[str, Any]]:
+        """Последний измеренный recall, если индекс с тех пор не менялся (без пересчета)"""
+        with self._lock:
+            if self._recall_cache is not None and self._recall_cache[0] == self._version:
+                return self._recall_cache[1]
+            return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Занимаемая память и диск (с удаленными, но еще не сжатыми строками)"""
+        with self._lock:
+            code_bytes = self.codes.nbytes + self.scales.nbytes + self.norms.nbytes + self._alive.nbytes
+            float_bytes = len(self.ids) * (self.dimension or 0) * 4
+            return {
+                "mode": self.mode,
+                "vectors": self.count,
+                "deleted_marks": self.deleted_count,
+                "dimension": self.dimension,
+                "rescore_factor": self.rescore_factor,
+                "min_candidates": self.candidate_count(1),
+                "memory_bytes": code_bytes,
+                "full_precision_disk_bytes": float_bytes,
+                "disk_bytes": sum(path.stat().st_size for path in self.index_dir.iterdir() if path.is_file()),
+                "bytes_per_vector": round(code_bytes / self.count, 2) if self.count else None,
+                "compression": round(float_bytes / code_bytes, 2) if code_bytes else None,
+            }
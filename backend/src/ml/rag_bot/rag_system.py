@@ -2,30 +2,85 @@
 RAG System
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime
+from pathlib import Path
+import re
+import threading
+import time
+import uuid
 
 # Импорты с проверкой на относительные/абсолютные
 try:
     from .embeddings_service import EmbeddingsService
+    from .embedding_cache import EmbeddingCache
+    from .micro_batcher import EmbeddingMicroBatcher
+    from .embedding_pool import EmbeddingWorkerPool
+    from .projection import EmbeddingProjection, recall_report
     from .vector_store import VectorStore
+    from .tenants import TenantStores
+    from .snapshot import read_manifest
+    from .executors import BoundedExecutor, ExecutorBusyError
+    from .backends.filters import validate_where
     from .document_loader import DocumentLoader, Document
     from .text_splitter import TextSplitter
     from .llm_service import LLMService, ChatMessage
 except ImportError:
     # Если относительные импорты не работают, используем абсолютные
     from ml.rag_bot.embeddings_service import EmbeddingsService
+    from ml.rag_bot.embedding_cache import EmbeddingCache
+    from ml.rag_bot.micro_batcher import EmbeddingMicroBatcher
+    from ml.rag_bot.embedding_pool import EmbeddingWorkerPool
+    from ml.rag_bot.projection import EmbeddingProjection, recall_report
     from ml.rag_bot.vector_store import VectorStore
+    from ml.rag_bot.tenants import TenantStores
+    from ml.rag_bot.snapshot import read_manifest
+    from ml.rag_bot.executors import BoundedExecutor, ExecutorBusyError
+    from ml.rag_bot.backends.filters import validate_where
     from ml.rag_bot.document_loader import DocumentLoader, Document
     from ml.rag_bot.text_splitter import TextSplitter
     from ml.rag_bot.llm_service import LLMService, ChatMessage
 
+# Имя снимка: без разделителей пути
+SNAPSHOT_NAME = re.compile(r"^[A-Za-z0-9_\-][A-Za-z0-9_.\-]*$")
+
 class RAGSystem:
     def __init__(self, 
                 embeddings_model: str = "cointegrated/rubert-tiny2",
                 llm_provider: str = "local",
                 llm_model: str = "microsoft/DialoGPT-medium",
                 chunk_size: int = 1000,
-                 overlap: int = 200):
+                 overlap: int = 200,
+                 embeddings_cache_dir: Optional[str] = "./data/embeddings_cache",
+                 embeddings_cache_size: int = 10000,
+                 embeddings_backend: str = "torch",
+                 embeddings_batch_size: int = 32,
+                 embeddings_max_batch_tokens: int = 16384,
+                 embeddings_length_bucketing: bool = True,
+                 query_batch_wait_ms: float = 5.0,
+                 query_batch_max_size: int = 32,
+                 ingest_workers: int = 0,
+                 embeddings_projection: Optional[str] = None,
+                 embeddings_projection_dim: int = 0,
+                 embeddings_projection_path: str = "./data/projections/projection.npz",
+                 vector_quantization: Optional[str] = None,
+                 vector_rescore_factor: int = 4,
+                 vector_backend: str = "chroma",
+                 vector_hnsw_m: int = 32,
+                 vector_hnsw_ef_construction: int = 200,
+                 vector_hnsw_ef_search: int = 64,
+                 vector_chroma_memory_limit_bytes: int = 0,
+                 vector_write_batch_size: int = 1000,
+                 vector_write_buffer_size: int = 0,
+                 vector_shards: int = 1,
+                 vector_space: Optional[str] = None,
+                 max_open_tenants: int = 32,
+                 min_similarity: float = 0.0,
+                 snapshots_dir: str = "./data/snapshots",
+                 embeddings_executor_workers: int = 8,
+                 llm_executor_workers: int = 4,
+                 ingest_executor_workers: int = 1,
+                 executor_max_pending: int = 64):
         """
         Инициализация RAG системы
         
@@ -35,34 +90,151 @@ class RAGSystem:
             llm_model: Модель LLM
             chunk_size: Размер чанка для разбиения текста
             overlap: Перекрытие между чанками
+            embeddings_cache_dir: Директория дискового кэша эмбеддингов (None - без диска)
+            embeddings_cache_size: Размер LRU кэша эмбеддингов в памяти (0 - выключен)
+            embeddings_backend: Бэкенд эмбеддингов ('torch', 'onnx', 'onnx-int8')
+            embeddings_batch_size: Максимум текстов в одном forward pass
+            embeddings_max_batch_tokens: Максимум токенов (с паддингом) в одном forward pass
+            embeddings_length_bucketing: Группировать тексты по длине перед forward pass
+            query_batch_wait_ms: Окно сбора параллельных запросов эмбеддингов (мс)
+            query_batch_max_size: Максимальный батч запросов (1 - микробатчинг выключен)
+            ingest_workers: Процессов для эмбеддингов при массовой загрузке (0 - в текущем процессе)
+            embeddings_projection: Уменьшение размерности ('pca', 'truncate', None - выключено)
+            embeddings_projection_dim: Размерность для 'truncate'
+            embeddings_projection_path: Файл обученной PCA проекции (см. fit_projection)
+            vector_quantization: Хранение векторов новой коллекции ('none', 'int8', 'binary')
+            vector_rescore_factor: Запас кандидатов для точного пересчета при квантовании
+            vector_backend: Реализация векторного индекса ('chroma', 'flat', 'hnsw')
+            vector_hnsw_m: Количество связей узла HNSW
+            vector_hnsw_ef_construction: Ширина поиска при построении HNSW
+            vector_hnsw_ef_search: Ширина поиска при запросе HNSW
+            vector_chroma_memory_limit_bytes: Лимит памяти сегментов ChromaDB на все коллекции (0 - без лимита)
+            vector_write_batch_size: Максимум чанков в одной записи в векторную БД
+            vector_write_buffer_size: Буфер записи между документами (0 - писать каждый документ сразу)
+            vector_shards: Количество шардов векторной БД (поиск во всех шардах параллельно)
+            vector_space: Пространство новой коллекции ('cosine' по умолчанию, 'l2')
+            max_open_tenants: Сколько коллекций арендаторов держать открытыми (LRU)
+            min_similarity: Порог similarity по умолчанию для search/ask (0 - без порога)
+            snapshots_dir: Директория снимков векторной БД (export_snapshot/import_snapshot)
+            embeddings_executor_workers: Потоков для эмбеддингов и поиска в async методах
+            llm_executor_workers: Потоков для генерации LLM в async методах
+            ingest_executor_workers: Потоков для загрузки документов в async методах
+            executor_max_pending: Максимум заданий в каждом пуле (сверх - ExecutorBusyError)
         """
         print("🚀 Инициализация RAG системы...")
 
                 # Инициализируем все компоненты
-        self.embeddings_service = EmbeddingsService(embeddings_model)
-        self.vector_store = VectorStore()
+        embeddings_cache = None
+        if embeddings_cache_dir or embeddings_cache_size > 0:
+            embeddings_cache = EmbeddingCache(embeddings_cache_dir, max_entries=embeddings_cache_size)
+
+        self.embeddings_projection_path = embeddings_projection_path
+        self.snapshots_dir = snapshots_dir
+        self.embeddings_service = EmbeddingsService(
+            embeddings_model,
+            cache=embeddings_cache,
+            backend=embeddings_backend,
+            batch_size=embeddings_batch_size,
+            max_batch_tokens=embeddings_max_batch_tokens,
+            length_bucketing=embeddings_length_bucketing,
+            projection=self._load_projection(embeddings_projection, embeddings_projection_dim)
+        )
+        self.query_batcher = None
+        if query_batch_max_size > 1:
+            self.query_batcher = EmbeddingMicroBatcher(
+                self.embeddings_service,
+                max_wait_ms=query_batch_wait_ms,
+                max_batch_size=query_batch_max_size
+            )
+        backend_options = {}
+        if vector_backend == "hnsw":
+            backend_options = {
+                "hnsw_m": vector_hnsw_m,
+                "hnsw_ef_construction": vector_hnsw_ef_construction,
+                "hnsw_ef_search": vector_hnsw_ef_search
+            }
+        elif vector_backend == "chroma" and vector_chroma_memory_limit_bytes > 0:
+            # Коллекции арендаторов делят один кэш сегментов: вытесненные не держат память
+            backend_options = {"memory_limit_bytes": vector_chroma_memory_limit_bytes}
+        vector_store_options = {
+            "quantization": vector_quantization,
+            "rescore_factor": vector_rescore_factor,
+            "backend": vector_backend,
+            "backend_options": backend_options,
+            "write_batch_size": vector_write_batch_size,
+            "write_buffer_size": vector_write_buffer_size,
+            "shards": vector_shards,
+            "space": vector_space
+        }
+        # Коллекция на арендатора; без арендатора - исходная коллекция (self.vector_store)
+        self.tenants = TenantStores(
+            lambda collection_name: VectorStore(collection_name=collection_name, **vector_store_options),
+            max_open=max_open_tenants
+        )
+        self.vector_store = self.tenants.default
+        self.min_similarity = min_similarity
         self.document_loader = DocumentLoader()
         self.text_splitter = TextSplitter(chunk_size=chunk_size, overlap=overlap)
         self.llm_service = LLMService(provider=llm_provider, model=llm_model)
+        self._llm_reconfigure_lock = threading.Lock()
+        # Номер последней запрошенной и последней примененной перенастройки LLM
+        self._llm_generation = 0
+        self._llm_applied_generation = 0
+
+        self.ingest_workers = ingest_workers
+        self.embedding_pool = None
+        self._pool_lock = threading.Lock()
+
+        # Отдельные пулы: медленный LLM или загрузка не занимают потоки поиска
+        self.embeddings_executor = BoundedExecutor("embeddings", embeddings_executor_workers, executor_max_pending)
+        self.llm_executor = BoundedExecutor("llm", llm_executor_workers, executor_max_pending)
+        self.ingest_executor = BoundedExecutor("ingest", ingest_executor_workers, executor_max_pending)
         
         print("✅ RAG система готова к работе")
 
-    def load_documents(self, file_paths: List[str]) -> Dict[str, Any]:
+    def load_documents(self, file_paths: List[str], use_pool: Optional[bool] = None,
+                       upload_batch: Optional[str] = None, tenant: Optional[str] = None) -> Dict[str, Any]:
         """
         Загрузка и индексация документов
         
         Args:
             file_paths: Список путей к файлам
+            use_pool: Кодировать чанки в пуле процессов (None - если задан ingest_workers)
+            upload_batch: Метка загрузки в метаданных чанков (None - сгенерировать)
+            tenant: Арендатор, в коллекцию которого загружаются документы (None - по умолчанию)
             
         Returns:
             Результат загрузки с метриками
+
+        Raises:
+            ValueError: Если имя арендатора некорректно
         """
+        # Статистика эмбеддингов только этой загрузки: запросы из других потоков в нее не попадают
+        with self.tenants.use(tenant) as vector_store, self.embeddings_service.track_encode_stats() as encode_stats:
+            return self._load_documents(vector_store, file_paths, use_pool, upload_batch, encode_stats)
+
+    def _load_documents(self, vector_store: VectorStore, file_paths: List[str], use_pool: Optional[bool],
+                        upload_batch: Optional[str], encode_stats: Dict[str, Any]) -> Dict[str, Any]:
         print(f"📚 Загружаем {len(file_paths)} документов...")
+        # По метке можно ограничить поиск одной загрузкой: where={"upload_batch": ...}
+        upload_batch = upload_batch or uuid.uuid4().hex
 
 
         total_documents = 0
         total_chunks = 0 
+        new_chunks = 0
+        skipped_chunks = 0
         errors = []
+        start_time = time.perf_counter()
+
+        if use_pool is None:
+            use_pool = self.ingest_workers > 0
+        pool = self._get_embedding_pool() if use_pool else None
+
+        # С пулом копим чанки нескольких документов, чтобы занять все процессы
+        flush_threshold = pool.num_workers * pool.chunk_size if pool is not None else 1
+        pending: List[Tuple[str, Document, List[str]]] = []
+        pending_chunks = 0
 
         for file_path in file_paths:
             try:
@@ -73,120 +245,344 @@ class RAGSystem:
                 # Split into chunks
                 chunks = self.text_splitter.split_text(document.content)
                 total_chunks += len(chunks)
+            
+            except Exception as e:
+                error_msg = f"Ошибка загрузки {file_path}: {e}"
+                errors.append(error_msg)
+                print(f"❌ {error_msg}")
+                continue
+
+            pending.append((file_path, document, chunks))
+            pending_chunks += len(chunks)
+
+            if pending_chunks >= flush_threshold:
+                batch_errors, batch_new, batch_skipped = self._index_chunks(vector_store, pending, pool, upload_batch)
+                errors.extend(batch_errors)
+                new_chunks += batch_new
+                skipped_chunks += batch_skipped
+                pending = []
+                pending_chunks = 0
+
+        if pending:
+            batch_errors, batch_new, batch_skipped = self._index_chunks(vector_store, pending, pool, upload_batch)
+            errors.extend(batch_errors)
+            new_chunks += batch_new
+            skipped_chunks += batch_skipped
+
+        # Остаток буфера записи - в конце загрузки, чтобы все чанки были видны в поиске
+        try:
+            vector_store.flush()
+        except Exception as e:
+            error_msg = f"Ошибка записи в векторную БД: {e}"
+            errors.append(error_msg)
+            print(f"❌ {error_msg}")
+        
+        embedding_report = self._embedding_report(encode_stats)
+        wall_seconds = time.perf_counter() - start_time
+        embedding_report["wall_seconds"] = round(wall_seconds, 4)
+        embedding_report["chunks_per_sec"] = round(total_chunks / wall_seconds, 1) if wall_seconds > 0 else 0.0
+        embedding_report["pool_workers"] = pool.num_workers if pool is not None else 0
+
+        result = {
+            "total_documents": total_documents,
+            "total_chunks": total_chunks,
+            "new_chunks": new_chunks,
+            "skipped_chunks": skipped_chunks,
+            "upload_batch": upload_batch,
+            "errors": errors,
+            "embedding": embedding_report,
+            "success": len(errors) == 0
+        }
+        
+        print(f"📊 Загрузка завершена: {total_documents} документов, {total_chunks} чанков "
+              f"(новых {new_chunks}, уже в базе {skipped_chunks})")
+        if pool is not None:
+            print(f"⚡ Эмбеддинги в пуле из {pool.num_workers} процессов: {embedding_report['chunks_per_sec']} чанков/сек")
+        else:
+            print(
+                f"⚡ Эмбеддинги: {embedding_report['tokens_per_sec']} токенов/сек, "
+                f"паддинг {embedding_report['padding_ratio']:.1%} "
+                f"(без группировки по длине было бы ~{embedding_report['estimated_unbucketed_padding_ratio']:.1%})"
+            )
+        return result
+
+    def load_directory(self, directory_path: str, extensions: Optional[List[str]] = None,
+                       use_pool: Optional[bool] = None, tenant: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Загрузка и индексация всех файлов из директории
+
+        Args:
+            directory_path: Путь к директории
+            extensions: Список расширений для фильтрации
+            use_pool: Кодировать чанки в пуле процессов (None - если задан ingest_workers)
+            tenant: Арендатор (None - по умолчанию)
 
-                # Create embeddings
-                embeddings = self.embeddings_service.encode_batch(chunks)
+        Returns:
+            Результат загрузки с метриками
+        """
+        file_paths = self.document_loader.list_files(directory_path, extensions)
+        return self.load_documents(file_paths, use_pool=use_pool, tenant=tenant)
+
+    def _index_chunks(self, vector_store: VectorStore, pending: List[Tuple[str, Document, List[str]]], pool=None,
+                      upload_batch: Optional[str] = None) -> Tuple[List[str], int, int]:
+        """
+        Эмбеддинги и запись в векторную БД для группы документов
+
+        Чанки, которые уже есть в базе (тот же ID из содержимого), не кодируются
+        и не записываются повторно.
+
+        Args:
+            vector_store: Коллекция арендатора
+            pending: Список (путь, документ, чанки)
+            pool: Пул процессов эмбеддингов (None - в текущем процессе)
+            upload_batch: Метка загрузки для метаданных чанков
 
+        Returns:
+            Список ошибок, число новых чанков, число пропущенных дублей
+        """
+        # ID из содержимого: source hash + номер чанка + хеш чанка
+        planned = []
+        for file_path, document, chunks in pending:
+            source_id = vector_store.make_source_id(document.content)
+            chunk_ids = [vector_store.make_chunk_id(source_id, i, chunk) for i, chunk in enumerate(chunks)]
+            planned.append((file_path, document, chunks, source_id, chunk_ids))
+
+        try:
+            existing = vector_store.existing_ids([doc_id for *_, chunk_ids in planned for doc_id in chunk_ids])
+            # Новые строки каждого документа определяются один раз: одинаковые файлы в группе
+            # (дубли в директории, повторная загрузка в одном запросе) кодируются и пишутся один раз,
+            # и срезы эмбеддингов ниже совпадают с new_texts
+            seen = set(existing)
+            planned_rows = []
+            for *_, chunk_ids in planned:
+                rows = []
+                for i, doc_id in enumerate(chunk_ids):
+                    if doc_id not in seen:
+                        seen.add(doc_id)
+                        rows.append(i)
+                planned_rows.append(rows)
+            new_texts = [
+                chunks[i]
+                for (_, _, chunks, _, _), rows in zip(planned, planned_rows)
+                for i in rows
+            ]
+
+            # Create embeddings
+            embeddings = self.embeddings_service.encode_batch_array(new_texts, pool=pool) if new_texts else None
+        except Exception as e:
+            errors = [f"Ошибка загрузки {file_path}: {e}" for file_path, _, _ in pending]
+            for error_msg in errors:
+                print(f"❌ {error_msg}")
+            return errors, 0, 0
+
+        errors = []
+        new_count = 0
+        skipped_count = 0
+        offset = 0
+        for (file_path, document, chunks, source_id, chunk_ids), new_rows in zip(planned, planned_rows):
+            if not chunks:
+                print(f"⚠️ {document.metadata['filename']}: пустой документ, пропускаем")
+                continue
+
+            document_embeddings = embeddings[offset:offset + len(new_rows)] if new_rows else None
+            offset += len(new_rows)
+            skipped_count += len(chunks) - len(new_rows)
+
+            if not new_rows:
+                print(f"⏭️ {document.metadata['filename']}: уже в базе, пропускаем")
+                continue
+
+            try:
                 # Add to vector store
                 metadata_list = []
 
-                for i, chunk in enumerate(chunks):
+                for i in new_rows:
                     metadata = {
                         **document.metadata,
                         "chunk_index": i,
-                        "chunk_size": len(chunk),
+                        "chunk_size": len(chunks[i]),
                         "total_chunks": len(chunks),
                     }
+                    if upload_batch:
+                        metadata["upload_batch"] = upload_batch
                     metadata_list.append(metadata)
 
                 # add vector db
-                self.vector_store.add_documents(chunks, embeddings, metadata_list)
+                vector_store.add_documents(
+                    [chunks[i] for i in new_rows],
+                    document_embeddings,
+                    metadata_list,
+                    ids=[chunk_ids[i] for i in new_rows],
+                    source_id=source_id
+                )
+                new_count += len(new_rows)
+
+                print(f"✅ {document.metadata['filename']}: {len(new_rows)} новых чанков из {len(chunks)}")
 
-                print(f"✅ {document.metadata['filename']}: {len(chunks)} чанков")
-            
             except Exception as e:
                 error_msg = f"Ошибка загрузки {file_path}: {e}"
                 errors.append(error_msg)
                 print(f"❌ {error_msg}")
-        
-        result = {
-            "total_documents": total_documents,
-            "total_chunks": total_chunks,
-            "errors": errors,
-            "success": len(errors) == 0
-        }
-        
-        print(f"📊 Загрузка завершена: {total_documents} документов, {total_chunks} чанков")
-        return result
+
+        return errors, new_count, skipped_count
+
+    def _get_embedding_pool(self) -> EmbeddingWorkerPool:
+        """Пул процессов эмбеддингов (создается при первой массовой загрузке)"""
+        with self._pool_lock:
+            if self.embedding_pool is None:
+                service = self.embeddings_service
+                self.embedding_pool = EmbeddingWorkerPool(
+                    service.model_name,
+                    backend=service.backend,
+                    onnx_dir=service.onnx_dir,
+                    num_workers=self.ingest_workers if self.ingest_workers > 0 else None,
+                    batch_size=service.batch_size,
+                    max_batch_tokens=service.max_batch_tokens,
+                    length_bucketing=service.length_bucketing
+                )
+            return self.embedding_pool
                 
-    def ask(self, question: str, top_k: int = 5) -> Dict[str, Any]:
+    def ask(self, question: str, top_k: int = 5, llm_service: Optional[LLMService] = None,
+            where: Optional[Dict[str, Any]] = None, min_similarity: Optional[float] = None,
+            tenant: Optional[str] = None) -> Dict[str, Any]:
         """
         Задать вопрос RAG системе
         
         Args:
             question: Вопрос пользователя
             top_k: Количество релевантных документов для поиска
+            llm_service: LLM сервис для ответа (None - текущий)
+            where: Фильтр по метаданным чанков (см. VectorStore.search)
+            min_similarity: Порог similarity чанков для контекста (None - из настроек)
+            tenant: Арендатор, в документах которого искать (None - по умолчанию)
             
         Returns:
             Ответ с источниками и метаданными
+
+        Raises:
+            ValueError: Если фильтр или имя арендатора некорректны
         """
         print(f"💬 Задаем вопрос: {question}")
+        if where is not None:
+            validate_where(where)
+        self.tenants.normalize(tenant)
+
+        # Запрос до конца работает с тем LLM, который был активен при его начале
+        llm_service = llm_service or self.llm_service
 
         try:
-            # Search for vector db
-            question_embedding = self.embeddings_service.encode(question)
+            search_results = self._retrieve(question, top_k, where, min_similarity, tenant)
+            if not search_results:
+                return self._no_results_response(question)
+            return self._generate_answer(question, search_results, llm_service)
+        except Exception as e:
+            return self._ask_error_response(question, e)
 
-            # Search for relevant documents
-            search_results = self.vector_store.search(question_embedding, top_k=top_k)
+    async def aask(self, question: str, top_k: int = 5, llm_service: Optional[LLMService] = None,
+                   where: Optional[Dict[str, Any]] = None, min_similarity: Optional[float] = None,
+                   tenant: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Асинхронный ask: поиск в пуле эмбеддингов, генерация в пуле LLM
 
-            
-            if not search_results:
-                return {
-                    "answer": "К сожалению, не удалось найти релевантную информацию в базе знаний.",
-                    "sources": [],
-                    "question": question,
-                    "status": "no_results"
-                }
-            
-            # 3. Подготовка контекста
-            context_parts = []
-            sources = []
-
-            for result in search_results:
-                context_parts.append(result['document'])
-                sources.append({
-                    "id": result['id'],
-                    "similarity": result['similarity'],
-                    "metadata": result['metadata']
-                })
-            
-            context = "\n\n".join(context_parts)
-
-            # generate answer
-            answer = self.llm_service.generate_rag_response(question, context, sources)
-
-            result = {
-                "answer": answer,
-                "sources": sources,
-                "question": question,
-                "context_length": len(context),
-                "sources_count": len(sources),
-                "status": "success"
-            }
+        Raises:
+            ExecutorBusyError: Если пул переполнен
+            ValueError: Если фильтр или имя арендатора некорректны
+        """
+        print(f"💬 Задаем вопрос: {question}")
+        if where is not None:
+            validate_where(where)
+        self.tenants.normalize(tenant)
+        llm_service = llm_service or self.llm_service
 
-            print(f"✅ Ответ сгенерирован на основе {len(sources)} источников")
-            return result
-            
+        try:
+            search_results = await self.embeddings_executor.run(
+                self._retrieve, question, top_k, where, min_similarity, tenant
+            )
+            if not search_results:
+                return self._no_results_response(question)
+            return await self.llm_executor.run(self._generate_answer, question, search_results, llm_service)
+        except ExecutorBusyError:
+            raise
         except Exception as e:
-            error_msg = f"Ошибка обработки вопроса: {e}"
-            print(f"❌ {error_msg}")
-            
-            return {
-                "answer": "Произошла ошибка при обработке вопроса. Попробуйте переформулировать.",
-                "sources": [],
-                "question": question,
-                "error": error_msg,
-                "status": "error"
-            }
+            return self._ask_error_response(question, e)
+
+    def _retrieve(self, question: str, top_k: int, where: Optional[Dict[str, Any]] = None,
+                  min_similarity: Optional[float] = None, tenant: Optional[str] = None) -> List[Dict]:
+        """Эмбеддинг вопроса и поиск релевантных чанков в коллекции арендатора"""
+        question_embedding = self._encode_query(question)
+        with self.tenants.use(tenant) as vector_store:
+            return vector_store.search(
+                question_embedding, top_k=top_k, where=where, min_similarity=self._similarity_cutoff(min_similarity)
+            )
+
+    def _similarity_cutoff(self, min_similarity: Optional[float]) -> Optional[float]:
+        """Порог запроса или порог по умолчанию (0 и меньше - без порога)"""
+        cutoff = self.min_similarity if min_similarity is None else min_similarity
+        return cutoff if cutoff > 0 else None
+
+    @staticmethod
+    def _no_results_response(question: str) -> Dict[str, Any]:
+        return {
+            "answer": "К сожалению, не удалось найти релевантную информацию в базе знаний.",
+            "sources": [],
+            "question": question,
+            "status": "no_results"
+        }
+
+    def _generate_answer(self, question: str, search_results: List[Dict], llm_service: LLMService) -> Dict[str, Any]:
+        """Собрать контекст из найденных чанков и сгенерировать ответ"""
+        # 3. Подготовка контекста
+        context_parts = []
+        sources = []
+
+        for result in search_results:
+            context_parts.append(result['document'])
+            sources.append({
+                "id": result['id'],
+                "similarity": result['similarity'],
+                "metadata": result['metadata']
+            })
+        
+        context = "\n\n".join(context_parts)
+
+        # generate answer
+        answer = llm_service.generate_rag_response(question, context, sources)
+
+        result = {
+            "answer": answer,
+            "sources": sources,
+            "question": question,
+            "context_length": len(context),
+            "sources_count": len(sources),
+            "status": "success"
+        }
+
+        print(f"✅ Ответ сгенерирован на основе {len(sources)} источников")
+        return result
+
+    @staticmethod
+    def _ask_error_response(question: str, error: Exception) -> Dict[str, Any]:
+        error_msg = f"Ошибка обработки вопроса: {error}"
+        print(f"❌ {error_msg}")
+
+        return {
+            "answer": "Произошла ошибка при обработке вопроса. Попробуйте переформулировать.",
+            "sources": [],
+            "question": question,
+            "error": error_msg,
+            "status": "error"
+        }
 
     
-    def chat(self, message: str, history: List[Dict[str, str]] = None) -> Dict[str, Any]:
+    def chat(self, message: str, history: List[Dict[str, str]] = None,
+             tenant: Optional[str] = None) -> Dict[str, Any]:
         """
         Чат с системой (с контекстом из истории)
         
         Args:
             message: Новое сообщение
             history: История сообщений [{"role": "user/assistant", "content": "..."}]
+            tenant: Арендатор, в документах которого искать (None - по умолчанию)
             
         Returns:
             Ответ с источниками и метаданными
@@ -194,21 +590,52 @@ class RAGSystem:
 
         if history is None:
             history = []
+
+        llm_service = self.llm_service
         
         # Сначала пытаемся ответить через RAG
-        rag_response = self.ask(message)
-
+        rag_response = self.ask(message, llm_service=llm_service, tenant=tenant)
 
         # Если RAG дал хороший ответ, используем его
-        if rag_response["status"] == "success" and rag_response["sources_count"] > 0:
-            return {
-                "answer": rag_response["answer"],
-                "sources": rag_response["sources"],
-                "type": "rag",
-                "status": "success"
-            }
+        if self._is_rag_answer(rag_response):
+            return self._rag_chat_response(rag_response)
+
+        return self._chat_without_documents(message, history, llm_service)
 
-        #else using just chat
+    async def achat(self, message: str, history: List[Dict[str, str]] = None,
+                    tenant: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Асинхронный chat (блокирующая работа выполняется в пулах эмбеддингов и LLM)
+
+        Raises:
+            ExecutorBusyError: Если пул переполнен
+        """
+        if history is None:
+            history = []
+
+        llm_service = self.llm_service
+        rag_response = await self.aask(message, llm_service=llm_service, tenant=tenant)
+        if self._is_rag_answer(rag_response):
+            return self._rag_chat_response(rag_response)
+
+        return await self.llm_executor.run(self._chat_without_documents, message, history, llm_service)
+
+    @staticmethod
+    def _is_rag_answer(rag_response: Dict[str, Any]) -> bool:
+        return rag_response["status"] == "success" and rag_response["sources_count"] > 0
+
+    @staticmethod
+    def _rag_chat_response(rag_response: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "answer": rag_response["answer"],
+            "sources": rag_response["sources"],
+            "type": "rag",
+            "status": "success"
+        }
+
+    def _chat_without_documents(self, message: str, history: List[Dict[str, str]],
+                                llm_service: LLMService) -> Dict[str, Any]:
+        """Ответ LLM только по истории чата"""
         messages = []
 
         # Add history
@@ -219,7 +646,7 @@ class RAGSystem:
         messages.append(ChatMessage(role="user", content=message))
         
         # Генерируем ответ
-        answer = self.llm_service.generate_chat_response(messages)
+        answer = llm_service.generate_chat_response(messages)
         
         return {
             "answer": answer,
@@ -228,39 +655,308 @@ class RAGSystem:
             "status": "success"
         }
         
-    def search(self, query: str, top_k: int = 10) -> List[Dict]:
+    def search(self, query: str, top_k: int = 10, where: Optional[Dict[str, Any]] = None,
+               min_similarity: Optional[float] = None, tenant: Optional[str] = None) -> List[Dict]:
         """
         Поиск в векторной базе без генерации ответа
         
         Args:
             query: Поисковый запрос
             top_k: Количество результатов
+            where: Фильтр по метаданным чанков (см. VectorStore.search)
+            min_similarity: Порог similarity (None - из настроек)
+            tenant: Арендатор (None - по умолчанию)
             
         Returns:
             Список найденных документов
+
+        Raises:
+            ValueError: Если фильтр или имя арендатора некорректны
         """
-        try:
-            query_embedding = self.embeddings_service.encode(query)
-            results = self.vector_store.search(query_embedding, top_k=top_k)
-            
-            return results
-            
-        except Exception as e:
-            print(f"❌ Ошибка поиска: {e}")
+        if where is not None:
+            validate_where(where)
+
+        with self.tenants.use(tenant) as vector_store:
+            try:
+                query_embedding = self._encode_query(query)
+                results = vector_store.search(
+                    query_embedding, top_k=top_k, where=where, min_similarity=self._similarity_cutoff(min_similarity)
+                )
+                
+                return results
+                
+            except Exception as e:
+                print(f"❌ Ошибка поиска: {e}")
+                return []
+
+    def search_many(self, queries: List[str], top_k: int = 10, where: Optional[Dict[str, Any]] = None,
+                    min_similarity: Optional[float] = None, tenant: Optional[str] = None) -> List[List[Dict]]:
+        """
+        Поиск по нескольким запросам: один батч эмбеддингов и одно обращение к векторной БД
+
+        Args:
+            queries: Поисковые запросы
+            top_k: Количество результатов на запрос
+            where: Фильтр по метаданным (общий для всех запросов)
+            min_similarity: Порог similarity (None - из настроек)
+            tenant: Арендатор (None - по умолчанию)
+
+        Returns:
+            Список найденных документов для каждого запроса
+        """
+        if not queries:
             return []
-    def get_status(self) -> Dict[str, Any]:
+        if where is not None:
+            validate_where(where)
+
+        with self.tenants.use(tenant) as vector_store:
+            try:
+                query_embeddings = self.embeddings_service.encode_batch_array(queries)
+                return vector_store.search_many(
+                    query_embeddings, top_k=top_k, where=where, min_similarity=self._similarity_cutoff(min_similarity)
+                )
+
+            except Exception as e:
+                print(f"❌ Ошибка пакетного поиска: {e}")
+                return [[] for _ in queries]
+
+    async def asearch(self, query: str, top_k: int = 10, where: Optional[Dict[str, Any]] = None,
+                      min_similarity: Optional[float] = None, tenant: Optional[str] = None) -> List[Dict]:
+        """Асинхронный search (в пуле эмбеддингов)"""
+        return await self.embeddings_executor.run(self.search, query, top_k, where, min_similarity, tenant)
+
+    async def asearch_many(self, queries: List[str], top_k: int = 10, where: Optional[Dict[str, Any]] = None,
+                           min_similarity: Optional[float] = None, tenant: Optional[str] = None) -> List[List[Dict]]:
+        """Асинхронный search_many (в пуле эмбеддингов)"""
+        return await self.embeddings_executor.run(self.search_many, queries, top_k, where, min_similarity, tenant)
+
+    async def aload_documents(self, file_paths: List[str], use_pool: Optional[bool] = None,
+                              upload_batch: Optional[str] = None, tenant: Optional[str] = None) -> Dict[str, Any]:
+        """Асинхронный load_documents (в пуле загрузки, не занимает потоки поиска)"""
+        return await self.ingest_executor.run(self.load_documents, file_paths, use_pool, upload_batch, tenant)
+
+    async def aload_directory(self, directory_path: str, extensions: Optional[List[str]] = None,
+                              use_pool: Optional[bool] = None, tenant: Optional[str] = None) -> Dict[str, Any]:
+        """Асинхронный load_directory (в пуле загрузки)"""
+        return await self.ingest_executor.run(self.load_directory, directory_path, extensions, use_pool, tenant)
+
+    @staticmethod
+    def _embedding_report(stats: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Статистика эмбеддингов за одну загрузку (см. EmbeddingsService.track_encode_stats)
+
+        Токены - реальные длины образца каждого батча (measured_*) и оценка по длине
+        для остальных текстов; паддинг без группировки по длине - расчет для тех же
+        текстов в исходном порядке, а не измерение.
+        """
+        tokens = stats["tokens"]
+        padded = stats["padded_tokens"]
+        unbucketed = stats["unbucketed_padded_tokens"]
+        seconds = stats["seconds"]
+
+        return {
+            "texts_encoded": stats["texts"],
+            "tokens": tokens,
+            "measured_texts": stats["measured_texts"],
+            "measured_tokens": stats["measured_tokens"],
+            "seconds": round(seconds, 4),
+            "tokens_per_sec": round(tokens / seconds, 1) if seconds > 0 else 0.0,
+            "padding_ratio": 1 - tokens / padded if padded else 0.0,
+            "estimated_unbucketed_padding_ratio": 1 - tokens / unbucketed if unbucketed else 0.0,
+        }
+
+    def reconfigure_llm(self, provider: str, model: str) -> Dict[str, Any]:
+        """
+        Заменить LLM сервис без пересоздания RAG системы
+
+        Новый сервис создается без блокировки, пока старый продолжает обслуживать
+        запросы; под блокировкой только подменяется ссылка. Запросы, начатые до
+        замены, завершаются на старом сервисе. Эмбеддинги и векторная БД не трогаются.
+        Из параллельных перенастроек применяется запрошенная последней.
+
+        Args:
+            provider: Провайдер LLM ('openai', 'anthropic', 'local')
+            model: Модель LLM
+
+        Returns:
+            Статус предыдущего и нового LLM сервиса; applied=False, если
+            пока сервис создавался, была запрошена более новая настройка
+        """
+        with self._llm_reconfigure_lock:
+            self._llm_generation += 1
+            generation = self._llm_generation
+
+        # Загрузка модели (для local - минуты) не держит блокировку
+        new_service = LLMService(provider=provider, model=model)
+
+        with self._llm_reconfigure_lock:
+            previous_service = self.llm_service
+            applied = generation > self._llm_applied_generation
+            if applied:
+                self._llm_applied_generation = generation
+                self.llm_service = new_service
+
+        if applied:
+            print(f"🔄 LLM заменен: {previous_service.provider} - {previous_service.model} -> {provider} - {model}")
+        else:
+            print(f"⚠️ LLM {provider} - {model} не применен: уже применена более новая настройка")
+        return {
+            "applied": applied,
+            "previous": previous_service.get_status(),
+            "current": self.llm_service.get_status()
+        }
+
+    async def areconfigure_llm(self, provider: str, model: str) -> Dict[str, Any]:
+        """Асинхронный reconfigure_llm (сервис создается в пуле LLM)"""
+        return await self.llm_executor.run(self.reconfigure_llm, provider, model)
+
+    def _load_projection(self, method: Optional[str], dim: int) -> Optional[EmbeddingProjection]:
+        """Проекция эмбеддингов из настроек"""
+        if not method or method == "none":
+            return None
+        if method == "truncate":
+            if dim <= 0:
+                raise ValueError("EMBEDDINGS_PROJECTION=truncate requires EMBEDDINGS_PROJECTION_DIM > 0")
+            return EmbeddingProjection.truncate(dim)
+        if method == "pca":
+            if Path(self.embeddings_projection_path).exists():
+                return EmbeddingProjection.load(self.embeddings_projection_path)
+            print(f"⚠️ PCA проекция не найдена ({self.embeddings_projection_path}), используем полные векторы. "
+                  f"Обучите ее через fit_projection().")
+            return None
+        raise ValueError(f"Unknown projection method: {method}")
+
+    def fit_projection(self, method: str = "pca", dim: Optional[int] = None, dims: Optional[List[int]] = None,
+                       k: int = 10, sample_size: int = 5000) -> Dict[str, Any]:
+        """
+        Оценить и (опционально) обучить проекцию эмбеддингов на текущем корпусе
+
+        Args:
+            method: 'pca' или 'truncate'
+            dim: Размерность проекции для сохранения (None - только отчет)
+            dims: Кандидаты для отчета recall@k (по умолчанию степени двойки)
+            k: Глубина recall@k
+            sample_size: Сколько чанков корпуса использовать
+
+        Returns:
+            Отчет recall@k против полноразмерных векторов и путь к сохраненной проекции
+
+        Сохраненная проекция включается настройкой EMBEDDINGS_PROJECTION при следующем
+        запуске; векторы другой размерности нельзя смешивать в одной коллекции,
+        поэтому после включения документы нужно загрузить заново.
+        """
+        texts = self.vector_store.sample_documents(sample_size)
+        if len(texts) <= k:
+            raise ValueError(f"Недостаточно чанков в базе для оценки recall@{k}: {len(texts)}")
+
+        # Обучаем и сравниваем всегда на полноразмерных векторах модели
+        full = self.embeddings_service.encode_batch_array(texts, project=False)
+        full_dim = full.shape[1]
+        # PCA дает не больше min(n_samples, full_dim) компонент
+        max_dim = min(len(texts), full_dim) if method == "pca" else full_dim
+        if dim is not None and not (0 < dim < full_dim and dim <= max_dim):
+            raise ValueError(f"Размерность проекции должна быть в (0, {full_dim}) и не больше {max_dim}, получено {dim}")
+        if dims is None:
+            dims = [d for d in (32, 64, 96, 128, 192, 256, 384, 512) if d < full_dim and d <= max_dim]
+        if dim is not None and dim not in dims:
+            dims = dims + [dim]
+
+        result = {
+            "method": method,
+            "full_dim": full_dim,
+            "sample_size": len(texts),
+            "report": recall_report(full, dims, method=method, k=k),
+            "saved_path": None
+        }
+
+        if dim is not None:
+            projection = EmbeddingProjection.fit_pca(full, dim) if method == "pca" else EmbeddingProjection.truncate(dim)
+            projection.save(self.embeddings_projection_path)
+            result["saved_path"] = self.embeddings_projection_path
+
+        return result
+
+    def _snapshot_path(self, name: str) -> str:
+        # Снимки только внутри snapshots_dir: имя приходит из API
+        if not SNAPSHOT_NAME.match(name):
+            raise ValueError(f"Некорректное имя снимка: {name}")
+        return str(Path(self.snapshots_dir) / name)
+
+    def export_snapshot(self, name: Optional[str] = None, tenant: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Выгрузить векторную БД в снимок (перенос на другой узел без повторной загрузки файлов)
+
+        Args:
+            name: Имя снимка в snapshots_dir (None - по текущему времени)
+            tenant: Арендатор, коллекция которого выгружается (None - по умолчанию)
+
+        Returns:
+            manifest снимка и путь к нему
+        """
+        name = name or f"snapshot_{datetime.now():%Y%m%d_%H%M%S}"
+        path = self._snapshot_path(name)
+        status = self.embeddings_service.get_status()
+        with self.tenants.use(tenant) as vector_store:
+            manifest = vector_store.export_snapshot(path, extra={
+                "embeddings_model": status["model"],
+                "embeddings_dimension": status["output_dimension"],
+                "projection": status["projection"],
+            })
+        return {"name": name, "path": path, "manifest": manifest}
+
+    def import_snapshot(self, name: str, replace: bool = False, tenant: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Загрузить снимок в векторную БД без расчета эмбеддингов
+
+        Args:
+            name: Имя снимка в snapshots_dir
+            replace: Очистить базу перед загрузкой
+            tenant: Арендатор, в коллекцию которого загружается снимок (None - по умолчанию)
+
+        Returns:
+            Количество загруженных и пропущенных чанков
+
+        Raises:
+            ValueError: Снимок сделан другой моделью эмбеддингов или с другой размерностью,
+                либо имя арендатора некорректно
+        """
+        path = self._snapshot_path(name)
+        manifest = read_manifest(path)
+        status = self.embeddings_service.get_status()
+        # Векторы другой модели несовместимы с эмбеддингами запросов
+        if manifest.get("embeddings_model") not in (None, status["model"]):
+            raise ValueError(f"Снимок сделан моделью {manifest['embeddings_model']}, текущая - {status['model']}")
+        if manifest["count"] and manifest["dimension"] != status["output_dimension"]:
+            raise ValueError(f"Размерность снимка {manifest['dimension']}, текущая - {status['output_dimension']}")
+        with self.tenants.use(tenant) as vector_store:
+            return vector_store.import_snapshot(path, replace=replace)
+
+    def _encode_query(self, text: str):
+        """Эмбеддинг запроса (через микробатчер, если он включен)"""
+        if self.query_batcher is not None:
+            return self.query_batcher.encode_array(text)
+        return self.embeddings_service.encode_array(text)
+
+    def get_status(self, include_recall: bool = False) -> Dict[str, Any]:
         """
         Получение статуса системы
         
+        Args:
+            include_recall: Измерить recall квантованного поиска (см. VectorStore.get_collection_info)
+            
         Returns:
             Статус системы
         """
         return {
-            "embeddings_service": {
-                "model": self.embeddings_service.model_name,
-                "status": "ready"
+            "embeddings_service": self.embeddings_service.get_status(),
+            "query_batcher": self.query_batcher.get_stats() if self.query_batcher is not None else None,
+            "embedding_pool": self.embedding_pool.get_stats() if self.embedding_pool is not None else None,
+            "executors": {
+                executor.name: executor.get_stats()
+                for executor in (self.embeddings_executor, self.llm_executor, self.ingest_executor)
             },
-            "vector_store": self.vector_store.get_collection_info(),
+            "vector_store": self.vector_store.get_collection_info(include_recall=include_recall),
+            "tenants": self.tenants.get_stats(),
             "llm_service": self.llm_service.get_status(),
             "text_splitter": {
                 "chunk_size": self.text_splitter.chunk_size,
@@ -268,6 +964,73 @@ class RAGSystem:
             },
             "system_status": "ready"
         }
-    def clear_database(self) -> bool:
-        """Очистить векторную базу данных"""
-        return self.vector_store.clear_collection()
+
+    def get_health(self) -> Dict[str, Any]:
+        """
+        Краткий статус для health check (только счетчики, без обращения к индексу и моделям)
+        """
+        llm_status = self.llm_service.get_status()
+        return {
+            "system_status": "ready",
+            "documents_count": self.vector_store.stats.chunks,
+            "open_tenants": self.tenants.get_stats()["open"],
+            "embeddings_model": self.embeddings_service.model_name,
+            "llm_status": llm_status["status"],
+            "llm_provider": llm_status["provider"]
+        }
+
+    def get_sources(self, tenant: Optional[str] = None) -> Dict[str, Any]:
+        """Загруженные источники арендатора: общие счетчики и чанки и байты по каждому файлу"""
+        with self.tenants.use(tenant) as vector_store:
+            return {
+                **vector_store.stats.get_summary(),
+                "sources": vector_store.stats.get_sources(),
+            }
+
+    def list_documents(self, limit: int = 100, cursor: Optional[str] = None,
+                       where: Optional[Dict[str, Any]] = None, tenant: Optional[str] = None) -> Dict[str, Any]:
+        """Страница чанков коллекции арендатора (см. VectorStore.list_documents)"""
+        with self.tenants.use(tenant) as vector_store:
+            page = vector_store.list_documents(limit, cursor, where)
+            return {**page, "total_documents": vector_store.stats.chunks}
+
+    def flush_documents(self, tenant: Optional[str] = None) -> int:
+        """Записать буфер загрузки арендатора в векторную БД (количество записанных чанков)"""
+        with self.tenants.use(tenant) as vector_store:
+            return vector_store.flush()
+
+    def delete_document(self, doc_id: str, tenant: Optional[str] = None) -> bool:
+        """Удалить чанк по ID из коллекции арендатора"""
+        with self.tenants.use(tenant) as vector_store:
+            return vector_store.delete_document(doc_id)
+
+    def clear_database(self, tenant: Optional[str] = None) -> Optional[int]:
+        """Очистить коллекцию арендатора (количество удаленных чанков или None при ошибке)"""
+        with self.tenants.use(tenant) as vector_store:
+            return vector_store.clear_collection()
+
+    def delete_source(self, source: str, tenant: Optional[str] = None) -> int:
+        """
+        Удалить все чанки загруженного файла
+
+        Args:
+            source: Имя файла или source_id
+            tenant: Арендатор (None - по умолчанию)
+
+        Returns:
+            Количество удаленных чанков
+        """
+        with self.tenants.use(tenant) as vector_store:
+            return vector_store.delete_by_source(source)
+
+    def close(self):
+        """Остановить фоновые потоки и процессы, сохранить индекс векторной БД"""
+        for executor in (self.embeddings_executor, self.llm_executor, self.ingest_executor):
+            executor.shutdown(wait=False)
+        if self.query_batcher is not None:
+            self.query_batcher.shutdown()
+        with self._pool_lock:
+            if self.embedding_pool is not None:
+                self.embedding_pool.shutdown()
+                self.embedding_pool = None
+        self.tenants.close()
@@ -0,0 +1,212 @@
+"""
+Snapshot - экспорт и импорт содержимого VectorStore без повторного расчета эмбеддингов
+
+Формат директории снимка:
+    manifest.json           - версия формата, количество чанков, размерность, доп. сведения
+    embeddings.npy          - float32 (n, dim), открывается через np.load(mmap_mode="r")
+    ids.bin / ids.idx       - колонка ID: UTF-8 строки подряд и смещения int64 (n + 1)
+    documents.bin / .idx    - колонка текстов чанков
+    metadatas.bin / .idx    - колонка метаданных (JSON)
+"""
+from typing import List, Dict, Any, Optional, Iterator, BinaryIO
+from datetime import datetime
+from pathlib import Path
+import json
+import time
+
+import numpy as np
+
+SNAPSHOT_FORMAT = 1
+COLUMNS = ("ids", "documents", "metadatas")
+
+
+class _ColumnWriter:
+    """Строковая колонка: значения подряд в .bin, границы в .idx"""
+
+    def __init__(self, directory: Path, name: str):
+        self.directory = directory
+        self.name = name
+        self._file: BinaryIO = open(directory / f"{name}.bin", "wb")
+        self._offsets = [0]
+
+    def extend(self, values: List[str]):
+        for value in values:
+            data = value.encode("utf-8")
+            self._file.write(data)
+            self._offsets.append(self._offsets[-1] + len(data))
+
+    def close(self):
+        self._file.close()
+        np.save(self.directory / f"{self.name}.idx.npy", np.array(self._offsets, dtype=np.int64))
+
+
+class _ColumnReader:
+    def __init__(self, directory: Path, name: str):
+        self.offsets = np.load(directory / f"{name}.idx.npy")
+        self.data = np.memmap(directory / f"{name}.bin", dtype=np.uint8, mode="r") if self.offsets[-1] else None
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def read(self, start: int, end: int) -> List[str]:
+        if self.data is None:
+            return [""] * (end - start)
+        # Одно чтение на страницу, дальше нарезка по смещениям
+        base = int(self.offsets[start])
+        blob = self.data[base:int(self.offsets[end])].tobytes()
+        bounds = self.offsets[start:end + 1] - base
+        return [blob[bounds[i]:bounds[i + 1]].decode("utf-8") for i in range(end - start)]
+
+
+def read_manifest(path: str) -> Dict[str, Any]:
+    """Прочитать manifest.json снимка"""
+    manifest_path = Path(path) / "manifest.json"
+    if not manifest_path.exists():
+        raise FileNotFoundError(f"Snapshot not found: {path}")
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported snapshot format: {manifest.get('format')}")
+    return manifest
+
+
+def export_snapshot(vector_store, path: str, extra: Optional[Dict[str, Any]] = None,
+                    page_size: int = 5000) -> Dict[str, Any]:
+    """
+    Выгрузить все чанки коллекции в снимок
+
+    Args:
+        vector_store: VectorStore
+        path: Директория снимка (создается; существующие файлы перезаписываются)
+        extra: Дополнительные сведения для manifest (например, модель эмбеддингов)
+        page_size: Чанков за одно чтение из бэкенда
+
+    Returns:
+        manifest снимка
+    """
+    start_time = time.perf_counter()
+    directory = Path(path)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    with vector_store.write_lock():
+        vector_store.flush()
+        collection = vector_store.collection
+        total = collection.count()
+        sample = collection.get(limit=1, include=["embeddings"])
+        dimension = len(sample["embeddings"][0]) if sample["ids"] else 0
+
+        embeddings = np.lib.format.open_memmap(
+            directory / "embeddings.npy", mode="w+", dtype=np.float32, shape=(total, dimension)
+        )
+        writers = {name: _ColumnWriter(directory, name) for name in COLUMNS}
+        written = 0
+        try:
+            for page in collection.iter_pages(page_size, include=["documents", "metadatas", "embeddings"]):
+                count = len(page["ids"])
+                if written + count > total:
+                    break
+                embeddings[written:written + count] = np.asarray(page["embeddings"], dtype=np.float32)
+                writers["ids"].extend(page["ids"])
+                writers["documents"].extend([document or "" for document in page["documents"]])
+                writers["metadatas"].extend([json.dumps(meta or {}, ensure_ascii=False) for meta in page["metadatas"]])
+                written += count
+        finally:
+            for writer in writers.values():
+                writer.close()
+            embeddings.flush()
+            del embeddings
+
+    if written != total:
+        raise RuntimeError(f"Collection changed during export: expected {total} chunks, read {written}")
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "collection_name": vector_store.collection_name,
+        "backend": vector_store.backend,
+        "space": vector_store.space,
+        "count": written,
+        "dimension": dimension,
+        **(extra or {}),
+    }
+    (directory / "manifest.json").write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"📦 Снимок {directory}: {written} чанков за {time.perf_counter() - start_time:.2f} с")
+    return manifest
+
+
+def iter_snapshot(path: str, batch_size: int = 10000) -> Iterator[Dict[str, Any]]:
+    """
+    Читать снимок страницами: {'ids', 'documents', 'metadatas', 'embeddings'}
+
+    Эмбеддинги - срезы memmap, в память читается только текущая страница.
+    """
+    directory = Path(path)
+    manifest = read_manifest(path)
+    embeddings = np.load(directory / "embeddings.npy", mmap_mode="r")
+    readers = {name: _ColumnReader(directory, name) for name in COLUMNS}
+
+    total = manifest["count"]
+    if len(embeddings) != total or any(len(reader) != total for reader in readers.values()):
+        raise ValueError(f"Snapshot {path} is incomplete")
+
+    for start in range(0, total, batch_size):
+        end = min(start + batch_size, total)
+        yield {
+            "ids": readers["ids"].read(start, end),
+            "documents": readers["documents"].read(start, end),
+            "metadatas": [json.loads(meta) for meta in readers["metadatas"].read(start, end)],
+            "embeddings": np.ascontiguousarray(embeddings[start:end]),
+        }
+
+
+def import_snapshot(vector_store, path: str, replace: bool = False, batch_size: int = 10000) -> Dict[str, Any]:
+    """
+    Загрузить снимок в коллекцию без расчета эмбеддингов
+
+    Args:
+        vector_store: VectorStore
+        path: Директория снимка
+        replace: Очистить коллекцию перед загрузкой (иначе - upsert, существующие ID пропускаются)
+        batch_size: Чанков за одну запись
+
+    Returns:
+        Количество загруженных и пропущенных чанков
+
+    Raises:
+        ValueError: Снимок в другом пространстве расстояний, чем коллекция
+    """
+    start_time = time.perf_counter()
+    manifest = read_manifest(path)
+    # Снимки без отметки сделаны до поддержки cosine - в них ненормализованные l2 векторы
+    space = manifest.get("space", "l2")
+    if manifest["count"] and space != vector_store.space:
+        raise ValueError(f"Snapshot space '{space}' does not match collection space '{vector_store.space}'")
+
+    imported, skipped = 0, 0
+    # Очистка под той же блокировкой, что и загрузка: между ними не вклинится другая запись
+    with vector_store.write_lock():
+        if replace and vector_store.clear_collection() is None:
+            raise RuntimeError("Failed to clear collection before import")
+        vector_store.flush()
+        # В пустую коллекцию пишем без проверки существующих ID - снимок их не повторяет
+        check_existing = vector_store.stats.chunks > 0
+        for page in iter_snapshot(path, batch_size=batch_size):
+            if check_existing:
+                before = vector_store.stats.chunks
+                vector_store.add_documents(page["documents"], page["embeddings"], page["metadatas"], ids=page["ids"])
+                vector_store.flush()
+                added = vector_store.stats.chunks - before
+            else:
+                vector_store.add_new(page["ids"], page["documents"], page["metadatas"], page["embeddings"])
+                vector_store.flush()
+                added = len(page["ids"])
+            imported += added
+            skipped += len(page["ids"]) - added
+
+    seconds = time.perf_counter() - start_time
+    print(f"📥 Импорт снимка {path}: {imported} чанков (пропущено {skipped}) за {seconds:.2f} с")
+    return {
+        "manifest": manifest,
+        "imported_chunks": imported,
+        "skipped_chunks": skipped,
+        "seconds": round(seconds, 3),
+    }
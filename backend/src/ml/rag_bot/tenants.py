@@ -0,0 +1,211 @@
+"""
+Tenants - коллекции VectorStore по арендаторам с LRU открытых коллекций
+
+У каждого арендатора своя коллекция ('documents' -> 'documents__team-a'). Запросы без
+арендатора идут в исходную коллекцию 'documents', поэтому существующая база не меняется.
+
+Открытыми держатся не больше max_open коллекций арендаторов: давно не использованная
+закрывается (буфер записывается, индекс сохраняется на диск) и открывается снова при
+следующем запросе. Коллекция, с которой еще идет работа, закрывается после ее окончания.
+"""
+from typing import List, Dict, Any, Optional, Callable, Iterator, Tuple
+from collections import OrderedDict
+from contextlib import contextmanager
+import re
+import threading
+
+# Имя арендатора входит в имя коллекции (ChromaDB: до 63 символов, начало и конец - буква или цифра)
+TENANT_NAME = re.compile(r"^[A-Za-z0-9](?:[A-Za-z0-9_\-]{0,38}[A-Za-z0-9])?$")
+DEFAULT_TENANT = "default"
+
+
+class _OpenStore:
+    def __init__(self, store):
+        self.store = store
+        self.users = 0
+        self.evicted = False
+
+
+class TenantStores:
+    def __init__(self, factory: Callable[[str], Any], collection_name: str = "documents", max_open: int = 32):
+        """
+        Args:
+            factory: Открывает VectorStore по имени коллекции
+            collection_name: Коллекция арендатора по умолчанию (и префикс коллекций остальных)
+            max_open: Сколько коллекций арендаторов держать открытыми (коллекция по умолчанию - всегда)
+        """
+        self.factory = factory
+        self.collection_name = collection_name
+        self.max_open = max(1, max_open)
+
+        self._lock = threading.Lock()
+        self._open: "OrderedDict[str, _OpenStore]" = OrderedDict()
+        # Вытесненные из LRU, но еще используемые запросами: закрываются после последнего
+        self._draining: Dict[str, _OpenStore] = {}
+        # Открытие и закрытие коллекции арендатора: повторное открытие ждет, пока индекс сохранится
+        self._loading: Dict[str, threading.Lock] = {}
+        self._stats = {
+            "hits": 0,
+            "loads": 0,
+            "evictions": 0,
+        }
+
+        # Коллекция по умолчанию открывается сразу и не вытесняется
+        self.default = self.factory(collection_name)
+
+    @staticmethod
+    def normalize(tenant: Optional[str]) -> str:
+        """
+        Проверить имя арендатора (None и '' - арендатор по умолчанию)
+
+        Raises:
+            ValueError: Если имя недопустимо
+        """
+        if not tenant:
+            return DEFAULT_TENANT
+        if not TENANT_NAME.match(tenant):
+            raise ValueError(f"Некорректное имя арендатора: {tenant}")
+        return tenant
+
+    def tenant_collection(self, tenant: Optional[str]) -> str:
+        """Имя коллекции арендатора"""
+        tenant = self.normalize(tenant)
+        if tenant == DEFAULT_TENANT:
+            return self.collection_name
+        return f"{self.collection_name}__{tenant}"
+
+    @contextmanager
+    def use(self, tenant: Optional[str]) -> Iterator[Any]:
+        """
+        VectorStore арендатора на время работы с ним (открывается при первом обращении)
+
+        Raises:
+            ValueError: Если имя арендатора недопустимо
+        """
+        tenant = self.normalize(tenant)
+        if tenant == DEFAULT_TENANT:
+            yield self.default
+            return
+
+        entry = self._acquire(tenant)
+        try:
+            yield entry.store
+        finally:
+            self._release(tenant, entry)
+
+    def _take(self, tenant: str) -> Optional[_OpenStore]:
+        """Открытая коллекция из LRU (или возвращенная из вытесненных); вызывается под _lock"""
+        entry = self._open.get(tenant)
+        if entry is None:
+            entry = self._draining.pop(tenant, None)
+            if entry is None:
+                return None
+            # Запрос пришел раньше, чем вытесненная коллекция закрылась - возвращаем ее в LRU
+            entry.evicted = False
+            self._open[tenant] = entry
+        self._open.move_to_end(tenant)
+        entry.users += 1
+        self._stats["hits"] += 1
+        return entry
+
+    def _acquire(self, tenant: str) -> _OpenStore:
+        with self._lock:
+            entry = self._take(tenant)
+            if entry is not None:
+                return entry
+            loading = self._loading.setdefault(tenant, threading.Lock())
+
+        # Открытие коллекции (загрузка индекса) - вне общей блокировки: другие арендаторы не ждут
+        with loading:
+            with self._lock:
+                entry = self._take(tenant)
+                if entry is not None:
+                    return entry
+
+            try:
+                store = self.factory(self.tenant_collection(tenant))
+            except Exception:
+                with self._lock:
+                    self._forget_loading(tenant, loading)
+                raise
+
+            with self._lock:
+                entry = _OpenStore(store)
+                entry.users = 1
+                self._open[tenant] = entry
+                self._forget_loading(tenant, loading)
+                self._stats["loads"] += 1
+                to_close = self._evict()
+
+        for closing in to_close:
+            self._close(*closing)
+        print(f"📂 Открыта коллекция арендатора '{tenant}' (открыто: {len(self._open)}/{self.max_open})")
+        return entry
+
+    def _evict(self) -> List[Tuple[str, _OpenStore, threading.Lock]]:
+        """Вытеснить давно не использованные коллекции сверх max_open; вызывается под _lock"""
+        to_close = []
+        while len(self._open) > self.max_open:
+            tenant, entry = self._open.popitem(last=False)
+            self._stats["evictions"] += 1
+            if entry.users:
+                entry.evicted = True
+                self._draining[tenant] = entry
+            else:
+                to_close.append((tenant, entry, self._begin_close(tenant)))
+        return to_close
+
+    def _begin_close(self, tenant: str) -> threading.Lock:
+        """Занять блокировку открытия арендатора до конца закрытия; вызывается под _lock"""
+        closing = threading.Lock()
+        closing.acquire()
+        self._loading[tenant] = closing
+        return closing
+
+    def _close(self, tenant: str, entry: _OpenStore, closing: threading.Lock):
+        try:
+            entry.store.close()
+        except Exception as e:
+            print(f"❌ Ошибка закрытия коллекции арендатора '{tenant}': {e}")
+        finally:
+            with self._lock:
+                self._forget_loading(tenant, closing)
+            closing.release()
+
+    def _forget_loading(self, tenant: str, lock: threading.Lock):
+        """Убрать блокировку открытия, если ее не заменили; вызывается под _lock"""
+        if self._loading.get(tenant) is lock:
+            del self._loading[tenant]
+
+    def _release(self, tenant: str, entry: _OpenStore):
+        with self._lock:
+            entry.users -= 1
+            # LRU мог вырасти сверх max_open, пока вытесненные коллекции возвращались из draining
+            to_close = self._evict()
+            if entry.evicted and entry.users == 0:
+                self._draining.pop(tenant, None)
+                to_close.append((tenant, entry, self._begin_close(tenant)))
+
+        for closing in to_close:
+            self._close(*closing)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "max_open": self.max_open,
+                "open": len(self._open),
+                "draining": len(self._draining),
+                # От давно не использованного к последнему
+                "open_tenants": list(self._open),
+            }
+
+    def close(self):
+        """Закрыть все коллекции (при остановке сервера)"""
+        with self._lock:
+            entries = list(self._open.values()) + list(self._draining.values())
+            self._open.clear()
+            self._draining.clear()
+        for entry in entries:
+            entry.store.close()
+        self.default.close()
@@ -1,79 +1,444 @@
 """
 Vector Store - работа с векторной базой данных
 """
-from typing import List, Dict, Any
-import chromadb
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
-import uuid
+import hashlib
+import threading
+
+import numpy as np
+
+try:
+    from .vector_utils import EmbeddingsInput, EmbeddingInput, as_float32_matrix, as_float32_vector, normalize_rows
+    from .quantization import QuantizedIndex, QUANTIZATION_MODES
+    from .backends import create_collection
+    from .backends.base import make_preview
+    from .backends.filters import validate_where
+    from .collection_stats import CollectionStats
+    from .snapshot import export_snapshot, import_snapshot
+except ImportError:
+    from ml.rag_bot.vector_utils import EmbeddingsInput, EmbeddingInput, as_float32_matrix, as_float32_vector, normalize_rows
+    from ml.rag_bot.quantization import QuantizedIndex, QUANTIZATION_MODES
+    from ml.rag_bot.backends import create_collection
+    from ml.rag_bot.backends.base import make_preview
+    from ml.rag_bot.backends.filters import validate_where
+    from ml.rag_bot.collection_stats import CollectionStats
+    from ml.rag_bot.snapshot import export_snapshot, import_snapshot
+
+# cosine - векторы нормализуются, similarity = косинус; l2 - коллекции, созданные до cosine
+DISTANCE_SPACES = ("cosine", "l2")
 
 class VectorStore:
-    def __init__(self, db_path: str = "./data/vector_db", collection_name: str = "documents"):
+    def __init__(self, db_path: str = "./data/vector_db", collection_name: str = "documents",
+                 quantization: Optional[str] = None, rescore_factor: int = 4,
+                 backend: str = "chroma", backend_options: Optional[Dict[str, Any]] = None,
+                 write_batch_size: int = 1000, write_buffer_size: int = 0, shards: int = 1,
+                 space: Optional[str] = None):
+        """
+        Инициализация векторной БД
+
+        Args:
+            db_path: Директория векторной БД
+            collection_name: Название коллекции
+            quantization: Режим хранения для новой коллекции ('none', 'int8', 'binary');
+                у существующей коллекции используется сохраненный режим. В квантованном режиме
+                поиск идет по кодам в памяти, а flat/hnsw не загружают float32 индекс в память
+                (ChromaDB держит свой индекс всегда - см. footprint в get_collection_info)
+            rescore_factor: Во сколько раз больше кандидатов пересчитывать точно, чем top_k
+            backend: Реализация индекса ('chroma', 'flat', 'hnsw')
+            backend_options: Параметры бэкенда (для hnsw: hnsw_m, hnsw_ef_construction, hnsw_ef_search)
+            write_batch_size: Максимум чанков в одной записи в бэкенд (не больше лимита бэкенда)
+            write_buffer_size: Копить до стольких чанков между вызовами add_documents
+                перед записью (0 - писать сразу); накопленное записывает flush()
+            shards: Количество шардов коллекции (поиск во всех шардах параллельно);
+                смена на существующей БД - через reshard_collection
+            space: Пространство новой коллекции ('cosine' - по умолчанию, 'l2');
+                у существующей коллекции используется сохраненное
+        """
         self.db_path = db_path
         self.collection_name = collection_name
+        self.backend = backend
 
         Path(db_path).mkdir(parents=True, exist_ok=True)
 
-        print(f"Инициализируем ChromaDB в {db_path}")
-        self.client = chromadb.PersistentClient(path=db_path)
-        self.collection = self.client.get_or_create_collection(collection_name)
-        print(f"Коллекция '{collection_name}' готова")
+        self.shards = shards
+        print(f"Инициализируем векторную БД ({backend}, шардов: {shards}) в {db_path}")
+        # metadata применяется только к новой коллекции; у существующей режим и пространство
+        # меняются через _resolve_quantization / _resolve_space
+        self.collection = create_collection(
+            backend,
+            db_path,
+            collection_name,
+            metadata={"quantization": quantization or "none", "space": space or "cosine"},
+            shards=shards,
+            **(backend_options or {})
+        )
+        self.quantization = self._resolve_quantization(quantization)
+        self.space = self._resolve_space(space)
+        self.quantized_index = None
+        # Статистика индексов (размеры в памяти и на диске) для статуса - сбрасывается при записи
+        self._index_stats: Optional[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]] = None
+        if self.quantization != "none":
+            self.quantized_index = QuantizedIndex(
+                str(Path(db_path) / "quantized" / collection_name),
+                self.quantization,
+                rescore_factor=rescore_factor
+            )
+            if self.quantized_index.count != self.collection.count():
+                self._rebuild_quantized_index()
+        else:
+            # Поиск идет по индексу бэкенда: загружаем его сразу, а не на первом запросе
+            self.collection.load_index()
+        # Запись частями: большой документ не требует одного огромного add
+        self.write_batch_size = max(1, write_batch_size)
+        if self.collection.max_batch_size:
+            self.write_batch_size = min(self.write_batch_size, self.collection.max_batch_size)
+        self.write_buffer_size = max(0, write_buffer_size)
+        self._write_lock = threading.RLock()
+        self._buffer: List[Tuple[List[str], List[str], List[Dict], np.ndarray]] = []
+        self._buffered_ids = set()
+
+        # Счетчики для статуса без обращения к индексу; пересчитываются, если не совпали с коллекцией
+        self.stats = CollectionStats(str(Path(db_path) / "stats" / f"{backend}_{collection_name}.json"))
+        if not self.stats.load(self.collection.count()):
+            print("Пересчитываем статистику коллекции...")
+            self.stats.rebuild(self.collection)
+        print(f"Коллекция '{collection_name}' готова (хранение: {self.quantization})")
+
+    def _resolve_quantization(self, requested: Optional[str]) -> str:
+        """Режим хранения коллекции (хранится в метаданных коллекции)"""
+        if requested is not None and requested not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode: {requested}")
+
+        stored = (self.collection.metadata or {}).get("quantization", "none")
+        if requested is None or requested == stored:
+            return stored
+
+        # Режим можно сменить только у пустой коллекции
+        if self.collection.count() == 0:
+            self.collection.modify(metadata={**(self.collection.metadata or {}), "quantization": requested})
+            return requested
+
+        print(f"⚠️ Коллекция '{self.collection_name}' хранится в режиме '{stored}', "
+              f"запрошенный режим '{requested}' игнорируется (очистите коллекцию для смены)")
+        return stored
+
+    def _resolve_space(self, requested: Optional[str]) -> str:
+        """Пространство расстояний коллекции (хранится в метаданных коллекции)"""
+        if requested is not None and requested not in DISTANCE_SPACES:
+            raise ValueError(f"Unknown distance space: {requested}")
+
+        # Коллекции без отметки созданы до поддержки cosine и хранят ненормализованные векторы
+        stored = (self.collection.metadata or {}).get("space", "l2")
+        if requested is None or requested == stored:
+            return stored
+
+        if self.collection.count() == 0:
+            self.collection.modify(metadata={**(self.collection.metadata or {}), "space": requested})
+            return requested
+
+        print(f"⚠️ Коллекция '{self.collection_name}' в пространстве '{stored}', "
+              f"запрошенное '{requested}' игнорируется (очистите коллекцию для смены)")
+        return stored
+
+    def _prepare_vectors(self, embeddings: np.ndarray) -> np.ndarray:
+        """В cosine пространстве векторы хранятся и ищутся нормализованными"""
+        if self.space == "cosine":
+            return normalize_rows(embeddings).astype(np.float32, copy=False)
+        return embeddings
+
+    def _similarity(self, distance: float) -> float:
+        """
+        Скор по расстоянию бэкенда (квадрат L2)
+
+        Для нормализованных векторов ||a - b||^2 = 2 - 2cos, поэтому similarity - косинус.
+        В l2 пространстве - монотонная оценка в (0, 1].
+        """
+        if self.space == "cosine":
+            return 1.0 - float(distance) / 2.0
+        return 1.0 / (1.0 + float(distance))
+
+    def _format_result(self, doc_id: str, document: str, metadata: Optional[Dict], distance: float) -> Dict:
+        return {
+            'id': doc_id,
+            'document': document,
+            'metadata': metadata or {},
+            'distance': distance,
+            'similarity': self._similarity(distance)
+        }
+
+    def _rebuild_quantized_index(self, page_size: int = 1000):
+        """Пересобрать квантованный индекс из полноразмерных векторов коллекции"""
+        print(f"🔄 Пересобираем квантованный индекс коллекции '{self.collection_name}'...")
+        self.quantized_index.clear()
+        # Страницы по ключу строки (у шардов - по очереди): без OFFSET пересборка линейная
+        for page in self.collection.iter_pages(page_size, include=["embeddings"]):
+            self.quantized_index.add(page["ids"], page["embeddings"])
+        self._index_stats = None
     
-    def add_documents(self, documents: List[str], embeddings: List[List[float]], metadata: List[Dict]) -> List[str]:
+    @staticmethod
+    def make_source_id(content: str) -> str:
+        """ID источника - хеш его содержимого (одинаковый для повторной загрузки того же файла)"""
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def make_chunk_id(source_id: str, chunk_index: int, chunk: str) -> str:
+        """Детерминированный ID чанка: источник + позиция + хеш текста"""
+        chunk_hash = hashlib.sha256(chunk.encode("utf-8")).hexdigest()[:16]
+        return f"{source_id}-{chunk_index}-{chunk_hash}"
+
+    def existing_ids(self, ids: List[str], batch_size: int = 500) -> set:
+        """Какие из ID уже есть в коллекции или в буфере записи"""
+        with self._write_lock:
+            found = {doc_id for doc_id in ids if doc_id in self._buffered_ids}
+        remaining = [doc_id for doc_id in ids if doc_id not in found]
+        for start in range(0, len(remaining), batch_size):
+            found.update(self.collection.get(ids=remaining[start:start + batch_size], include=[])["ids"])
+        return found
+
+    def add_documents(self, documents: List[str], embeddings: EmbeddingsInput, metadata: List[Dict],
+                      ids: Optional[List[str]] = None, source_id: Optional[str] = None) -> List[str]:
         """
-        Добавить документы в векторную БД
+        Добавить документы в векторную БД (upsert: существующие ID не перезаписываются)
+
+        При write_buffer_size > 0 чанки попадают в буфер и видны в поиске после flush().
         
         Args:
             documents: Список текстов документов
-            embeddings: Список векторов для каждого документа
+            embeddings: Матрица float32 (n, dim) или список векторов для каждого документа
             metadata: Метаданные для каждого документа
+            ids: ID документов (None - вычислить из содержимого, см. make_chunk_id)
+            source_id: ID источника (make_source_id от содержимого файла, как в RAGSystem);
+                None - хеш переданных текстов. Попадает в метаданные чанков без source_id
             
         Returns:
-            Список ID добавленных документов
+            Список ID документов (включая уже существовавшие)
         """
 
+        embeddings = as_float32_matrix(embeddings)
+
         if len(documents) != len(embeddings) or len(documents) != len(metadata):
             raise ValueError("Lengths of documents, embeddings, and metadata must match")
 
-        doc_ids = [str(uuid.uuid4()) for _ in documents]
-        
-        self.collection.add(
-            documents=documents,
-            embeddings=embeddings,
-            metadatas=metadata,
-            ids=doc_ids
-        )
-        print(f"Добавлено {len(documents)} документов в векторную БД")
-        return doc_ids
+        if ids is not None and len(ids) != len(documents):
+            raise ValueError("Lengths of documents and ids must match")
+
+        if ids is None or source_id is not None:
+            if source_id is None:
+                source_id = self.make_source_id("\n".join(documents))
+            # Те же ID и метаданные, что у чанков загруженного файла (номер чанка - из метаданных)
+            metadata = [meta if "source_id" in meta else {**meta, "source_id": source_id} for meta in metadata]
+            if ids is None:
+                ids = [self.make_chunk_id(source_id, meta.get("chunk_index", i), document)
+                       for i, (document, meta) in enumerate(zip(documents, metadata))]
+
+        with self._write_lock:
+            # Повторная загрузка того же содержимого ничего не пишет в индекс
+            existing = self.existing_ids(ids)
+            new_rows = []
+            for row, doc_id in enumerate(ids):
+                if doc_id not in existing:
+                    existing.add(doc_id)
+                    new_rows.append(row)
+
+            skipped = len(documents) - len(new_rows)
+            if skipped:
+                print(f"Пропущено дублей: {skipped}")
+
+            if new_rows:
+                self.add_new(
+                    [ids[row] for row in new_rows],
+                    [documents[row] for row in new_rows],
+                    [metadata[row] for row in new_rows],
+                    embeddings[new_rows]
+                )
+
+        return list(ids)
+
+    def add_new(self, ids: List[str], documents: List[str], metadatas: List[Dict], embeddings: np.ndarray):
+        """
+        Добавить чанки, которых заведомо нет в коллекции (без проверки ID, например импорт снимка)
+        """
+        # Превью для списка документов, чтобы не читать полные тексты чанков
+        metadatas = [{"content_preview": make_preview(document), **meta} for document, meta in zip(documents, metadatas)]
+        with self._write_lock:
+            self._buffer.append((list(ids), list(documents), metadatas, self._prepare_vectors(as_float32_matrix(embeddings))))
+            self._buffered_ids.update(ids)
+            if len(self._buffered_ids) >= self.write_buffer_size:
+                self.flush()
+
+    def write_lock(self) -> threading.RLock:
+        """Блокировка записи (держать, чтобы коллекция не менялась во время экспорта/импорта)"""
+        return self._write_lock
+
+    def flush(self) -> int:
+        """
+        Записать буфер в векторную БД частями по write_batch_size
 
-    def search(self, query_embedding: List[float], top_k: int = 5) -> List[Dict]:
+        При ошибке записанные пачки остаются в БД, а незаписанный хвост - в буфере
+        (следующий flush повторит его).
+
+        Returns:
+            Количество записанных чанков
+
+        Raises:
+            Exception: Ошибка записи в бэкенд или квантованный индекс
+        """
+        with self._write_lock:
+            if not self._buffer:
+                return 0
+            buffer = self._buffer
+            self._index_stats = None
+
+            ids = [doc_id for entry in buffer for doc_id in entry[0]]
+            documents = [document for entry in buffer for document in entry[1]]
+            metadatas = [meta for entry in buffer for meta in entry[2]]
+            embeddings = buffer[0][3] if len(buffer) == 1 else np.concatenate([entry[3] for entry in buffer])
+
+            written, batches = 0, 0
+            try:
+                for start in range(0, len(ids), self.write_batch_size):
+                    end = start + self.write_batch_size
+                    self.collection.add(
+                        documents=documents[start:end],
+                        embeddings=embeddings[start:end],
+                        metadatas=metadatas[start:end],
+                        ids=ids[start:end]
+                    )
+                    try:
+                        if self.quantized_index is not None:
+                            self.quantized_index.add(ids[start:end], embeddings[start:end])
+                        self.stats.add(documents[start:end], metadatas[start:end], embeddings.shape[1])
+                    except Exception:
+                        # Пачка уже в бэкенде: убираем ее, чтобы повторить целиком из буфера
+                        if not self._rollback_batch(ids[start:end]):
+                            written = min(end, len(ids))
+                        raise
+                    written = min(end, len(ids))
+                    batches += 1
+            except Exception as e:
+                self._buffer = [(ids[written:], documents[written:], metadatas[written:], embeddings[written:])] if written < len(ids) else []
+                self._buffered_ids = set(ids[written:])
+                print(f"❌ Ошибка записи в векторную БД: записано {written} из {len(ids)}, остаток в буфере: {e}")
+                raise
+
+            self._buffer = []
+            self._buffered_ids = set()
+
+        print(f"Добавлено {len(ids)} документов в векторную БД (записей: {batches})")
+        return len(ids)
+
+    def _rollback_batch(self, ids: List[str]) -> bool:
+        """Удалить пачку, записанную в бэкенд не полностью; False - если удалить не удалось"""
+        try:
+            self.collection.delete(ids=ids)
+            if self.quantized_index is not None:
+                self.quantized_index.remove(ids)
+            return True
+        except Exception as e:
+            # Счетчики и квантованный индекс пересчитаются при следующем открытии (не совпадет count)
+            print(f"⚠️ Не удалось откатить пачку из {len(ids)} чанков: {e}")
+            return False
+
+    def search(self, query_embedding: EmbeddingInput, top_k: int = 5,
+               where: Optional[Dict[str, Any]] = None, min_similarity: Optional[float] = None) -> List[Dict]:
         """
         Поиск похожих документов
         
         Args:
-            query_embedding: Вектор запроса
+            query_embedding: Вектор запроса (numpy float32 или список)
             top_k: Количество результатов
+            where: Фильтр по метаданным, например {"filename": "report.pdf"}
+                или {"file_extension": {"$in": [".pdf", ".docx"]}}
+            min_similarity: Отбросить результаты с similarity ниже порога
             
         Returns:
             Список найденных документов с метаданными и скорами
         """
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k
-        )
+        return self.search_many(
+            as_float32_vector(query_embedding).reshape(1, -1), top_k=top_k, where=where, min_similarity=min_similarity
+        )[0]
+
+    def search_many(self, query_embeddings: EmbeddingsInput, top_k: int = 5,
+                    where: Optional[Dict[str, Any]] = None,
+                    min_similarity: Optional[float] = None) -> List[List[Dict]]:
+        """
+        Поиск для нескольких запросов за одно обращение к бэкенду
+
+        Args:
+            query_embeddings: Матрица float32 (n_queries, dim) или список векторов
+            top_k: Количество результатов на запрос
+            where: Фильтр по метаданным (общий для всех запросов)
+            min_similarity: Отбросить результаты с similarity ниже порога
 
-        formatted_results = []
+        Returns:
+            Список результатов для каждого запроса (в порядке запросов)
+        """
+        queries = self._prepare_vectors(as_float32_matrix(query_embeddings))
+        if len(queries) == 0:
+            return []
+
+        if where is not None:
+            validate_where(where)
+
+        if self.quantized_index is not None:
+            all_results = self._search_quantized(queries, top_k, where)
+        else:
+            results = self.collection.query(query_embeddings=queries, n_results=top_k, where=where)
+
+            all_results = []
+            for q in range(len(queries)):
+                formatted_results = []
+
+                if results['documents'] and results['documents'][q]:
+                    for i in range(len(results['documents'][q])):
+                        formatted_results.append(self._format_result(
+                            results['ids'][q][i],
+                            results['documents'][q][i],
+                            results['metadatas'][q][i] if results['metadatas'][q] else {},
+                            results['distances'][q][i]
+                        ))
+
+                all_results.append(formatted_results)
+
+        if min_similarity is not None:
+            # Результаты отсортированы по расстоянию: нерелевантные чанки не попадают в промпт
+            all_results = [
+                [result for result in results if result['similarity'] >= min_similarity]
+                for results in all_results
+            ]
+        return all_results
 
-        if results['documents'] and results['documents'][0]:
-            for i in range(len(results['documents'][0])):
-                formatted_results.append({
-                    'id': results['ids'][0][i],
-                    'document': results['documents'][0][i],
-                    'metadata': results['metadatas'][0][i] if results['metadatas'][0] else {},
-                    'distance': results['distances'][0][i] if results['distances'] else None,
-                    'similarity': 1 - results['distances'][0][i] if results['distances'] else None
-                })
+    def _search_quantized(self, queries: np.ndarray, top_k: int,
+                          where: Optional[Dict[str, Any]] = None) -> List[List[Dict]]:
+        """Поиск по квантованным кодам с точным пересчетом; тексты и метаданные - из коллекции"""
+        allowed_ids = None
+        if where is not None:
+            # Фильтр вычисляет бэкенд, квантованный поиск идет только по подходящим строкам
+            allowed_ids = self.collection.get(where=where, include=[])["ids"]
+        all_matches = [
+            self.quantized_index.search(query, top_k=top_k, allowed_ids=allowed_ids)
+            for query in queries
+        ]
 
-        return formatted_results
+        # Тексты и метаданные всех запросов - одним запросом к коллекции
+        match_ids = list(dict.fromkeys(doc_id for matches in all_matches for doc_id, _ in matches))
+        if not match_ids:
+            return [[] for _ in all_matches]
+        data = self.collection.get(ids=match_ids, include=["documents", "metadatas"])
+        rows = {doc_id: i for i, doc_id in enumerate(data["ids"])}
+
+        all_results = []
+        for matches in all_matches:
+            formatted_results = []
+            for doc_id, distance in matches:
+                if doc_id not in rows:
+                    continue
+                row = rows[doc_id]
+                formatted_results.append(self._format_result(doc_id, data['documents'][row], data['metadatas'][row], distance))
+            all_results.append(formatted_results)
+
+        return all_results
     
     def delete_document(self, doc_id: str) -> bool:
         """
@@ -83,34 +448,217 @@ class VectorStore:
             doc_id: ID документа для удаления
             
         Returns:
-            True если удален успешно
+            True если удален успешно, False - если документа нет или удаление не удалось
         """
         try:
+            self.flush()
+            data = self.collection.get(ids=[doc_id], include=["documents", "metadatas", "embeddings"])
+            if not data["ids"]:
+                print(f"Документ {doc_id} не найден")
+                return False
             self.collection.delete(ids=[doc_id])
+            self._index_stats = None
+            self.stats.remove(data["documents"], data["metadatas"], len(data["embeddings"][0]))
+            if self.quantized_index is not None:
+                self.quantized_index.remove([doc_id])
             print(f"Документ {doc_id} удален")
             return True
         except Exception as e:
             print(f"Ошибка удаления документа {doc_id}: {e}")
             return False
     
-    def get_collection_info(self) -> Dict[str, Any]:
-        """Получить информацию о коллекции"""
-        count = self.collection.count()
-        return {
+    def sample_documents(self, limit: int = 5000) -> List[str]:
+        """
+        Получить тексты чанков для обучения/оценки (например, PCA проекции)
+
+        Args:
+            limit: Максимальное количество текстов
+        """
+        texts = []
+        # Чтение страницами по ключу строки (у шардов - по очереди), без подсчета размеров
+        for page in self.collection.iter_pages(min(limit, 5000), include=["documents"]):
+            texts.extend(page["documents"] or [])
+            if len(texts) >= limit:
+                break
+        return texts[:limit]
+
+    def list_documents(self, limit: int = 100, cursor: Optional[str] = None,
+                       where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Страница списка чанков (метаданные и превью, без текстов и эмбеддингов)
+
+        Args:
+            limit: Размер страницы
+            cursor: next_cursor предыдущей страницы (None - первая страница)
+            where: Фильтр по метаданным
+
+        Returns:
+            {'documents': [...], 'next_cursor': str | None}
+
+        Raises:
+            ValueError: Некорректный курсор или фильтр
+        """
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        if where:
+            validate_where(where)
+
+        page = self.collection.list_page(limit, cursor=cursor, where=where)
+        documents = []
+        for doc_id, metadata, preview in zip(page["ids"], page["metadatas"], page["previews"]):
+            documents.append({
+                "id": doc_id,
+                "filename": metadata.get('filename', 'Unknown'),
+                "content_length": metadata.get('content_length', 0),
+                "file_extension": metadata.get('file_extension', ''),
+                "chunk_index": metadata.get('chunk_index', 0),
+                "total_chunks": metadata.get('total_chunks', 1),
+                "content_preview": preview
+            })
+        return {"documents": documents, "next_cursor": page["next_cursor"]}
+
+    def export_snapshot(self, path: str, extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Выгрузить коллекцию в снимок (эмбеддинги .npy + колонки текстов и метаданных)
+
+        Args:
+            path: Директория снимка
+            extra: Дополнительные сведения для manifest
+
+        Returns:
+            manifest снимка
+        """
+        return export_snapshot(self, path, extra=extra)
+
+    def import_snapshot(self, path: str, replace: bool = False) -> Dict[str, Any]:
+        """
+        Загрузить снимок без расчета эмбеддингов
+
+        Args:
+            path: Директория снимка
+            replace: Очистить коллекцию перед загрузкой
+
+        Returns:
+            Количество загруженных и пропущенных чанков
+        """
+        return import_snapshot(self, path, replace=replace)
+
+    def get_collection_info(self, include_recall: bool = False) -> Dict[str, Any]:
+        """
+        Получить информацию о коллекции (счетчики из статистики; размеры индексов
+        пересчитываются только после записи)
+
+        Args:
+            include_recall: Измерить recall квантованного поиска (дорого после изменения индекса);
+                без него - последний измеренный, если индекс с тех пор не менялся
+        """
+        summary = self.stats.get_summary()
+        backend_stats, quantized_stats = self._get_index_stats()
+        info = {
             "collection_name": self.collection_name,
-            "documents_count": count,
-            "db_path": self.db_path
+            "documents_count": summary["chunks"],
+            "sources_count": summary["sources"],
+            "text_bytes": summary["text_bytes"],
+            "vector_bytes": summary["vector_bytes"],
+            "db_path": self.db_path,
+            "backend": backend_stats,
+            "quantization": self.quantization,
+            "shards": self.shards,
+            "space": self.space,
+            "write_batch_size": self.write_batch_size,
+            "buffered_chunks": len(self._buffered_ids)
+        }
+        if self.quantized_index is not None:
+            info["quantized_index"] = quantized_stats
+            info["quantized_recall"] = (
+                self.quantized_index.measure_recall() if include_recall else self.quantized_index.cached_recall()
+            )
+        info["footprint"] = self._get_footprint(info["backend"], info.get("quantized_index"), summary["vector_bytes"])
+        return info
+
+    def _get_index_stats(self) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """Статистика бэкенда и квантованного индекса (обход файлов и шардов - только после записи)"""
+        index_stats = self._index_stats
+        if index_stats is None:
+            index_stats = (
+                self.collection.get_stats(),
+                self.quantized_index.get_stats() if self.quantized_index is not None else None
+            )
+            self._index_stats = index_stats
+        return index_stats
+
+    @staticmethod
+    def _get_footprint(backend_stats: Dict[str, Any], quantized_stats: Optional[Dict[str, Any]],
+                       vector_bytes: int) -> Dict[str, Any]:
+        """
+        Память и диск векторов коллекции: индекс бэкенда вместе с квантованным индексом
+
+        ChromaDB не сообщает размер своего HNSW индекса - он оценивается по float32 векторам
+        (индекс держит их в памяти целиком), а диск ChromaDB общий для всех коллекций.
+        """
+        backend_memory = backend_stats.get("memory_bytes")
+        estimated = backend_memory is None
+        if estimated:
+            backend_memory = vector_bytes
+        quantized_memory = quantized_stats["memory_bytes"] if quantized_stats else 0
+        quantized_disk = quantized_stats["disk_bytes"] if quantized_stats else 0
+        backend_disk = backend_stats.get("disk_bytes")
+        return {
+            "backend_memory_bytes": backend_memory,
+            "backend_memory_estimated": estimated,
+            "backend_disk_bytes": backend_disk,
+            "quantized_memory_bytes": quantized_memory,
+            "quantized_disk_bytes": quantized_disk,
+            "memory_bytes": backend_memory + quantized_memory,
+            "disk_bytes": backend_disk + quantized_disk if backend_disk is not None else None,
         }
     
-    def clear_collection(self) -> bool:
-        """Очистить всю коллекцию"""
+    def delete_by_source(self, source: str) -> int:
+        """
+        Удалить все чанки источника
+
+        Args:
+            source: Имя файла (filename) или source_id
+
+        Returns:
+            Количество удаленных чанков
+        """
+        self.flush()
+        # filename и source_id проиндексированы, ID чанков не перебираются по одному
+        removed_ids = self.collection.delete_where({"$or": [{"filename": source}, {"source_id": source}]})
+        self._index_stats = None
+        if removed_ids and self.quantized_index is not None:
+            self.quantized_index.remove(removed_ids)
+        self.stats.remove_source(source, len(removed_ids))
+        print(f"Источник '{source}': удалено {len(removed_ids)} чанков")
+        return len(removed_ids)
+
+    def clear_collection(self) -> Optional[int]:
+        """
+        Очистить всю коллекцию (пересоздать, без перебора ID)
+
+        Returns:
+            Количество удаленных чанков или None при ошибке
+        """
         try:
-            # Получаем все ID и удаляем
-            all_data = self.collection.get()
-            if all_data['ids']:
-                self.collection.delete(ids=all_data['ids'])
-            print(f"Коллекция '{self.collection_name}' очищена")
-            return True
+            with self._write_lock:
+                self._buffer = []
+                self._buffered_ids = set()
+            removed = self.collection.count()
+            self.collection.drop()
+            self._index_stats = None
+            self.stats.reset()
+            self.stats.save()
+            if self.quantized_index is not None:
+                self.quantized_index.clear()
+            print(f"Коллекция '{self.collection_name}' очищена (удалено {removed} чанков)")
+            return removed
         except Exception as e:
             print(f"Ошибка очистки коллекции: {e}")
-            return False
\ No newline at end of file
+            return None
+
+    def close(self):
+        """Записать буфер и сохранить индекс бэкенда на диск (для hnsw)"""
+        self.flush()
+        self.stats.save()
+        self.collection.close()
\ No newline at end of file
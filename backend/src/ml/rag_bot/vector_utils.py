@@ -0,0 +1,38 @@
+"""
+Vector Utils - приведение эмбеддингов к непрерывным float32 массивам
+"""
+from typing import Sequence, Union
+
+import numpy as np
+
+# Эмбеддинги могут приходить как numpy массивы или как списки (старый API)
+EmbeddingsInput = Union[np.ndarray, Sequence[Sequence[float]]]
+EmbeddingInput = Union[np.ndarray, Sequence[float]]
+
+
+def as_float32_matrix(embeddings: EmbeddingsInput) -> np.ndarray:
+    """
+    Привести эмбеддинги к C-непрерывной матрице float32 (n, dim)
+
+    Если на входе уже подходящий массив - копирования не происходит.
+    """
+    matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    if matrix.ndim != 2:
+        raise ValueError(f"Expected 2-D embeddings matrix, got shape {matrix.shape}")
+    return matrix
+
+
+def as_float32_vector(embedding: EmbeddingInput) -> np.ndarray:
+    """Привести один эмбеддинг к C-непрерывному вектору float32 (dim,)"""
+    vector = np.ascontiguousarray(embedding, dtype=np.float32)
+    if vector.ndim != 1:
+        raise ValueError(f"Expected 1-D embedding, got shape {vector.shape}")
+    return vector
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-нормализация строк матрицы (нулевые строки остаются нулевыми)"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
@@ -21,13 +21,17 @@ print()
 
 # Считаем similarity для каждого документа
 docs = [doc1, doc2, doc3]
-similarities = []
 
-for doc in docs:
-    sim = embeddings.similarity(query, doc)
-    similarities.append(sim)
+# Все скоры считаются одним матричным умножением
+similarities = embeddings.similarity_matrix([query], docs)[0].tolist()
+for doc, sim in zip(docs, similarities):
     print(f"📄 '{doc}' -> similarity: {sim:.3f}")
 
+print()
+print("🏆 Ранжирование:")
+for item in embeddings.rank(query, docs):
+    print(f"  {item['similarity']:.3f}  {item['text']}")
+
 print()
 print("🧠 Анализ:")
 print("1. Модель all-MiniLM-L6-v2 обучена на английском языке")
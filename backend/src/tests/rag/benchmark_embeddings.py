@@ -0,0 +1,198 @@
+"""
+Бенчмарк EmbeddingsService: тексты/сек и задержки p50/p99 для encode и encode_batch
+
+Пример:
+    python tests/rag/benchmark_embeddings.py --backends torch onnx --threads 1 4 --batch-sizes 1 8 32
+
+Результаты пишутся в JSON (по умолчанию ./data/benchmarks), чтобы сравнивать релизы.
+"""
+import sys
+import os
+import argparse
+import json
+import platform
+import subprocess
+import time
+from datetime import datetime
+from typing import List, Dict, Any
+
+import numpy as np
+
+# Добавляем путь к src для нормальных импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from ml.rag_bot import EmbeddingsService
+from ml.rag_bot.onnx_backend import ONNX_BACKENDS, OnnxEmbeddingModel
+
+RU_WORDS = (
+    "система документ поиск вектор модель запрос ответ данные текст знание "
+    "обучение сеть база результат пользователь вопрос статья раздел пример анализ "
+    "быстрый новый точный большой русский важный простой сложный полезный общий"
+).split()
+EN_WORDS = (
+    "system document search vector model query answer data text knowledge "
+    "learning network database result user question article section example analysis "
+    "fast new accurate large english important simple complex useful general"
+).split()
+
+# Длина входа в словах
+LENGTHS = {"short": 8, "medium": 48, "long": 256}
+
+
+def make_corpus(num_texts: int, words: int, seed: int = 42) -> List[str]:
+    """Синтетический русско-английский корпус (половина текстов на каждом языке)"""
+    rng = np.random.default_rng(seed)
+    texts = []
+    for i in range(num_texts):
+        vocabulary = RU_WORDS if i % 2 == 0 else EN_WORDS
+        # Небольшой разброс длины, чтобы паддинг был как на реальных данных
+        size = max(1, int(words * rng.uniform(0.75, 1.25)))
+        texts.append(" ".join(rng.choice(vocabulary, size=size)) + ".")
+    return texts
+
+
+def latency_stats(latencies: List[float], texts: int) -> Dict[str, Any]:
+    """p50/p99 задержки одного вызова (мс) и пропускная способность"""
+    values = np.array(latencies) * 1000
+    total = float(np.sum(latencies))
+    return {
+        "calls": len(latencies),
+        "texts": texts,
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "mean_ms": round(float(values.mean()), 3),
+        "texts_per_sec": round(texts / total, 2) if total > 0 else None,
+    }
+
+
+def bench_encode(service: EmbeddingsService, texts: List[str]) -> Dict[str, Any]:
+    """Одиночные вызовы encode (как при обработке запросов)"""
+    latencies = []
+    for text in texts:
+        start = time.perf_counter()
+        service.encode(text)
+        latencies.append(time.perf_counter() - start)
+    return latency_stats(latencies, len(texts))
+
+
+def bench_encode_batch(service: EmbeddingsService, texts: List[str], batch_size: int) -> Dict[str, Any]:
+    """Вызовы encode_batch по batch_size текстов (как при загрузке документов)"""
+    latencies = []
+    for start_index in range(0, len(texts), batch_size):
+        batch = texts[start_index:start_index + batch_size]
+        start = time.perf_counter()
+        service.encode_batch(batch)
+        latencies.append(time.perf_counter() - start)
+    return latency_stats(latencies, len(texts))
+
+
+def set_threads(service: EmbeddingsService, threads: int):
+    """
+    Число потоков инференса: torch - глобально, onnxruntime - в опциях сессии,
+    поэтому ONNX модель пересоздается (экспорт уже закэширован на диске)
+    """
+    if service.backend in ONNX_BACKENDS:
+        service.model = OnnxEmbeddingModel(
+            service.model_name, export_dir=service.onnx_dir,
+            quantize=service.backend == "onnx-int8", num_threads=threads
+        )
+        return
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def environment_info(model_name: str) -> Dict[str, Any]:
+    """Описание окружения для сравнения прогонов"""
+    info = {
+        "model": model_name,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+    for module_name in ("torch", "onnxruntime", "sentence_transformers"):
+        try:
+            module = __import__(module_name)
+            info[module_name] = module.__version__
+        except ImportError:
+            info[module_name] = None
+    try:
+        info["git_commit"] = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        info["git_commit"] = None
+    return info
+
+
+def run_benchmark(model_name: str, backends: List[str], batch_sizes: List[int], lengths: List[str],
+                  threads: List[int], num_texts: int, warmup: int) -> Dict[str, Any]:
+    results = []
+    for backend in backends:
+        # Без кэша: иначе повторные тексты измеряли бы скорость SQLite, а не модели
+        service = EmbeddingsService(model_name, cache=None, backend=backend, batch_size=max(batch_sizes))
+
+        for thread_count in threads:
+            set_threads(service, thread_count)
+            for length in lengths:
+                texts = make_corpus(num_texts, LENGTHS[length])
+                service.encode_batch(make_corpus(warmup, LENGTHS[length], seed=7))
+
+                row = {"backend": backend, "threads": thread_count, "length": length}
+                encode = bench_encode(service, texts)
+                results.append({**row, "method": "encode", "batch_size": 1, **encode})
+                print(f"⏱️ {backend} threads={thread_count} {length} encode: "
+                      f"{encode['texts_per_sec']} текстов/сек, p50 {encode['p50_ms']} мс, p99 {encode['p99_ms']} мс")
+
+                for batch_size in batch_sizes:
+                    batch = bench_encode_batch(service, texts, batch_size)
+                    results.append({**row, "method": "encode_batch", "batch_size": batch_size, **batch})
+                    print(f"⏱️ {backend} threads={thread_count} {length} encode_batch[{batch_size}]: "
+                          f"{batch['texts_per_sec']} текстов/сек, p50 {batch['p50_ms']} мс, p99 {batch['p99_ms']} мс")
+
+    return {
+        "benchmark": "embeddings",
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "environment": environment_info(model_name),
+        "config": {
+            "backends": backends,
+            "batch_sizes": batch_sizes,
+            "lengths": {length: LENGTHS[length] for length in lengths},
+            "threads": threads,
+            "num_texts": num_texts,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк скорости EmbeddingsService")
+    parser.add_argument("--model", default="cointegrated/rubert-tiny2")
+    parser.add_argument("--backends", nargs="+", default=["torch"], choices=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 8, 32, 64])
+    parser.add_argument("--lengths", nargs="+", default=list(LENGTHS), choices=list(LENGTHS))
+    parser.add_argument("--threads", nargs="+", type=int, default=[1, os.cpu_count() or 1])
+    parser.add_argument("--num-texts", type=int, default=256)
+    parser.add_argument("--warmup", type=int, default=16)
+    parser.add_argument("--output-dir", default="./data/benchmarks")
+    args = parser.parse_args()
+
+    print("🧪 Бенчмарк эмбеддингов...")
+    report = run_benchmark(
+        args.model, args.backends, args.batch_sizes, args.lengths,
+        sorted(set(args.threads)), args.num_texts, args.warmup
+    )
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    output_path = os.path.join(args.output_dir, f"embeddings_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"🎉 Результаты сохранены: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
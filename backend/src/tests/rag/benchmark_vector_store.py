@@ -0,0 +1,334 @@
+"""
+Бенчмарк VectorStore: скорость вставки, задержки поиска p50/p99, память и recall@k
+
+На синтетических нормализованных векторах (кластеры, как у эмбеддингов реальных текстов)
+для каждого бэкенда, режима хранения и размера коллекции:
+    - вставка: чанков/сек (add_new + flush, как при импорте снимка)
+    - поиск: p50/p99 одного запроса для каждого top_k
+    - recall@k относительно точного перебора (brute force)
+    - память: прирост RSS процесса и размер БД на диске (все конфигурации идут в одном
+      процессе, поэтому прирост RSS - оценка; для точного замера запускайте по одной)
+
+Пример:
+    python tests/rag/benchmark_vector_store.py --backends chroma flat hnsw --sizes 10000 100000 --top-k 1 10 50
+    python tests/rag/benchmark_vector_store.py --backends hnsw --quantization none int8 --sizes 10000000
+
+Векторы генерируются блоками по seed, поэтому даже 10M не держатся в памяти целиком,
+а эталон перебора считается повторной генерацией тех же блоков.
+Результаты пишутся в JSON (по умолчанию ./data/benchmarks), чтобы сравнивать прогоны.
+"""
+import sys
+import os
+import argparse
+import json
+import platform
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Iterator, Tuple
+
+import numpy as np
+
+# Добавляем путь к src для нормальных импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from ml.rag_bot import VectorStore
+from ml.rag_bot.backends import VECTOR_BACKENDS
+from ml.rag_bot.quantization import QUANTIZATION_MODES
+
+# Векторов в одном блоке генерации (не зависит от размера записи - данные одинаковы при любых параметрах)
+GENERATION_BLOCK = 10000
+# Чанков на один синтетический источник (для статистики по источникам)
+CHUNKS_PER_SOURCE = 50
+
+
+class SyntheticVectors:
+    """Кластеризованные нормализованные векторы, воспроизводимые по seed"""
+
+    def __init__(self, dimension: int, clusters: int = 256, noise: float = 0.35, seed: int = 42):
+        self.dimension = dimension
+        self.noise = noise
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self.centers = self._normalize(rng.standard_normal((clusters, dimension)).astype(np.float32))
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def _sample(self, count: int, rng: np.random.Generator) -> np.ndarray:
+        labels = rng.integers(0, len(self.centers), size=count)
+        noise = rng.standard_normal((count, self.dimension)).astype(np.float32) * (self.noise / np.sqrt(self.dimension))
+        return self._normalize(self.centers[labels] + noise).astype(np.float32)
+
+    def block(self, index: int, count: int) -> np.ndarray:
+        """Блок коллекции с номером index"""
+        return self._sample(count, np.random.default_rng([self.seed, 0, index]))
+
+    def iter_blocks(self, total: int) -> Iterator[Tuple[int, np.ndarray]]:
+        """(смещение, векторы) блоками по GENERATION_BLOCK"""
+        for index, start in enumerate(range(0, total, GENERATION_BLOCK)):
+            yield start, self.block(index, min(GENERATION_BLOCK, total - start))
+
+    def queries(self, count: int) -> np.ndarray:
+        """Запросы из того же распределения, но не совпадающие с векторами коллекции"""
+        return self._sample(count, np.random.default_rng([self.seed, 1]))
+
+
+def make_id(index: int) -> str:
+    return f"bench-{index:010d}"
+
+
+def exact_top_k(data: SyntheticVectors, total: int, queries: np.ndarray, k: int) -> np.ndarray:
+    """
+    Точный top-k перебором (косинус = скалярное произведение нормализованных векторов)
+
+    Returns:
+        Индексы векторов коллекции (n_queries, k), от ближайшего
+    """
+    k = min(k, total)
+    best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+    best_indices = np.empty((len(queries), 0), dtype=np.int64)
+    for start, block in data.iter_blocks(total):
+        scores = np.concatenate([best_scores, queries @ block.T], axis=1)
+        indices = np.concatenate([best_indices, np.broadcast_to(
+            np.arange(start, start + len(block)), (len(queries), len(block)))], axis=1)
+        keep = np.argpartition(-scores, k - 1, axis=1)[:, :k] if scores.shape[1] > k else np.argsort(-scores, axis=1)
+        best_scores = np.take_along_axis(scores, keep, axis=1)
+        best_indices = np.take_along_axis(indices, keep, axis=1)
+
+    order = np.argsort(-best_scores, axis=1)
+    return np.take_along_axis(best_indices, order, axis=1)
+
+
+def peak_rss_bytes() -> int:
+    """Пиковый RSS процесса (getrusage: macOS отдает байты, Linux - килобайты)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def current_rss_bytes() -> int:
+    """Текущий RSS процесса (Linux: /proc; иначе - пиковый)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return peak_rss_bytes()
+
+
+def directory_size(path: str) -> int:
+    return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+
+
+def latency_stats(latencies: List[float]) -> Dict[str, Any]:
+    """p50/p99 задержки одного запроса (мс) и запросов в секунду"""
+    values = np.array(latencies) * 1000
+    total = float(np.sum(latencies))
+    return {
+        "queries": len(latencies),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "mean_ms": round(float(values.mean()), 3),
+        "queries_per_sec": round(len(latencies) / total, 2) if total > 0 else None,
+    }
+
+
+def bench_insert(store: VectorStore, data: SyntheticVectors, size: int) -> Dict[str, Any]:
+    """Заполнить коллекцию и измерить скорость записи"""
+    start_time = time.perf_counter()
+    for start, block in data.iter_blocks(size):
+        ids = [make_id(i) for i in range(start, start + len(block))]
+        metadatas = [
+            {
+                "filename": f"bench_{i // CHUNKS_PER_SOURCE}.txt",
+                "source_id": f"bench-source-{i // CHUNKS_PER_SOURCE}",
+                "chunk_index": i % CHUNKS_PER_SOURCE,
+            }
+            for i in range(start, start + len(block))
+        ]
+        documents = [f"Синтетический чанк {i}" for i in range(start, start + len(block))]
+        store.add_new(ids, documents, metadatas, block)
+        store.flush()
+        if (start + len(block)) % (GENERATION_BLOCK * 10) == 0:
+            print(f"📥 Записано {start + len(block)}/{size}")
+    seconds = time.perf_counter() - start_time
+    return {
+        "seconds": round(seconds, 3),
+        "chunks_per_sec": round(size / seconds, 2) if seconds > 0 else None,
+    }
+
+
+def bench_search(store: VectorStore, queries: np.ndarray, truth: np.ndarray,
+                 top_k: int, warmup: int) -> Dict[str, Any]:
+    """Одиночные запросы search (как при обработке вопросов) и recall@k"""
+    for query in queries[:warmup]:
+        store.search(query, top_k=top_k)
+
+    latencies, hits = [], 0
+    k = min(top_k, truth.shape[1])
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        results = store.search(query, top_k=top_k)
+        latencies.append(time.perf_counter() - start)
+        expected_ids = {make_id(int(i)) for i in expected[:k]}
+        hits += len(expected_ids.intersection(result["id"] for result in results[:k]))
+
+    return {**latency_stats(latencies), "recall_at_k": round(hits / (k * len(queries)), 4) if k else None}
+
+
+def run_configuration(work_dir: str, backend: str, quantization: str, shards: int, size: int,
+                      data: SyntheticVectors, queries: np.ndarray, truth: np.ndarray,
+                      top_ks: List[int], write_batch_size: int, warmup: int,
+                      backend_options: Dict[str, Any]) -> List[Dict[str, Any]]:
+    db_path = tempfile.mkdtemp(prefix=f"{backend}_{quantization}_{size}_", dir=work_dir)
+    row = {"backend": backend, "quantization": quantization, "shards": shards, "size": size}
+    try:
+        rss_before = current_rss_bytes()
+        store = VectorStore(
+            db_path=db_path,
+            collection_name="benchmark",
+            quantization=quantization,
+            backend=backend,
+            backend_options=backend_options if backend == "hnsw" else None,
+            write_batch_size=write_batch_size,
+            shards=shards,
+            space="cosine"
+        )
+        insert = bench_insert(store, data, size)
+        rss_after = current_rss_bytes()
+        print(f"⏱️ {backend}/{quantization} x{shards} n={size} вставка: {insert['chunks_per_sec']} чанков/сек")
+
+        rows = []
+        for top_k in top_ks:
+            search = bench_search(store, queries, truth, top_k, warmup)
+            rows.append({**row, "top_k": top_k, "insert": insert, "search": search})
+            print(f"⏱️ {backend}/{quantization} x{shards} n={size} top_k={top_k}: "
+                  f"p50 {search['p50_ms']} мс, p99 {search['p99_ms']} мс, recall@k {search['recall_at_k']}")
+
+        store.close()
+        memory = {
+            "rss_delta_bytes": max(0, rss_after - rss_before),
+            "peak_rss_bytes": peak_rss_bytes(),
+            "disk_bytes": directory_size(db_path),
+        }
+        for result in rows:
+            result["memory"] = memory
+        print(f"💾 {backend}/{quantization} x{shards} n={size}: RSS +{memory['rss_delta_bytes'] / 2**20:.1f} МБ, "
+              f"диск {memory['disk_bytes'] / 2**20:.1f} МБ")
+        return rows
+    finally:
+        shutil.rmtree(db_path, ignore_errors=True)
+
+
+def environment_info() -> Dict[str, Any]:
+    """Описание окружения для сравнения прогонов"""
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+    for module_name in ("faiss", "chromadb"):
+        try:
+            module = __import__(module_name)
+            info[module_name] = module.__version__
+        except ImportError:
+            info[module_name] = None
+    try:
+        info["git_commit"] = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        info["git_commit"] = None
+    return info
+
+
+def run_benchmark(backends: List[str], quantizations: List[str], shards: List[int], sizes: List[int],
+                  top_ks: List[int], dimension: int, num_queries: int, write_batch_size: int,
+                  warmup: int, backend_options: Dict[str, Any], work_dir: str, seed: int) -> Dict[str, Any]:
+    data = SyntheticVectors(dimension, seed=seed)
+    queries = data.queries(num_queries)
+
+    results = []
+    for size in sizes:
+        print(f"🎯 Эталон перебором для {size} векторов...")
+        truth = exact_top_k(data, size, queries, max(top_ks))
+        for backend in backends:
+            for quantization in quantizations:
+                for shard_count in shards:
+                    results.extend(run_configuration(
+                        work_dir, backend, quantization, shard_count, size, data, queries, truth,
+                        top_ks, write_batch_size, warmup, backend_options
+                    ))
+
+    return {
+        "benchmark": "vector_store",
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "environment": environment_info(),
+        "config": {
+            "backends": backends,
+            "quantization": quantizations,
+            "shards": shards,
+            "sizes": sizes,
+            "top_k": top_ks,
+            "dimension": dimension,
+            "num_queries": num_queries,
+            "write_batch_size": write_batch_size,
+            "backend_options": backend_options,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк скорости и recall VectorStore")
+    parser.add_argument("--backends", nargs="+", default=list(VECTOR_BACKENDS), choices=list(VECTOR_BACKENDS))
+    parser.add_argument("--quantization", nargs="+", default=["none"], choices=list(QUANTIZATION_MODES))
+    parser.add_argument("--shards", nargs="+", type=int, default=[1])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10000, 100000])
+    parser.add_argument("--top-k", nargs="+", type=int, default=[1, 10, 50])
+    # 312 - размерность cointegrated/rubert-tiny2
+    parser.add_argument("--dimension", type=int, default=312)
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--write-batch-size", type=int, default=5000)
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--hnsw-ef-construction", type=int, default=200)
+    parser.add_argument("--hnsw-ef-search", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--work-dir", default=None, help="Где создавать временные БД (по умолчанию - системный tmp)")
+    parser.add_argument("--output-dir", default="./data/benchmarks")
+    args = parser.parse_args()
+
+    backend_options = {
+        "hnsw_m": args.hnsw_m,
+        "hnsw_ef_construction": args.hnsw_ef_construction,
+        "hnsw_ef_search": args.hnsw_ef_search,
+    }
+
+    print("🧪 Бенчмарк векторной БД...")
+    work_dir = tempfile.mkdtemp(prefix="rag_vector_bench_", dir=args.work_dir)
+    try:
+        report = run_benchmark(
+            args.backends, args.quantization, sorted(set(args.shards)), sorted(set(args.sizes)),
+            sorted(set(args.top_k)), args.dimension, args.num_queries, args.write_batch_size,
+            args.warmup, backend_options, work_dir, args.seed
+        )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    output_path = os.path.join(args.output_dir, f"vector_store_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"🎉 Результаты сохранены: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import sys
+import os
+import gc
+import shutil
+import tempfile
+
+import numpy as np
+
+# Добавляем путь к src для нормальных импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from chromadb.api.shared_system_client import SharedSystemClient
+from ml.rag_bot import VectorStore, TenantStores
+
+print("🧪 Тестируем вытеснение коллекций арендаторов ChromaDB...")
+
+
+def rss_mb() -> float:
+    """Резидентная память процесса (Linux)"""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+db_path = tempfile.mkdtemp(prefix="rag_chroma_tenants_")
+memory_limit = 64 * 2 ** 20
+opened = []
+
+
+def factory(collection_name):
+    store = VectorStore(db_path=db_path, collection_name=collection_name, backend="chroma",
+                        backend_options={"memory_limit_bytes": memory_limit})
+    opened.append(store)
+    return store
+
+
+rng = np.random.default_rng(0)
+names = ["team-a", "team-b", "team-c"]
+vectors = {name: rng.standard_normal((20000, 256)).astype(np.float32) for name in names}
+tenants = TenantStores(factory, max_open=1)
+
+try:
+    # Все коллекции директории - в одной системе ChromaDB с лимитом кэша сегментов
+    settings = tenants.default.collection.client.get_settings()
+    assert settings.chroma_segment_cache_policy == "LRU" and settings.chroma_memory_limit_bytes == memory_limit
+    identifier = tenants.default.collection.client._identifier
+    default_refs = SharedSystemClient._identifier_to_refcount[identifier]
+
+    for name in names:
+        with tenants.use(name) as store:
+            store.add_new([f"{name}-{i}" for i in range(20000)], [f"Чанк {i}" for i in range(20000)],
+                          [{"filename": f"{name}.txt"}] * 20000, vectors[name])
+            store.flush()
+            assert store.search(vectors[name][0], top_k=1)[0]["id"] == f"{name}-0"
+
+    # Вытесненные арендаторы отпустили коллекцию и ссылку на клиент
+    evicted = [store for store in opened if store is not tenants.default][:-1]
+    assert len(evicted) == 2
+    for store in evicted:
+        assert store.collection.collection is None and store.collection.client is None
+    assert SharedSystemClient._identifier_to_refcount[identifier] == 2 * default_refs, \
+        "Ссылки на систему держат только default и последний арендатор"
+
+    # Повторное открытие вытесненного арендатора видит записанные данные
+    with tenants.use("team-a") as store:
+        assert store.search(vectors["team-a"][1], top_k=1)[0]["id"] == "team-a-1"
+    print("✅ Вытесненные коллекции отпускают ChromaDB")
+
+    # Последняя закрытая коллекция останавливает систему - память индексов освобождается
+    before = rss_mb()
+    tenants.close()
+    gc.collect()
+    after = rss_mb()
+    print(f"📊 Память до закрытия: {before:.0f} МБ, после: {after:.0f} МБ")
+    assert identifier not in SharedSystemClient._identifier_to_system, "Система ChromaDB не остановлена"
+    assert before - after > vectors["team-a"].nbytes / 2 ** 20, "Память индексов не освобождена"
+finally:
+    tenants.close()
+    shutil.rmtree(db_path, ignore_errors=True)
+
+print("🎉 Коллекции арендаторов ChromaDB освобождаются корректно!")
@@ -0,0 +1,77 @@
+import sys
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# Добавляем путь к src для нормальных импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from ml.rag_bot import VectorStore
+
+print("🧪 Тестируем статистику коллекции...")
+
+rng = np.random.default_rng(0)
+ids = [f"doc-{i}" for i in range(120)]
+documents = [f"Чанк {i} " + "текст " * (i % 5) for i in range(len(ids))]
+metadatas = [{"filename": f"file-{i % 4}.txt", "chunk_index": i} for i in range(len(ids))]
+vectors = rng.standard_normal((len(ids), 24)).astype(np.float32)
+
+db_path = tempfile.mkdtemp(prefix="rag_stats_")
+
+for shards in (1, 3):
+    store = VectorStore(db_path=db_path, collection_name=f"stats_{shards}", backend="flat", shards=shards)
+    try:
+        store.add_new(ids, documents, metadatas, vectors)
+        store.flush()
+
+        # Статистика после удаления совпадает с пересчетом по коллекции
+        assert store.delete_document("doc-0") and store.delete_document("doc-1")
+        assert store.delete_by_source("file-3.txt") == 30
+        live = [row for row, meta in enumerate(metadatas)
+                if row > 1 and meta["filename"] != "file-3.txt"]
+        summary = store.stats.get_summary()
+        print(f"📊 Статистика после удаления (шардов: {shards}): {summary}")
+        assert summary["chunks"] == store.collection.count() == len(live)
+        assert summary["sources"] == 3
+        assert summary["vector_bytes"] == len(live) * 24 * 4
+        sources = store.stats.get_sources()
+        assert sum(entry["chunks"] for entry in sources) == len(live)
+
+        store.stats.rebuild(store.collection)
+        assert store.stats.get_summary() == summary, "Инкрементальные счетчики расходятся с пересчетом"
+        assert store.stats.get_sources() == sources
+
+        # Счетчики переживают переоткрытие без пересчета
+        store.close()
+        store = VectorStore(db_path=db_path, collection_name=f"stats_{shards}", backend="flat", shards=shards)
+        assert store.stats.get_summary() == summary
+        assert store.get_collection_info()["documents_count"] == len(live)
+
+        # Статус не обходит индекс и файлы, пока коллекция не менялась
+        calls = []
+        backend_get_stats = store.collection.get_stats
+        store.collection.get_stats = lambda: calls.append(1) or backend_get_stats()
+        first = store.get_collection_info()
+        assert store.get_collection_info()["backend"] == first["backend"] and not calls
+        assert all("count" not in shard for shard in first["backend"].get("shards", []))
+        store.delete_document("doc-4")
+        info = store.get_collection_info()
+        assert info["documents_count"] == len(live) - 1 and len(calls) == 1, (info["documents_count"], len(live), calls)
+        store.get_collection_info()
+        assert len(calls) == 1
+        del store.collection.get_stats
+        live.remove(4)
+
+        # Файл счетчиков не совпал с коллекцией - пересчет при открытии
+        store.collection.delete(ids=[ids[2]])
+        store.close()
+        store = VectorStore(db_path=db_path, collection_name=f"stats_{shards}", backend="flat", shards=shards)
+        assert store.stats.chunks == len(live) - 1
+        print(f"✅ Статистика после удаления и пересчета (шардов: {shards})")
+    finally:
+        store.close()
+
+shutil.rmtree(db_path, ignore_errors=True)
+
+print("🎉 Статистика коллекции работает корректно!")
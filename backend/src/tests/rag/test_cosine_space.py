@@ -0,0 +1,69 @@
+import sys
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# Добавляем путь к src для нормальных импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from ml.rag_bot import VectorStore
+
+print("🧪 Тестируем cosine пространство и порог similarity...")
+
+rng = np.random.default_rng(0)
+vectors = rng.standard_normal((50, 16)).astype(np.float32)
+# Разные нормы: в cosine пространстве они не влияют на порядок
+scaled = vectors * rng.uniform(0.1, 10.0, size=(50, 1)).astype(np.float32)
+ids = [f"doc-{i}" for i in range(50)]
+
+db_path = tempfile.mkdtemp(prefix="rag_cosine_")
+try:
+    for backend in ("flat", "hnsw"):
+        store = VectorStore(db_path=db_path, collection_name=f"cosine_{backend}", backend=backend)
+        try:
+            assert store.space == "cosine", "Новая коллекция должна быть в cosine пространстве"
+            store.add_new(ids, [f"Чанк {i}" for i in range(50)], [{"filename": "a.txt"}] * 50, scaled)
+            store.flush()
+
+            query = vectors[3] * 0.01
+            results = store.search(query, top_k=50)
+            assert results[0]["id"] == "doc-3" and abs(results[0]["similarity"] - 1.0) < 1e-4
+
+            # similarity - косинус
+            unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+            expected = {doc_id: float(unit[i] @ unit[3]) for i, doc_id in enumerate(ids)}
+            for result in results:
+                assert abs(result["similarity"] - expected[result["id"]]) < 1e-3
+
+            # Порог отбрасывает нерелевантные чанки, порядок сохраняется
+            filtered = store.search(query, top_k=50, min_similarity=0.2)
+            assert filtered == [result for result in results if result["similarity"] >= 0.2]
+            assert all(result["similarity"] >= 0.2 for result in filtered) and len(filtered) < len(results)
+        finally:
+            store.close()
+
+        # Пространство сохраняется в метаданных: открытие с другим запросом его не меняет
+        store = VectorStore(db_path=db_path, collection_name=f"cosine_{backend}", backend=backend, space="l2")
+        try:
+            assert store.space == "cosine"
+        finally:
+            store.close()
+        print(f"✅ Cosine пространство ({backend})")
+
+    # l2 коллекция: similarity монотонно убывает с расстоянием
+    store = VectorStore(db_path=db_path, collection_name="l2", backend="flat", space="l2")
+    try:
+        store.add_new(ids, [f"Чанк {i}" for i in range(50)], [{"filename": "a.txt"}] * 50, vectors)
+        store.flush()
+        results = store.search(vectors[5], top_k=10)
+        assert results[0]["id"] == "doc-5" and results[0]["similarity"] == 1.0
+        similarities = [result["similarity"] for result in results]
+        assert similarities == sorted(similarities, reverse=True)
+    finally:
+        store.close()
+    print("✅ l2 пространство")
+finally:
+    shutil.rmtree(db_path, ignore_errors=True)
+
+print("🎉 Cosine пространство и порог similarity работают корректно!")
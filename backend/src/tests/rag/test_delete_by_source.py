@@ -0,0 +1,62 @@
+import sys
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# Добавляем путь к src для нормальных импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from ml.rag_bot import VectorStore
+
+print("🧪 Тестируем удаление по источнику и очистку коллекции...")
+
+rng = np.random.default_rng(0)
+
+db_path = tempfile.mkdtemp(prefix="rag_delete_")
+store = VectorStore(db_path=db_path, collection_name="delete", backend="flat")
+
+try:
+    sources = {}
+    for filename in ("a.txt", "b.txt", "c.txt"):
+        content = f"Содержимое файла {filename}"
+        source_id = VectorStore.make_source_id(content)
+        chunks = [f"{content}, чанк {i}" for i in range(10)]
+        sources[filename] = source_id
+        store.add_documents(
+            chunks,
+            rng.standard_normal((len(chunks), 16)).astype(np.float32),
+            [{"filename": filename, "source_id": source_id, "chunk_index": i} for i in range(len(chunks))],
+            ids=[VectorStore.make_chunk_id(source_id, i, chunk) for i, chunk in enumerate(chunks)]
+        )
+    store.flush()
+    assert store.stats.chunks == 30
+
+    # По имени файла и по source_id
+    assert store.delete_by_source("a.txt") == 10
+    assert store.delete_by_source(sources["b.txt"]) == 10
+    assert store.delete_by_source("missing.txt") == 0
+    assert store.stats.chunks == store.collection.count() == 10
+    assert [entry["filename"] for entry in store.stats.get_sources()] == ["c.txt"]
+    assert all(r["metadata"]["filename"] == "c.txt" for r in store.search(rng.standard_normal(16), top_k=10))
+    print("✅ Удаление по источнику")
+
+    # Удаление отсутствующего чанка не считается успехом
+    doc_id = store.list_documents(limit=1)["documents"][0]["id"]
+    assert store.delete_document(doc_id)
+    assert not store.delete_document(doc_id)
+    assert store.stats.chunks == 9
+
+    # Очистка пересоздает коллекцию: пустая, счетчики сброшены, запись снова работает
+    assert store.clear_collection() == 9
+    assert store.collection.count() == store.stats.chunks == 0
+    assert store.search(rng.standard_normal(16), top_k=5) == []
+    store.add_new(["x"], ["Новый чанк"], [{"filename": "x.txt"}], rng.standard_normal((1, 16)))
+    store.flush()
+    assert store.search(rng.standard_normal(16), top_k=5)[0]["id"] == "x"
+    print("✅ Очистка коллекции")
+finally:
+    store.close()
+    shutil.rmtree(db_path, ignore_errors=True)
+
+print("🎉 Удаление по источнику и очистка работают корректно!")
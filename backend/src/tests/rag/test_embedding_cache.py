@@ -0,0 +1,55 @@
+import sys
+import os
+import time
+import shutil
+
+# Добавляем путь к src для нормальных импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from ml.rag_bot import EmbeddingsService, EmbeddingCache
+
+print("🧪 Тестируем кэш эмбеддингов...")
+
+cache_dir = "./data/test_embeddings_cache"
+shutil.rmtree(cache_dir, ignore_errors=True)
+
+cache = EmbeddingCache(cache_dir, max_entries=2)
+embeddings = EmbeddingsService(cache=cache)
+
+texts = [
+    "Собака лает на улице",
+    "Кот спит на диване",
+    "Птица поет в саду"
+]
+
+# Первый проход - все промахи
+start = time.time()
+first = embeddings.encode_batch(texts)
+cold_time = time.time() - start
+print(f"❄️ Холодный проход: {cold_time:.3f} сек")
+
+# Второй проход - часть из памяти, часть с диска (LRU на 2 элемента)
+start = time.time()
+second = embeddings.encode_batch(texts)
+warm_time = time.time() - start
+print(f"🔥 Теплый проход: {warm_time:.3f} сек")
+
+assert first == second, "Векторы из кэша должны совпадать с исходными"
+
+# Нормализация пробелов дает тот же ключ
+assert embeddings.encode("  Собака   лает на улице ") == first[0]
+
+stats = cache.get_stats()
+print(f"📊 Статистика кэша: {stats}")
+assert stats["misses"] == 3
+assert stats["evictions"] >= 1
+assert stats["disk_entries"] == 3
+
+# Кэш переживает перезапуск
+restored = EmbeddingCache(cache_dir, max_entries=2)
+service = EmbeddingsService(cache=restored)
+assert service.encode_batch(texts) == first
+assert restored.get_stats()["disk_hits"] == 3
+print("✅ Дисковый кэш пережил перезапуск")
+
+shutil.rmtree(cache_dir, ignore_errors=True)
+print("🎉 Тест кэша эмбеддингов завершен!")
@@ -0,0 +1,110 @@
+import sys
+import os
+import time
+import asyncio
+import shutil
+import tempfile
+import threading
+
+import httpx
+from fastapi import FastAPI
+
+# Добавляем путь к src для нормальных импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from ml.rag_bot.executors import BoundedExecutor, ExecutorBusyError
+from ml.rag_bot.rag_system import RAGSystem
+import api.rag_api as rag_api
+
+print("🧪 Тестируем пулы потоков и ответ 503...")
+
+
+async def wait_until(condition, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Условие не выполнилось"
+        await asyncio.sleep(0.01)
+
+
+async def check_bounded_executor():
+    """Сверх max_pending - ExecutorBusyError; слот освобождается по завершении, в том числе отмененного"""
+    executor = BoundedExecutor("test", max_workers=1, max_pending=2)
+    release = threading.Event()
+    try:
+        running = [asyncio.create_task(executor.run(release.wait)) for _ in range(2)]
+        await wait_until(lambda: executor.get_stats()["pending"] == 2)
+        try:
+            await executor.run(time.sleep, 0)
+            raise AssertionError("Задание сверх max_pending принято")
+        except ExecutorBusyError:
+            pass
+        assert executor.get_stats()["rejected"] == 1
+
+        # Отмена ожидания не освобождает слот, пока поток занят
+        running[1].cancel()
+        assert executor.get_stats()["pending"] == 2
+        release.set()
+        await asyncio.gather(*running, return_exceptions=True)
+        await wait_until(lambda: executor.get_stats()["pending"] == 0)
+        assert await executor.run(lambda value: value * 2, 21) == 42
+        stats = executor.get_stats()
+        assert stats["completed"] == 3 and stats["rejected"] == 1, stats
+    finally:
+        release.set()
+        executor.shutdown()
+    print("✅ Ограничение очереди пула")
+
+
+async def check_api_busy(work_dir: str):
+    """Переполненный пул LLM отвечает 503, поиск в пуле эмбеддингов продолжает работать"""
+    with open(os.path.join(work_dir, "pets.txt"), "w", encoding="utf-8") as f:
+        f.write("Кот спит на диване. Собака лает на улице. Птица поет в саду.")
+    rag_system = RAGSystem(vector_backend="flat", embeddings_cache_dir=None,
+                           llm_executor_workers=1, executor_max_pending=1)
+    rag_system.load_documents([os.path.join(work_dir, "pets.txt")])
+
+    release = threading.Event()
+    generate_answer = rag_system._generate_answer
+
+    def slow_answer(*args):
+        release.wait()
+        return generate_answer(*args)
+
+    rag_system._generate_answer = slow_answer
+    rag_api.rag_system = rag_system
+    app = FastAPI()
+    app.include_router(rag_api.router)
+
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            first = asyncio.create_task(client.post("/chat", json={"question": "Где спит кот?"}))
+            await wait_until(lambda: rag_system.llm_executor.get_stats()["pending"] == 1)
+
+            busy = await client.post("/chat", json={"question": "Кто лает?"})
+            assert busy.status_code == 503, busy.text
+            assert "busy" in busy.json()["detail"]
+
+            search = await client.post("/search", json={"query": "кот", "top_k": 1})
+            assert search.status_code == 200 and len(search.json()) == 1
+
+            release.set()
+            response = await first
+            assert response.status_code == 200, response.text
+            assert rag_system.llm_executor.get_stats()["rejected"] == 1
+    finally:
+        release.set()
+        rag_api.rag_system = None
+        rag_system.close()
+    print("✅ Переполненный пул - 503, остальные эндпоинты отвечают")
+
+
+work_dir = tempfile.mkdtemp(prefix="rag_executors_")
+cwd = os.getcwd()
+os.chdir(work_dir)
+try:
+    asyncio.run(check_bounded_executor())
+    asyncio.run(check_api_busy(work_dir))
+finally:
+    os.chdir(cwd)
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+print("🎉 Пулы потоков работают корректно!")
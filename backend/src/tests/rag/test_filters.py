@@ -0,0 +1,142 @@
+import sys
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# Добавляем путь к src для нормальных импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from ml.rag_bot import VectorStore
+from ml.rag_bot.backends import local_backend
+from ml.rag_bot.backends.filters import where_to_sql, to_chroma_where
+
+print("🧪 Тестируем фильтры по метаданным...")
+
+# Перевод в SQL
+sql, params = where_to_sql({"filename": "a.txt"})
+assert sql == "(json_extract(metadata, '$.\"filename\"') = ?)" and params == ["a.txt"], sql
+
+sql, params = where_to_sql({"file_extension": {"$in": [".pdf", ".docx"]}})
+assert sql == "(json_extract(metadata, '$.\"file_extension\"') IN (?,?))" and params == [".pdf", ".docx"], sql
+
+sql, params = where_to_sql({"$or": [{"filename": "a.txt"}, {"chunk_index": {"$gte": 2}}]})
+assert sql == ("(((json_extract(metadata, '$.\"filename\"') = ?) OR "
+               "(json_extract(metadata, '$.\"chunk_index\"') >= ?)))"), sql
+assert params == ["a.txt", 2]
+
+sql, params = where_to_sql({"$and": [
+    {"filename": {"$nin": ["b.txt"]}},
+    {"$or": [{"chunk_index": {"$lt": 1}}, {"chunk_index": {"$gt": 3}}]}
+]})
+assert sql.count("AND") == 1 and sql.count("OR") == 1 and "NOT IN (?)" in sql, sql
+assert params == ["b.txt", 1, 3]
+
+# Несколько полей на верхнем уровне - неявное AND
+sql, params = where_to_sql({"filename": "a.txt", "chunk_index": 0})
+assert " AND " in sql and params == ["a.txt", 0], sql
+
+# ChromaDB: одно поле на уровень, несколько полей оборачиваются в $and
+assert to_chroma_where({"filename": "a.txt"}) == {"filename": "a.txt"}
+assert to_chroma_where({"filename": "a.txt", "chunk_index": {"$lt": 3}}) == {
+    "$and": [{"filename": "a.txt"}, {"chunk_index": {"$lt": 3}}]
+}
+assert to_chroma_where({"$or": [{"filename": "a.txt", "chunk_index": 0}, {"filename": "b.txt"}]}) == {
+    "$or": [{"$and": [{"filename": "a.txt"}, {"chunk_index": 0}]}, {"filename": "b.txt"}]
+}
+
+# Некорректные фильтры - ValueError до обращения к бэкенду
+for bad_where in (
+    {},
+    {"$and": [{"filename": "a.txt"}]},
+    {"filename": {"$in": []}},
+    {"filename": {"$regex": "a"}},
+    {"filename": {"$eq": "a", "$ne": "b"}},
+    {"file'name": "a.txt"},
+    {"filename": ["a.txt"]},
+):
+    try:
+        where_to_sql(bad_where)
+        raise AssertionError(f"Фильтр {bad_where} не отклонен")
+    except ValueError:
+        pass
+
+print("✅ Перевод фильтров корректен")
+
+# Фильтры в поиске и списке документов совпадают с проверкой в Python
+filters = [
+    ({"filename": "a.txt"}, lambda meta: meta["filename"] == "a.txt"),
+    ({"file_extension": {"$in": [".pdf", ".md"]}}, lambda meta: meta["file_extension"] in (".pdf", ".md")),
+    ({"$or": [{"filename": "a.txt"}, {"chunk_index": {"$gte": 8}}]},
+     lambda meta: meta["filename"] == "a.txt" or meta["chunk_index"] >= 8),
+    ({"$and": [{"filename": {"$ne": "c.pdf"}}, {"chunk_index": {"$lt": 3}}]},
+     lambda meta: meta["filename"] != "c.pdf" and meta["chunk_index"] < 3),
+]
+
+rng = np.random.default_rng(0)
+files = [("a.txt", ".txt"), ("b.md", ".md"), ("c.pdf", ".pdf")]
+ids, documents, metadatas = [], [], []
+for filename, extension in files:
+    for i in range(10):
+        ids.append(f"{filename}-{i}")
+        documents.append(f"Чанк {i} файла {filename}")
+        metadatas.append({"filename": filename, "file_extension": extension, "chunk_index": i})
+vectors = rng.standard_normal((len(ids), 32)).astype(np.float32)
+expected_meta = dict(zip(ids, metadatas))
+
+for backend in ("flat", "hnsw"):
+    db_path = tempfile.mkdtemp(prefix="rag_filters_")
+    store = VectorStore(db_path=db_path, collection_name="filters", backend=backend)
+    try:
+        store.add_new(ids, documents, metadatas, vectors)
+        store.flush()
+
+        for where, matches in filters:
+            expected = {doc_id for doc_id in ids if matches(expected_meta[doc_id])}
+
+            results = store.search(vectors[0], top_k=len(ids), where=where)
+            found = {result["id"] for result in results}
+            assert found == expected, f"{backend}: поиск с фильтром {where} вернул {sorted(found ^ expected)}"
+
+            listed = store.list_documents(limit=len(ids), where=where)["documents"]
+            assert {document["id"] for document in listed} == expected, f"{backend}: список с фильтром {where}"
+        print(f"✅ Фильтры в поиске бэкенда {backend}")
+    finally:
+        store.close()
+        shutil.rmtree(db_path, ignore_errors=True)
+
+# NumPy индекс без faiss: строки отфильтрованных меток находятся двоичным поиском
+import_faiss = local_backend._import_faiss
+local_backend._import_faiss = lambda: None
+try:
+    index = local_backend._FlatIndex(8)
+finally:
+    local_backend._import_faiss = import_faiss
+assert index.engine == "numpy"
+flat_vectors = rng.standard_normal((500, 8)).astype(np.float32)
+labels = np.arange(1, 501, dtype=np.int64) * 3
+index.add(labels[:300], flat_vectors[:300])
+index.add(labels[300:], flat_vectors[300:])
+index.remove(labels[::7])
+alive = np.ones(len(labels), dtype=bool)
+alive[::7] = False
+
+allowed = rng.choice(labels[alive], size=60, replace=False)
+positions = {label: i for i, label in enumerate(labels.tolist())}
+assert np.array_equal(index.vectors_for(allowed), flat_vectors[[positions[label] for label in allowed.tolist()]])
+try:
+    index.vectors_for(np.array([labels[0], 2], dtype=np.int64))
+    raise AssertionError("Удаленная или неизвестная метка не отклонена")
+except KeyError:
+    pass
+
+# Поиск среди разрешенных меток (удаленные и неизвестные пропускаются)
+query = flat_vectors[:2] + 0.01
+distances, found = index.search(query, 5, allowed=np.concatenate([allowed, labels[:1], [2, 10 ** 6]]))
+for row in range(len(query)):
+    exact = ((flat_vectors[[positions[label] for label in allowed.tolist()]] - query[row]) ** 2).sum(axis=1)
+    assert list(found[row]) == list(allowed[np.argsort(exact)[:5]])
+    assert np.allclose(distances[row], np.sort(exact)[:5], atol=1e-4)
+print("✅ NumPy индекс: строки по меткам")
+
+print("🎉 Фильтры по метаданным работают корректно!")
@@ -0,0 +1,70 @@
+import sys
+import os
+
+import numpy as np
+
+# Добавляем путь к src для нормальных импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from ml.rag_bot import EmbeddingsService
+from ml.rag_bot.embeddings_service import TOKEN_CALIBRATION_SAMPLE
+
+print("🧪 Тестируем группировку батчей по длине...")
+
+rng = np.random.default_rng(0)
+words = ["собака", "кот", "птица", "дом", "улица", "сад", "река", "лес", "поле", "город"]
+# Короткие хвосты документов вперемешку с длинными чанками
+texts = [" ".join(rng.choice(words, size=int(size))) for size in rng.choice([3, 5, 80, 150], size=120)]
+
+bucketed = EmbeddingsService(batch_size=8, max_batch_tokens=512, length_bucketing=True)
+plain = EmbeddingsService(batch_size=8, max_batch_tokens=512, length_bucketing=False)
+tokenizer = bucketed.model.tokenizer
+max_length = bucketed.model.max_seq_length
+
+
+def real_lengths(batch):
+    return [min(len(ids), max_length) for ids in tokenizer(batch, add_special_tokens=True)["input_ids"]]
+
+
+# Векторы возвращаются в исходном порядке текстов
+with bucketed.track_encode_stats() as stats:
+    vectors = bucketed.encode_batch_array(texts)
+expected = plain.encode_batch_array(texts)
+assert np.allclose(vectors, expected, atol=1e-5), "Группировка по длине изменила порядок векторов"
+for i in rng.choice(len(texts), size=10, replace=False):
+    assert np.allclose(vectors[i], plain.encode_array(texts[i]), atol=1e-5)
+assert stats["texts"] == len(texts)
+assert stats["padded_tokens"] < stats["unbucketed_padded_tokens"], "Группировка не уменьшила паддинг"
+print(f"📊 Паддинг: {stats['padded_tokens']} токенов с группировкой, "
+      f"{stats['unbucketed_padded_tokens']} без нее")
+print("✅ Порядок векторов сохраняется")
+
+# Батч не больше образца калибровки - все длины реальные
+small = texts[:TOKEN_CALIBRATION_SAMPLE]
+lengths, measured = bucketed._token_lengths(small)
+assert len(measured) == len(small)
+assert list(lengths) == real_lengths(small)
+
+# Большой батч: образец токенизирован, в отчете реальные длины образца
+lengths, measured = bucketed._token_lengths(texts)
+assert len(measured) == TOKEN_CALIBRATION_SAMPLE
+assert list(lengths[measured]) == real_lengths([texts[i] for i in measured])
+assert stats["measured_texts"] == TOKEN_CALIBRATION_SAMPLE
+assert stats["measured_tokens"] <= stats["tokens"]
+print("✅ Реальные длины образца каждого батча")
+
+# Калибровка продолжается на новых батчах: другой корпус сдвигает среднее символов на токен
+service = EmbeddingsService(batch_size=8)
+service.encode_batch_array(texts)
+before = service.get_encode_stats()["chars_per_token"]
+dense = [" ".join("а" * 2 for _ in range(int(size))) for size in rng.integers(20, 60, size=200)]
+for start in range(0, len(dense), 50):
+    service.encode_batch_array(dense[start:start + 50])
+after = service.get_encode_stats()["chars_per_token"]
+print(f"📊 Символов на токен: {before} -> {after}")
+assert after < before, "Калибровка не учла новые батчи"
+lengths, _ = service._token_lengths(dense)
+error = abs(lengths.sum() / sum(real_lengths(dense)) - 1)
+assert error < 0.25, f"Оценка длины после калибровки отличается на {error:.0%}"
+print("✅ Калибровка по образцам батчей")
+
+print("🎉 Группировка батчей по длине работает корректно!")
@@ -0,0 +1,74 @@
+import sys
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# Добавляем путь к src для нормальных импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from ml.rag_bot import VectorStore
+
+print("🧪 Тестируем постраничный список документов...")
+
+rng = np.random.default_rng(0)
+ids = [f"doc-{i:03d}" for i in range(250)]
+documents = [f"Чанк {i} " + "длинный текст " * 40 for i in range(len(ids))]
+metadatas = [{"filename": f"file-{i % 7}.txt", "chunk_index": i} for i in range(len(ids))]
+vectors = rng.standard_normal((len(ids), 16)).astype(np.float32)
+
+
+def collect(store, limit, where=None):
+    """Пройти все страницы курсором: ID и количество страниц"""
+    seen, cursor, pages = [], None, 0
+    while True:
+        page = store.list_documents(limit=limit, cursor=cursor, where=where)
+        assert len(page["documents"]) <= limit
+        seen.extend(document["id"] for document in page["documents"])
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return seen, pages
+
+
+db_path = tempfile.mkdtemp(prefix="rag_list_")
+stores = [
+    VectorStore(db_path=db_path, collection_name="single", backend="flat"),
+    VectorStore(db_path=db_path, collection_name="sharded", backend="flat", shards=3),
+]
+
+try:
+    for store in stores:
+        store.add_new(ids, documents, metadatas, vectors)
+        store.flush()
+
+        # Курсор проходит всю коллекцию (и все шарды): каждый чанк ровно один раз
+        for limit in (1, 7, 100, 1000):
+            seen, pages = collect(store, limit)
+            assert len(seen) == len(set(seen)) == len(ids), \
+                f"shards={store.shards}, limit={limit}: {len(seen)} чанков, {len(set(seen))} уникальных"
+            assert set(seen) == set(ids)
+            assert pages >= len(ids) // limit
+
+        where = {"filename": {"$in": ["file-0.txt", "file-5.txt"]}}
+        seen, _ = collect(store, 9, where=where)
+        assert sorted(seen) == sorted(doc_id for doc_id, meta in zip(ids, metadatas)
+                                      if meta["filename"] in ("file-0.txt", "file-5.txt"))
+
+        # Страница - метаданные и короткое превью, без полного текста
+        document = store.list_documents(limit=1)["documents"][0]
+        assert document["content_preview"] and len(document["content_preview"]) < len(documents[0])
+        assert "document" not in document and "embedding" not in document
+
+        try:
+            store.list_documents(limit=10, cursor="not-a-cursor")
+            raise AssertionError("Некорректный курсор не отклонен")
+        except ValueError:
+            pass
+        print(f"✅ Пагинация курсором (шардов: {store.shards})")
+finally:
+    for store in stores:
+        store.close()
+    shutil.rmtree(db_path, ignore_errors=True)
+
+print("🎉 Постраничный список документов работает корректно!")
@@ -0,0 +1,89 @@
+import sys
+import os
+import time
+import shutil
+import tempfile
+import threading
+
+# Добавляем путь к src для нормальных импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+import ml.rag_bot.rag_system as rag_system_module
+from ml.rag_bot.rag_system import RAGSystem
+
+print("🧪 Тестируем замену LLM во время запроса...")
+
+
+def answering(service, answer: str, entered: threading.Event = None, release: threading.Event = None):
+    """Подменить генерацию сервиса: фиксированный ответ, при необходимости - ожидание release"""
+    def generate_rag_response(question, context, sources):
+        if entered is not None:
+            entered.set()
+            release.wait()
+        return answer
+    service.generate_rag_response = generate_rag_response
+    return service
+
+
+work_dir = tempfile.mkdtemp(prefix="rag_llm_reconfigure_")
+cwd = os.getcwd()
+os.chdir(work_dir)
+try:
+    with open("pets.txt", "w", encoding="utf-8") as f:
+        f.write("Кот спит на диване. Собака лает на улице.")
+    rag_system = RAGSystem(vector_backend="flat", embeddings_cache_dir=None)
+    try:
+        rag_system.load_documents(["pets.txt"])
+
+        # Запрос, начатый до замены, завершается на старом сервисе
+        entered, release = threading.Event(), threading.Event()
+        old_service = answering(rag_system.llm_service, "старый ответ", entered, release)
+        in_flight = {}
+        worker = threading.Thread(target=lambda: in_flight.update(rag_system.ask("Где спит кот?")))
+        worker.start()
+        assert entered.wait(10), "Запрос не дошел до генерации"
+
+        result = rag_system.reconfigure_llm("local", "new-model")
+        assert result["applied"] and result["current"]["model"] == "new-model"
+        assert rag_system.llm_service is not old_service
+        answering(rag_system.llm_service, "новый ответ")
+        # Новые запросы не ждут запрос на старом сервисе
+        assert rag_system.ask("Кто лает?")["answer"] == "новый ответ"
+        assert worker.is_alive()
+
+        release.set()
+        worker.join(10)
+        assert in_flight["answer"] == "старый ответ", in_flight
+        print("✅ Запрос в полете завершен старым LLM, новые - на новом")
+
+        # Параллельные перенастройки: применяется запрошенная последней, даже если создавалась дольше
+        service_class = rag_system_module.LLMService
+        slow_started = threading.Event()
+
+        def create_service(provider, model):
+            if model == "slow-model":
+                slow_started.set()
+                time.sleep(0.5)
+            return service_class(provider=provider, model=model)
+
+        rag_system_module.LLMService = create_service
+        try:
+            results = {}
+            slow = threading.Thread(target=lambda: results.update(slow=rag_system.reconfigure_llm("local", "slow-model")))
+            fast = threading.Thread(target=lambda: results.update(fast=rag_system.reconfigure_llm("local", "fast-model")))
+            slow.start()
+            assert slow_started.wait(10)
+            fast.start()
+            slow.join(10)
+            fast.join(10)
+        finally:
+            rag_system_module.LLMService = service_class
+        assert results["fast"]["applied"] and not results["slow"]["applied"]
+        assert rag_system.llm_service.model == "fast-model"
+        print("✅ Из параллельных перенастроек применяется последняя")
+    finally:
+        rag_system.close()
+finally:
+    os.chdir(cwd)
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+print("🎉 Замена LLM во время запроса работает корректно!")
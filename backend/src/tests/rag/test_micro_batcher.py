@@ -0,0 +1,92 @@
+import sys
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+
+# Добавляем путь к src для нормальных импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from ml.rag_bot import EmbeddingsService, EmbeddingMicroBatcher
+
+print("🧪 Тестируем микробатчер эмбеддингов...")
+
+embeddings = EmbeddingsService()
+batcher = EmbeddingMicroBatcher(embeddings, max_wait_ms=20, max_batch_size=8)
+
+queries = [f"Вопрос номер {i} про машинное обучение" for i in range(32)]
+
+# Параллельные запросы должны собраться в батчи
+with ThreadPoolExecutor(max_workers=32) as pool:
+    vectors = list(pool.map(batcher.encode_array, queries))
+
+# Каждый вызывающий получает свой вектор
+expected = embeddings.encode_batch_array(queries)
+for vector, reference in zip(vectors, expected):
+    assert np.allclose(vector, reference, atol=1e-5), "Вектор не совпадает с одиночным кодированием"
+
+stats = batcher.get_stats()
+print(f"📊 Метрики: {stats}")
+assert stats["requests"] == len(queries)
+assert stats["batches"] < len(queries), "Запросы не были объединены в батчи"
+assert stats["max_batch_size_seen"] <= 8
+
+batcher.shutdown()
+
+# Остановка во время submit из других потоков: каждый принятый запрос завершается
+batcher = EmbeddingMicroBatcher(embeddings, max_wait_ms=1, max_batch_size=8)
+accepted = []
+
+
+def submit_until_closed():
+    while True:
+        try:
+            accepted.append(batcher.submit("Вопрос во время остановки"))
+        except RuntimeError:
+            return
+
+
+submitters = [threading.Thread(target=submit_until_closed) for _ in range(8)]
+for thread in submitters:
+    thread.start()
+while len(accepted) < 200:
+    time.sleep(0.001)
+batcher.shutdown()
+for thread in submitters:
+    thread.join()
+done, not_done = wait(accepted, timeout=10)
+assert not not_done, f"{len(not_done)} запросов зависли после остановки"
+assert all(future.exception() is None for future in done)
+print(f"✅ Остановка при параллельных submit: {len(accepted)} запросов выполнены")
+
+
+# Фоновый поток завершился аварийно: запросы из очереди получают ошибку, новые отклоняются
+class StoppingService:
+    def __init__(self):
+        self.release = threading.Event()
+
+    def encode_batch_array(self, texts):
+        self.release.wait()
+        raise SystemExit
+
+
+service = StoppingService()
+batcher = EmbeddingMicroBatcher(service, max_wait_ms=0, max_batch_size=1)
+running = batcher.submit("Первый")
+queued = [batcher.submit(f"В очереди {i}") for i in range(5)]
+service.release.set()
+batcher._worker.join(timeout=10)
+assert not batcher._worker.is_alive()
+assert isinstance(running.exception(timeout=1), SystemExit)
+for future in queued:
+    assert isinstance(future.exception(timeout=1), RuntimeError), "Запрос из очереди не завершен"
+try:
+    batcher.submit("После остановки")
+    raise AssertionError("Запрос принят остановленным микробатчером")
+except RuntimeError:
+    pass
+batcher.shutdown()
+print("✅ Очередь завершается ошибкой после выхода фонового потока")
+
+print("🎉 Тест микробатчера завершен!")
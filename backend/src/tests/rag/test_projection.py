@@ -0,0 +1,108 @@
+import sys
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# Добавляем путь к src для нормальных импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from ml.rag_bot import EmbeddingsService
+from ml.rag_bot.projection import EmbeddingProjection, recall_report
+from ml.rag_bot.rag_system import RAGSystem
+
+print("🧪 Тестируем проекцию эмбеддингов...")
+
+
+def expect_value_error(func, *args, **kwargs):
+    try:
+        func(*args, **kwargs)
+    except ValueError:
+        return
+    raise AssertionError(f"{func.__name__}{args} не отклонен")
+
+
+rng = np.random.default_rng(0)
+# Векторы ранга 16 в 64-мерном пространстве: PCA на 16 компонент почти не теряет соседей
+embeddings = (rng.standard_normal((600, 16)) @ rng.standard_normal((16, 64))).astype(np.float32)
+
+work_dir = tempfile.mkdtemp(prefix="rag_projection_")
+cwd = os.getcwd()
+try:
+    # Обучение и применение PCA: нормализованные векторы нужной размерности, сохранение без потерь
+    projection = EmbeddingProjection.fit_pca(embeddings, 16)
+    reduced = projection.transform(embeddings)
+    assert reduced.shape == (600, 16) and reduced.dtype == np.float32 and reduced.flags["C_CONTIGUOUS"]
+    assert np.allclose(np.linalg.norm(reduced, axis=1), 1.0, atol=1e-5)
+    path = os.path.join(work_dir, "projection.npz")
+    projection.save(path)
+    loaded = EmbeddingProjection.load(path)
+    assert loaded.describe() == projection.describe()
+    assert np.allclose(loaded.transform(embeddings[:10]), reduced[:10], atol=1e-6)
+
+    truncated = EmbeddingProjection.truncate(8).transform(embeddings)
+    assert np.allclose(truncated, embeddings[:, :8] / np.linalg.norm(embeddings[:, :8], axis=1, keepdims=True), atol=1e-5)
+
+    # recall@k: PCA по всем значимым компонентам сохраняет соседей, усечение - теряет
+    report = {row["dim"]: row for row in recall_report(embeddings, [4, 8, 16], method="pca", k=10)}
+    print(f"📊 Recall PCA: { {dim: row['recall'] for dim, row in report.items()} }")
+    assert report[16]["recall"] >= 0.95 and report[16]["compression"] == 4.0
+    assert report[4]["recall"] < report[8]["recall"] < report[16]["recall"]
+    assert recall_report(embeddings, [16], method="truncate", k=10)[0]["recall"] < report[16]["recall"]
+    # Недопустимые кандидаты отбрасываются, а не ломают разложение
+    assert [row["dim"] for row in recall_report(embeddings[:20], [0, 8, 32, 64, 100], k=5)] == [8]
+    print("✅ Обучение и применение проекции")
+
+    # Проверки размерности
+    expect_value_error(EmbeddingProjection.fit_pca, embeddings[:10], 16)
+    expect_value_error(EmbeddingProjection.truncate, 0)
+    expect_value_error(EmbeddingProjection, "svd", 8)
+    expect_value_error(EmbeddingProjection, "pca", 8)
+    expect_value_error(projection.check_dimension, 32)
+    expect_value_error(EmbeddingProjection.truncate(64).check_dimension, 64)
+    projection.check_dimension(64)
+
+    # Сервис эмбеддингов не принимает проекцию, обученную для другой модели
+    full_dim = EmbeddingsService().dimension
+    expect_value_error(EmbeddingsService, projection=projection)
+    expect_value_error(EmbeddingsService, projection=EmbeddingProjection.truncate(full_dim))
+    service = EmbeddingsService(projection=EmbeddingProjection.truncate(full_dim // 2))
+    texts = ["Кот спит на диване", "Собака лает на улице"]
+    assert service.output_dimension == full_dim // 2
+    assert service.encode_batch_array(texts).shape == (2, full_dim // 2)
+    assert service.encode_batch_array(texts, project=False).shape == (2, full_dim)
+    print("✅ Проверки размерности проекции")
+
+    # RAGSystem: отчет и обучение PCA на корпусе, загрузка и поиск в пространстве проекции
+    os.chdir(work_dir)
+    with open("pets.txt", "w", encoding="utf-8") as f:
+        f.write(" ".join(f"Предложение номер {i} про кота и собаку." for i in range(60)))
+    rag_system = RAGSystem(vector_backend="flat", embeddings_cache_dir=None, chunk_size=40, overlap=0)
+    try:
+        rag_system.load_documents(["pets.txt"])
+        expect_value_error(rag_system.fit_projection, "pca", dim=full_dim)
+        result = rag_system.fit_projection("pca", dim=full_dim // 2, dims=[2], k=3)
+        assert [row["dim"] for row in result["report"]] == [2, full_dim // 2]
+        assert result["saved_path"] and os.path.exists(result["saved_path"])
+        expect_value_error(rag_system._load_projection, "truncate", 0)
+    finally:
+        rag_system.close()
+
+    projected = RAGSystem(vector_backend="flat", embeddings_cache_dir=None, chunk_size=40, overlap=0,
+                          embeddings_projection="pca")
+    try:
+        assert projected.embeddings_service.output_dimension == full_dim // 2
+        assert projected.embeddings_service.get_status()["projection"]["method"] == "pca"
+        # Векторы другой размерности не смешиваются: после включения проекции документы загружаются заново
+        projected.clear_database()
+        assert projected.load_documents(["pets.txt"])["new_chunks"] == 60
+        results = projected.search("Предложение номер 7 про кота и собаку.", top_k=1)
+        assert results and "номер 7 " in results[0]["document"]
+    finally:
+        projected.close()
+    print("✅ Проекция в RAGSystem")
+finally:
+    os.chdir(cwd)
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+print("🎉 Проекция эмбеддингов работает корректно!")
@@ -0,0 +1,131 @@
+import sys
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# Добавляем путь к src для нормальных импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from ml.rag_bot import VectorStore
+from ml.rag_bot.quantization import QuantizedIndex
+
+print("🧪 Тестируем квантованный индекс...")
+
+
+def clustered(centers: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    """Нормализованные векторы вокруг центров (похоже на эмбеддинги текстов)"""
+    dimension = centers.shape[1]
+    vectors = centers[rng.integers(0, len(centers), size=count)]
+    vectors = vectors + rng.standard_normal((count, dimension)).astype(np.float32) * (0.35 / np.sqrt(dimension))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def exact_top_k(vectors: np.ndarray, alive: np.ndarray, query: np.ndarray, k: int) -> list:
+    distances = ((vectors - query) ** 2).sum(axis=1)
+    distances[~alive] = np.inf
+    return list(np.argsort(distances, kind="stable")[:k])
+
+
+rng = np.random.default_rng(0)
+centers = rng.standard_normal((64, 128)).astype(np.float32)
+centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+vectors = clustered(centers, 6000, rng)
+# Запросы из того же распределения, но не совпадающие с векторами коллекции
+queries = clustered(centers, 100, rng)
+ids = [f"doc-{i}" for i in range(len(vectors))]
+work_dir = tempfile.mkdtemp(prefix="rag_quantized_")
+
+try:
+    # Recall после точного пересчета при малом top_k (binary - с запасом кандидатов по режиму)
+    for mode, min_recall in (("int8", 0.98), ("binary", 0.95)):
+        index = QuantizedIndex(os.path.join(work_dir, mode), mode)
+        index.add(ids, vectors)
+        alive = np.ones(len(ids), dtype=bool)
+        for k in (1, 10):
+            hits = 0
+            for query in queries:
+                expected = {ids[row] for row in exact_top_k(vectors, alive, query, k)}
+                found = index.search(query, top_k=k)
+                hits += len(expected & {doc_id for doc_id, _ in found})
+                # Пересчитанные расстояния - точные
+                for doc_id, distance in found:
+                    row = int(doc_id.split("-")[1])
+                    assert abs(distance - float(((vectors[row] - query) ** 2).sum())) < 1e-4
+            recall = hits / (k * len(queries))
+            print(f"📊 {mode}: recall@{k} = {recall:.3f}")
+            assert recall >= min_recall, f"{mode}: recall@{k} {recall:.3f} < {min_recall}"
+        report = index.measure_recall(k=10)
+        assert report["rescored"] >= min_recall and report["rescored"] >= report["first_pass"]
+        assert index.cached_recall() == report
+    print("✅ Точный пересчет кандидатов")
+
+    # Пометки удаления: удаленные не находятся, пометки переживают перезагрузку
+    index = QuantizedIndex(os.path.join(work_dir, "deletes"), "int8")
+    index.add(ids, vectors)
+    removed = ids[:500]
+    index.remove(removed + ["missing"])
+    assert index.count == len(ids) - 500 and index.deleted_count == 500
+    assert index.cached_recall() is None
+    alive = np.ones(len(ids), dtype=bool)
+    alive[:500] = False
+    for query in queries[:20]:
+        found = [doc_id for doc_id, _ in index.search(query, top_k=10)]
+        assert not set(found) & set(removed)
+        assert found[0] == ids[exact_top_k(vectors, alive, query, 1)[0]]
+    assert not index.search(vectors[0], top_k=5, allowed_ids=removed)
+
+    index = QuantizedIndex(os.path.join(work_dir, "deletes"), "int8")
+    assert index.count == len(ids) - 500 and index.deleted_count == 500
+    stats = index.get_stats()
+    assert stats["deleted_marks"] == 500 and stats["vectors"] == len(ids) - 500
+
+    # Повторно добавленный ID указывает на новую строку
+    index.add([ids[0]], vectors[:1])
+    assert index.search(vectors[0], top_k=1)[0][0] == ids[0]
+
+    # Пометок больше четверти строк - файлы сжимаются
+    disk_before = index.get_stats()["disk_bytes"]
+    index.remove(ids[500:2000])
+    assert index.deleted_count == 0, "Индекс не сжат"
+    assert index.count == len(ids) - 2000 + 1
+    assert index.get_stats()["disk_bytes"] < disk_before
+    index = QuantizedIndex(os.path.join(work_dir, "deletes"), "int8")
+    assert index.count == len(ids) - 2000 + 1 and index.deleted_count == 0
+    alive[:2000] = False
+    alive[0] = True
+    for query in queries[:20]:
+        assert index.search(query, top_k=1)[0][0] == ids[exact_top_k(vectors, alive, query, 1)[0]]
+    print("✅ Пометки удаления и сжатие")
+
+    # VectorStore: float32 индекс бэкенда не загружается, recall в статусе, пересборка индекса
+    db_path = os.path.join(work_dir, "store")
+    store = VectorStore(db_path=db_path, collection_name="quantized", backend="flat", quantization="binary", shards=2)
+    try:
+        store.add_new(ids, [f"Чанк {i}" for i in range(len(ids))], [{"filename": "a.txt"}] * len(ids), vectors)
+        store.flush()
+        assert all(not shard.get_stats()["index_loaded"] for shard in store.collection.shards)
+        assert store.search(queries[0], top_k=1)[0]["id"] == ids[exact_top_k(vectors, np.ones(len(ids), bool), queries[0], 1)[0]]
+
+        info = store.get_collection_info()
+        assert info["quantized_recall"] is None, "Recall без запроса не измеряется"
+        measured = store.get_collection_info(include_recall=True)["quantized_recall"]
+        assert measured["rescored"] >= 0.95
+        assert store.get_collection_info()["quantized_recall"] == measured, "Измеренный recall не сохранен"
+        store.delete_document(ids[1])
+        assert store.get_collection_info()["quantized_recall"] is None
+    finally:
+        store.close()
+
+    shutil.rmtree(os.path.join(db_path, "quantized"))
+    store = VectorStore(db_path=db_path, collection_name="quantized", backend="flat", quantization="binary", shards=2)
+    try:
+        assert store.quantized_index.count == len(ids) - 1
+        assert store.search(vectors[5], top_k=1)[0]["id"] == ids[5]
+    finally:
+        store.close()
+    print("✅ Квантованная коллекция VectorStore")
+finally:
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+print("🎉 Квантованный индекс работает корректно!")
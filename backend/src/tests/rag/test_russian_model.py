@@ -20,9 +20,8 @@ print(f"🎯 Запрос: '{query}'")
 print()
 
 docs = [doc1, doc2, doc3]
-for doc in docs:
-    sim = embeddings_ru.similarity(query, doc)
-    print(f"📄 '{doc}' -> similarity: {sim:.3f}")
+for item in embeddings_ru.rank(query, docs):
+    print(f"📄 '{item['text']}' -> similarity: {item['similarity']:.3f}")
 
 print()
 print("✅ Русская модель должна давать более точные результаты!")
\ No newline at end of file
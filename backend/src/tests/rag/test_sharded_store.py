@@ -0,0 +1,84 @@
+import sys
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# Добавляем путь к src для нормальных импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from ml.rag_bot import VectorStore
+from ml.rag_bot.backends import ShardedCollection
+
+print("🧪 Тестируем шардированную коллекцию...")
+
+rng = np.random.default_rng(0)
+ids = [f"doc-{i:03d}" for i in range(250)]
+documents = [f"Чанк {i}" for i in range(len(ids))]
+metadatas = [{"filename": f"file-{i % 7}.txt", "chunk_index": i} for i in range(len(ids))]
+vectors = rng.standard_normal((len(ids), 32)).astype(np.float32)
+queries = rng.standard_normal((15, 32)).astype(np.float32)
+
+db_path = tempfile.mkdtemp(prefix="rag_sharded_")
+single = VectorStore(db_path=db_path, collection_name="single", backend="flat")
+sharded = VectorStore(db_path=db_path, collection_name="sharded", backend="flat", shards=4)
+
+try:
+    assert isinstance(sharded.collection, ShardedCollection)
+    for store in (single, sharded):
+        store.add_new(ids, documents, metadatas, vectors)
+        store.flush()
+    assert sharded.collection.count() == single.collection.count() == len(ids)
+    # Чанки распределены по всем шардам
+    assert all(shard.count() > 0 for shard in sharded.collection.shards)
+
+    # Общий top-k из шардов совпадает с top-k одной коллекции
+    for top_k in (1, 5, 20):
+        expected = single.search_many(queries, top_k=top_k)
+        found = sharded.search_many(queries, top_k=top_k)
+        for single_results, sharded_results in zip(expected, found):
+            assert [r["id"] for r in sharded_results] == [r["id"] for r in single_results], \
+                f"top-{top_k} шардов отличается от одной коллекции"
+            assert np.allclose([r["distance"] for r in sharded_results],
+                               [r["distance"] for r in single_results], atol=1e-4)
+
+    where = {"$or": [{"filename": "file-1.txt"}, {"filename": "file-3.txt"}]}
+    expected = single.search(queries[0], top_k=10, where=where)
+    found = sharded.search(queries[0], top_k=10, where=where)
+    assert [r["id"] for r in found] == [r["id"] for r in expected], "top-k с фильтром отличается"
+    print("✅ Поиск по шардам совпадает с одной коллекцией")
+
+    # Чтение страницами: без подсчета размеров шардов, каждый чанк ровно один раз
+    counted = []
+    for shard in sharded.collection.shards:
+        shard_count = shard.count
+        shard.count = lambda shard_count=shard_count: counted.append(1) or shard_count()
+    pages = list(sharded.collection.iter_pages(60, include=["embeddings"]))
+    scanned = [doc_id for page in pages for doc_id in page["ids"]]
+    assert sorted(scanned) == ids and all(len(page["ids"]) <= 60 for page in pages)
+    assert len(sharded.sample_documents(100)) == 100
+    assert len(sharded.collection.get(limit=10, include=[])["ids"]) == 10
+    assert not counted, "Чтение с начала не должно считать размеры шардов"
+
+    # Смещение: размеры считаются только у пропущенных шардов
+    sizes = [shard.count() for shard in sharded.collection.shards]
+    counted.clear()
+    page = sharded.collection.get(limit=5, offset=sizes[0] + 2, include=[])
+    assert page["ids"] == sharded.collection.shards[1].get(limit=5, offset=2, include=[])["ids"]
+    assert len(counted) == 1
+    for shard in sharded.collection.shards:
+        del shard.count
+    print("✅ Чтение шардов страницами")
+
+    # Удаление и статистика шардированной коллекции
+    removed = sharded.delete_by_source("file-2.txt")
+    assert removed == sum(1 for meta in metadatas if meta["filename"] == "file-2.txt")
+    assert sharded.stats.chunks == sharded.collection.count() == len(ids) - removed
+    assert not any(r["metadata"]["filename"] == "file-2.txt" for r in sharded.search(vectors[2], top_k=20))
+    print(f"📊 Статистика после удаления: {sharded.stats.get_summary()}")
+finally:
+    single.close()
+    sharded.close()
+    shutil.rmtree(db_path, ignore_errors=True)
+
+print("🎉 Шардированная коллекция работает корректно!")
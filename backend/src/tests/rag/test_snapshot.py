@@ -0,0 +1,130 @@
+import sys
+import os
+import json
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+
+# Добавляем путь к src для нормальных импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from ml.rag_bot import VectorStore
+from ml.rag_bot.rag_system import RAGSystem
+
+print("🧪 Тестируем снимки коллекции...")
+
+rng = np.random.default_rng(0)
+ids = [f"doc-{i}" for i in range(120)]
+documents = [f"Чанк {i} " + "текст " * (i % 5) for i in range(len(ids))]
+metadatas = [{"filename": f"file-{i % 4}.txt", "chunk_index": i} for i in range(len(ids))]
+vectors = rng.standard_normal((len(ids), 24)).astype(np.float32)
+
+db_path = tempfile.mkdtemp(prefix="rag_snapshot_")
+snapshot_path = os.path.join(db_path, "snapshot")
+source = VectorStore(db_path=db_path, collection_name="source", backend="flat")
+target = VectorStore(db_path=db_path, collection_name="target", backend="hnsw")
+
+try:
+    source.add_new(ids, documents, metadatas, vectors)
+    source.flush()
+    source.delete_by_source("file-3.txt")
+    live_ids = [doc_id for doc_id, meta in zip(ids, metadatas) if meta["filename"] != "file-3.txt"]
+    summary = source.stats.get_summary()
+
+    # Снимок: выгрузка и загрузка в коллекцию другого бэкенда без эмбеддингов
+    manifest = source.export_snapshot(snapshot_path)
+    assert manifest["count"] == len(live_ids) and manifest["dimension"] == 24
+
+    result = target.import_snapshot(snapshot_path)
+    assert result["imported_chunks"] == len(live_ids) and result["skipped_chunks"] == 0
+    assert target.stats.get_summary() == summary
+
+    for query in vectors[2:12]:
+        expected = source.search(query, top_k=5)
+        found = target.search(query, top_k=5)
+        assert [r["id"] for r in found] == [r["id"] for r in expected]
+        assert [r["document"] for r in found] == [r["document"] for r in expected]
+        assert [r["metadata"] for r in found] == [r["metadata"] for r in expected]
+
+    # Повторный импорт без replace пропускает существующие чанки, с replace - загружает заново
+    result = target.import_snapshot(snapshot_path)
+    assert result["imported_chunks"] == 0 and result["skipped_chunks"] == len(live_ids)
+    result = target.import_snapshot(snapshot_path, replace=True)
+    assert result["imported_chunks"] == len(live_ids)
+    assert target.stats.chunks == target.collection.count() == len(live_ids)
+    print("✅ Снимок загружен без изменений")
+
+    # Очистка и загрузка под одной блокировкой: запись, начатая во время очистки, ждет конца импорта
+    seen = []
+
+    def write():
+        with target.write_lock():
+            seen.append(target.stats.chunks)
+
+    writer = threading.Thread(target=write)
+    clear_collection = target.clear_collection
+
+    def clear_and_write():
+        cleared = clear_collection()
+        writer.start()
+        writer.join(0.2)
+        return cleared
+
+    target.clear_collection = clear_and_write
+    try:
+        target.import_snapshot(snapshot_path, replace=True)
+    finally:
+        del target.clear_collection
+    writer.join()
+    assert seen == [len(live_ids)], f"Запись вклинилась между очисткой и загрузкой: {seen}"
+    print("✅ Очистка и загрузка атомарны для других записей")
+
+    # Снимок из другого пространства расстояний отклоняется, коллекция не очищается
+    assert manifest["space"] == "cosine"
+    l2 = VectorStore(db_path=db_path, collection_name="l2", backend="flat", space="l2")
+    try:
+        l2.add_new(["keep"], ["Чанк"], [{"filename": "keep.txt"}], vectors[:1])
+        l2.flush()
+        l2.import_snapshot(snapshot_path, replace=True)
+        raise AssertionError("Снимок из пространства cosine загружен в l2 коллекцию")
+    except ValueError:
+        assert l2.stats.chunks == l2.collection.count() == 1
+    finally:
+        l2.close()
+
+    # Снимок другой модели или размерности отклоняется до очистки коллекции
+    cwd = os.getcwd()
+    os.chdir(db_path)
+    rag_system = RAGSystem(vector_backend="flat", embeddings_cache_dir=None,
+                           snapshots_dir=os.path.join(db_path, "snapshots"))
+    try:
+        texts = ["Собака лает на улице", "Кот спит на диване"]
+        store = rag_system.tenants.default
+        store.add_new(["a", "b"], texts, [{"filename": "pets.txt"}] * 2,
+                      rag_system.embeddings_service.encode_batch_array(texts))
+        store.flush()
+        exported = rag_system.export_snapshot("pets")
+        manifest_path = os.path.join(exported["path"], "manifest.json")
+        original = json.loads(open(manifest_path, encoding="utf-8").read())
+        for key, value in (("embeddings_model", "other/model"), ("dimension", original["dimension"] + 1)):
+            with open(manifest_path, "w", encoding="utf-8") as f:
+                json.dump({**original, key: value}, f)
+            try:
+                rag_system.import_snapshot("pets", replace=True)
+                raise AssertionError(f"Снимок с другим {key} загружен")
+            except ValueError:
+                assert store.stats.chunks == store.collection.count() == 2
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(original, f)
+        assert rag_system.import_snapshot("pets", replace=True)["imported_chunks"] == 2
+    finally:
+        rag_system.close()
+        os.chdir(cwd)
+    print("✅ Снимок другой модели или размерности отклонен")
+finally:
+    source.close()
+    target.close()
+    shutil.rmtree(db_path, ignore_errors=True)
+
+print("🎉 Снимки коллекции работают корректно!")
@@ -0,0 +1,78 @@
+import sys
+import os
+import random
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Добавляем путь к src для нормальных импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from ml.rag_bot import VectorStore, TenantStores
+
+print("🧪 Тестируем коллекции арендаторов...")
+
+db_path = tempfile.mkdtemp(prefix="rag_tenants_")
+tenants = TenantStores(
+    lambda collection_name: VectorStore(db_path=db_path, collection_name=collection_name, backend="flat"),
+    max_open=2
+)
+
+rng = np.random.default_rng(0)
+names = ["team-a", "team-b", "team-c", "team-d"]
+vectors = {name: rng.standard_normal((20, 32)).astype(np.float32) for name in names}
+
+try:
+    # У каждого арендатора своя коллекция
+    for name in names:
+        with tenants.use(name) as store:
+            store.add_new(
+                [f"{name}-{i}" for i in range(20)],
+                [f"Чанк {i} арендатора {name}" for i in range(20)],
+                [{"filename": f"{name}.txt"}] * 20,
+                vectors[name]
+            )
+            store.flush()
+
+    stats = tenants.get_stats()
+    print(f"📊 Метрики: {stats}")
+    assert stats["open"] == 2, "Открыто больше коллекций, чем max_open"
+    assert stats["evictions"] == 2
+
+    # Вытесненные коллекции открываются снова с записанными данными
+    for name in names:
+        with tenants.use(name) as store:
+            results = store.search(vectors[name][0], top_k=3)
+            assert results[0]["id"] == f"{name}-0", f"Чужой или потерянный чанк у {name}"
+            assert all(result["metadata"]["filename"] == f"{name}.txt" for result in results)
+
+    with tenants.use(None) as store:
+        assert store is tenants.default and store.stats.chunks == 0, "Коллекция по умолчанию изменилась"
+
+    for bad_name in ("../x", "a b", "-a", ""):
+        try:
+            with tenants.use(bad_name):
+                pass
+            assert bad_name == "", f"Имя {bad_name!r} не отклонено"
+        except ValueError:
+            pass
+
+    # Параллельные запросы к разным арендаторам при постоянном вытеснении
+    def search_random(_):
+        name = random.choice(names)
+        with tenants.use(name) as store:
+            return name, store.search(vectors[name][1], top_k=1)[0]["id"]
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        for name, top_id in pool.map(search_random, range(200)):
+            assert top_id == f"{name}-1", f"Неверный результат у {name}: {top_id}"
+
+    stats = tenants.get_stats()
+    print(f"📊 Метрики после параллельных запросов: {stats}")
+    assert stats["open"] <= 2 and stats["draining"] == 0
+finally:
+    tenants.close()
+    shutil.rmtree(db_path, ignore_errors=True)
+
+print("🎉 Коллекции арендаторов работают корректно!")
@@ -0,0 +1,89 @@
+import sys
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# Добавляем путь к src для нормальных импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from ml.rag_bot import VectorStore
+from ml.rag_bot.rag_system import RAGSystem
+
+print("🧪 Тестируем дедупликацию чанков по ID...")
+
+rng = np.random.default_rng(0)
+content = "Собака лает на улице. Кот спит на диване. Птица поет в саду."
+chunks = [f"{content} Чанк {i}" for i in range(10)]
+vectors = rng.standard_normal((len(chunks), 16)).astype(np.float32)
+metadatas = [{"filename": "pets.txt", "chunk_index": i} for i in range(len(chunks))]
+
+db_path = tempfile.mkdtemp(prefix="rag_upsert_")
+cwd = os.getcwd()
+try:
+    for write_buffer_size in (0, 100):
+        store = VectorStore(db_path=db_path, collection_name=f"upsert_{write_buffer_size}", backend="flat",
+                            write_buffer_size=write_buffer_size)
+        try:
+            # Повторная загрузка тех же чанков ничего не пишет (в том числе пока они в буфере)
+            ids = store.add_documents(chunks, vectors, metadatas)
+            assert store.add_documents(chunks, vectors, metadatas) == ids
+            store.flush()
+            assert store.stats.chunks == store.collection.count() == len(chunks)
+
+            # Дубли ID внутри одного вызова записываются один раз
+            extra = ["Новый чанк"] * 3
+            store.add_documents(extra, vectors[:3], [{"filename": "new.txt"}] * 3, ids=["new"] * 3)
+            store.flush()
+            assert store.stats.chunks == len(chunks) + 1
+            print(f"✅ Повторы не записываются (буфер записи: {write_buffer_size})")
+        finally:
+            store.close()
+
+    # source_id от содержимого файла: те же ID и метаданные, что при загрузке через RAGSystem
+    store = VectorStore(db_path=db_path, collection_name="source", backend="flat")
+    try:
+        source_id = VectorStore.make_source_id(content)
+        ids = store.add_documents(chunks[5:], vectors[5:], metadatas[5:], source_id=source_id)
+        assert ids == [VectorStore.make_chunk_id(source_id, i, chunks[i]) for i in range(5, 10)]
+        # Полный набор чанков после части: добавляются только недостающие
+        assert store.add_documents(chunks, vectors, metadatas, source_id=source_id)[5:] == ids
+        store.flush()
+        assert store.stats.chunks == len(chunks)
+        assert {r["metadata"]["source_id"] for r in store.search(vectors[0], top_k=10)} == {source_id}
+        assert store.delete_by_source(source_id) == len(chunks)
+    finally:
+        store.close()
+
+    os.chdir(db_path)
+    with open("pets.txt", "w", encoding="utf-8") as f:
+        f.write(content)
+    rag_system = RAGSystem(vector_backend="flat", embeddings_cache_dir=None, chunk_size=20, overlap=0)
+    try:
+        store = rag_system.tenants.default
+        first = rag_system.load_documents(["pets.txt"])
+        assert first["success"] and first["new_chunks"] > 1
+        second = rag_system.load_documents(["pets.txt"])
+        assert second["new_chunks"] == 0 and second["skipped_chunks"] == first["new_chunks"]
+        loaded = store.collection.get(include=["documents", "metadatas"])
+        assert store.stats.chunks == len(loaded["ids"]) == first["new_chunks"]
+        assert {meta["source_id"] for meta in loaded["metadatas"]} == {VectorStore.make_source_id(content)}
+
+        # Те же чанки через add_documents с source_id файла - дубли, а не новые записи
+        order = sorted(range(len(loaded["ids"])), key=lambda row: loaded["metadatas"][row]["chunk_index"])
+        texts = [loaded["documents"][row] for row in order]
+        metas = [{"filename": "pets.txt", "chunk_index": loaded["metadatas"][row]["chunk_index"]} for row in order]
+        ids = store.add_documents(texts, rag_system.embeddings_service.encode_batch_array(texts), metas,
+                                  source_id=VectorStore.make_source_id(content))
+        assert sorted(ids) == sorted(loaded["ids"]), "ID чанков расходятся с RAGSystem"
+        store.flush()
+        assert store.stats.chunks == len(loaded["ids"])
+    finally:
+        rag_system.close()
+        os.chdir(cwd)
+    print("✅ source_id совпадает с загрузкой через RAGSystem")
+finally:
+    os.chdir(cwd)
+    shutil.rmtree(db_path, ignore_errors=True)
+
+print("🎉 Дедупликация чанков по ID работает корректно!")
@@ -0,0 +1,74 @@
+import sys
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# Добавляем путь к src для нормальных импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from ml.rag_bot import VectorStore
+
+print("🧪 Тестируем совпадение бэкендов flat и hnsw...")
+
+rng = np.random.default_rng(0)
+ids = [f"doc-{i}" for i in range(300)]
+vectors = rng.standard_normal((len(ids), 48)).astype(np.float32)
+queries = vectors[:20] + 0.05 * rng.standard_normal((20, 48)).astype(np.float32)
+deleted = set(ids[::7])
+
+db_path = tempfile.mkdtemp(prefix="rag_backends_")
+stores = {
+    backend: VectorStore(db_path=db_path, collection_name=f"parity_{backend}", backend=backend)
+    for backend in ("flat", "hnsw")
+}
+
+try:
+    for store in stores.values():
+        store.add_new(
+            ids,
+            [f"Чанк {i}" for i in range(len(ids))],
+            [{"filename": f"file-{i % 5}.txt", "chunk_index": i} for i in range(len(ids))],
+            vectors
+        )
+        store.flush()
+        for doc_id in sorted(deleted):
+            assert store.delete_document(doc_id), f"{doc_id} не удален"
+        assert not store.delete_document(ids[0]), "Повторное удаление должно вернуть False"
+
+    results = {backend: store.search_many(queries, top_k=10) for backend, store in stores.items()}
+    recall = []
+    for flat, hnsw in zip(results["flat"], results["hnsw"]):
+        flat_ids = [result["id"] for result in flat]
+        hnsw_ids = [result["id"] for result in hnsw]
+        assert len(flat_ids) == len(hnsw_ids) == 10
+        assert not deleted & (set(flat_ids) | set(hnsw_ids)), "Удаленный чанк в результатах"
+        # Ближайший сосед одинаков, расстояния совпадают для общих чанков
+        assert flat_ids[0] == hnsw_ids[0], f"Разный top-1: {flat_ids[0]} и {hnsw_ids[0]}"
+        flat_distances = {result["id"]: result["distance"] for result in flat}
+        for result in hnsw:
+            if result["id"] in flat_distances:
+                assert abs(result["distance"] - flat_distances[result["id"]]) < 1e-3
+        recall.append(len(set(flat_ids) & set(hnsw_ids)) / len(flat_ids))
+    print(f"📊 Recall@10 hnsw относительно flat: {np.mean(recall):.3f}")
+    assert np.mean(recall) >= 0.9
+
+    for backend, store in stores.items():
+        assert store.stats.chunks == len(ids) - len(deleted), f"{backend}: {store.stats.chunks}"
+        assert store.collection.count() == len(ids) - len(deleted)
+    print("✅ Добавление, удаление и поиск совпадают")
+
+    # После переоткрытия (индекс с диска) результаты не меняются
+    for backend in list(stores):
+        stores[backend].close()
+        stores[backend] = VectorStore(db_path=db_path, collection_name=f"parity_{backend}", backend=backend)
+        reopened = stores[backend].search_many(queries, top_k=10)
+        assert [[r["id"] for r in rs] for rs in reopened] == [[r["id"] for r in rs] for rs in results[backend]], \
+            f"{backend}: результаты изменились после переоткрытия"
+    print("✅ Результаты сохраняются после переоткрытия")
+finally:
+    for store in stores.values():
+        store.close()
+    shutil.rmtree(db_path, ignore_errors=True)
+
+print("🎉 Бэкенды flat и hnsw работают согласованно!")
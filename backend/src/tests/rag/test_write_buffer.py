@@ -0,0 +1,123 @@
+import sys
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# Добавляем путь к src для нормальных импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from ml.rag_bot import VectorStore
+
+print("🧪 Тестируем буфер записи...")
+
+rng = np.random.default_rng(0)
+ids = [f"doc-{i}" for i in range(35)]
+documents = [f"Чанк {i}" for i in range(len(ids))]
+metadatas = [{"filename": f"file-{i % 3}.txt", "chunk_index": i} for i in range(len(ids))]
+vectors = rng.standard_normal((len(ids), 16)).astype(np.float32)
+
+
+def fail_on_call(func, call: int):
+    """Обертка, которая падает на call-м вызове"""
+    calls = []
+
+    def wrapper(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == call:
+            raise RuntimeError("Отказ бэкенда")
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def assert_consistent(store: VectorStore, expected: int):
+    assert store.collection.count() == store.stats.chunks == expected
+    if store.quantized_index is not None:
+        assert store.quantized_index.count == expected
+    assert sorted(store.collection.get(include=[])["ids"]) == sorted(ids[:expected])
+
+
+db_path = tempfile.mkdtemp(prefix="rag_write_buffer_")
+try:
+    # Чанки копятся в буфере и записываются пачками по write_batch_size
+    store = VectorStore(db_path=db_path, collection_name="buffered", backend="flat",
+                        write_batch_size=10, write_buffer_size=30)
+    try:
+        store.add_new(ids[:20], documents[:20], metadatas[:20], vectors[:20])
+        assert store.collection.count() == 0 and store.existing_ids(ids[:25]) == set(ids[:20])
+        store.add_new(ids[20:], documents[20:], metadatas[20:], vectors[20:])
+        assert_consistent(store, len(ids))
+        assert store.flush() == 0
+    finally:
+        store.close()
+    print("✅ Буфер записывается по заполнении")
+
+    # Отказ бэкенда на третьей пачке: первые две записаны, хвост остается в буфере
+    store = VectorStore(db_path=db_path, collection_name="backend_failure", backend="flat",
+                        write_batch_size=10, write_buffer_size=1000)
+    try:
+        store.add_new(ids, documents, metadatas, vectors)
+        collection_add = store.collection.add
+        store.collection.add = fail_on_call(collection_add, 3)
+        try:
+            store.flush()
+            raise AssertionError("Ошибка бэкенда не передана вызывающему")
+        except RuntimeError:
+            pass
+        assert_consistent(store, 20)
+        assert store.existing_ids(ids) == set(ids), "Хвост буфера потерян"
+        store.collection.add = collection_add
+        assert store.flush() == 15
+        assert_consistent(store, len(ids))
+    finally:
+        store.close()
+    print("✅ Хвост буфера повторяется после отказа бэкенда")
+
+    # Пачка записана в бэкенд, но не в квантованный индекс: откат и повтор целиком
+    store = VectorStore(db_path=db_path, collection_name="index_failure", backend="flat", quantization="int8",
+                        write_batch_size=10, write_buffer_size=1000)
+    try:
+        store.add_new(ids, documents, metadatas, vectors)
+        index_add = store.quantized_index.add
+        store.quantized_index.add = fail_on_call(index_add, 2)
+        try:
+            store.flush()
+            raise AssertionError("Ошибка индекса не передана вызывающему")
+        except RuntimeError:
+            pass
+        assert_consistent(store, 10)
+        store.quantized_index.add = index_add
+        assert store.flush() == 25
+        assert_consistent(store, len(ids))
+        assert store.search(vectors[15], top_k=1)[0]["id"] == ids[15]
+
+        # Откат не удался: пачка остается в бэкенде и не пишется повторно
+        store.add_new([f"new-{i}" for i in range(20)], documents[:20], metadatas[:20], vectors[:20])
+        store.quantized_index.add = fail_on_call(index_add, 1)
+        collection_delete = store.collection.delete
+        store.collection.delete = fail_on_call(collection_delete, 1)
+        try:
+            store.flush()
+            raise AssertionError("Ошибка индекса не передана вызывающему")
+        except RuntimeError:
+            pass
+        store.collection.delete = collection_delete
+        assert store.existing_ids([f"new-{i}" for i in range(20)]) == {f"new-{i}" for i in range(20)}
+        assert len(store._buffered_ids) == 10
+        store.quantized_index.add = index_add
+        assert store.flush() == 10
+        assert store.collection.count() == len(ids) + 20
+    finally:
+        store.close()
+
+    # Счетчики и квантованный индекс пересчитываются при открытии, если не совпали с коллекцией
+    store = VectorStore(db_path=db_path, collection_name="index_failure", backend="flat", quantization="int8")
+    try:
+        assert store.collection.count() == store.stats.chunks == store.quantized_index.count == len(ids) + 20
+    finally:
+        store.close()
+    print("✅ Откат пачки при отказе квантованного индекса")
+finally:
+    shutil.rmtree(db_path, ignore_errors=True)
+
+print("🎉 Буфер записи работает корректно!")